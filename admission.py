@@ -0,0 +1,137 @@
+"""
+Admission control for requests that write the task files.
+
+Every mutation rewrites (part of) the dataset, so a client stuck in a retry
+loop can keep the disk busy and stall everyone else. Two guards sit in
+front of the mutation routes:
+
+- RateLimiter: a token bucket per client. Each request takes one token;
+  tokens refill at `rate` per second up to `burst`. An empty bucket means
+  429 with the number of seconds until the next token in Retry-After.
+- WriteQueue: writes run one at a time. At most `max_pending` requests may
+  be running or waiting for their turn; further requests are shed with 429
+  instead of piling up threads behind the lock.
+
+Both keep counters for the metrics endpoint. State is in memory and per
+process.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, tokens, now):
+        self.tokens = tokens
+        self.updated = now
+
+
+class RateLimiter:
+    """Token buckets keyed by client; the least recently seen clients are
+    dropped beyond `max_clients` (a new bucket starts full anyway)"""
+
+    def __init__(self, rate, burst, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, client, now=None):
+        """Take a token for `client`. Returns 0 when the request may proceed,
+        else the seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(client)
+            if bucket is None:
+                bucket = self._buckets[client] = TokenBucket(self.burst, now)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(client)
+                bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+                bucket.updated = now
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                self.allowed += 1
+                return 0
+            self.limited += 1
+            return (1 - bucket.tokens) / self.rate
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'clients': len(self._buckets),
+                'allowed': self.allowed,
+                'limited': self.limited
+            }
+
+
+class WriteQueue:
+    """Serializes writes with a bounded number of waiters"""
+
+    def __init__(self, max_pending, timeout):
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._write_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self.depth = 0
+        self.peak = 0
+        self.completed = 0
+        self.shed = 0
+        self.timed_out = 0
+        self._avg_seconds = 0.0    # moving average of time holding the write lock
+
+    @property
+    def lock(self):
+        """The lock held by the request whose turn it is; background jobs
+        reading or writing the data files take it too"""
+        return self._write_lock
+
+    def enter(self):
+        """Wait for the turn to write. Returns the start time, or None when
+        the request is shed (queue full, or no turn within `timeout`)."""
+        with self._lock:
+            if self.depth >= self.max_pending:
+                self.shed += 1
+                return None
+            self.depth += 1
+            self.peak = max(self.peak, self.depth)
+        if not self._write_lock.acquire(timeout=self.timeout):
+            with self._lock:
+                self.depth -= 1
+                self.timed_out += 1
+            return None
+        return time.monotonic()
+
+    def leave(self, started):
+        elapsed = time.monotonic() - started
+        self._write_lock.release()
+        with self._lock:
+            self.depth -= 1
+            self.completed += 1
+            self._avg_seconds += (elapsed - self._avg_seconds) * 0.1
+
+    def retry_after(self):
+        """Seconds for the current queue to drain, at least 1"""
+        with self._lock:
+            return max(1, math.ceil(self._avg_seconds * self.depth))
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'depth': self.depth,
+                'max_pending': self.max_pending,
+                'peak': self.peak,
+                'completed': self.completed,
+                'shed': self.shed,
+                'timed_out': self.timed_out,
+                'avg_write_ms': round(self._avg_seconds * 1000, 2)
+            }
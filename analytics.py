@@ -0,0 +1,174 @@
+"""
+Pre-aggregated productivity rollups.
+
+Raw timestamps do not last (completed tasks are purged from todos.json
+after two days, the trash after three), so trends are counted as changes
+happen: each task created, completed or deleted increments one daily and
+one weekly bucket of a small time series kept in ANALYTICS_FILE:
+
+    {"version": 1,
+     "day":  {"2026-10-19": [created, completed, deleted], ...},
+     "week": {"2026-10-19": [...], ...}}      (keyed by the week's Monday)
+
+Changes come as history.diff() deltas, so undoing a completion or deletion
+takes it back out of the bucket it was counted in (its timestamp says
+which day). A query reads only the buckets it returns. Daily buckets are
+kept for DAILY_RETENTION days, weekly ones indefinitely.
+
+Worker processes share the file: an update takes an exclusive lock on
+`<file>.lock`, re-reads the file if another process changed it, and
+writes it back (temporary file and rename) before releasing the lock.
+"""
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:   # Windows: updates are not serialized across processes
+    fcntl = None
+
+from indexes import file_signature
+
+ANALYTICS_FILE = os.environ.get('ANALYTICS_FILE', 'analytics.json')
+DAILY_RETENTION = int(os.environ.get('ANALYTICS_DAILY_RETENTION', 400))
+
+METRICS = ('created', 'completed', 'deleted')
+# Flag changes counted, as (metric, flag, timestamp)
+FLAG_METRICS = (('completed', 'completed', 'completed_at'), ('deleted', 'deleted', 'deleted_at'))
+PERIODS = ('day', 'week')
+MAX_BUCKETS = 366
+
+
+def week_start(day):
+    """Monday of the week of `day`"""
+    return day - timedelta(days=day.weekday())
+
+
+def bucket_start(period, day):
+    return week_start(day) if period == 'week' else day
+
+
+def _day_of(timestamp):
+    try:
+        return datetime.fromisoformat(timestamp).date()
+    except (TypeError, ValueError):
+        return None
+
+
+def events(changes, today):
+    """(metric, day, +1 / -1) for every counted event in history changes"""
+    for change in changes:
+        if change is None:
+            continue
+        _, before, after = change
+        if before is None:
+            if after is not None:
+                yield 'created', today, 1
+            continue
+        if after is None:
+            continue
+        for metric, flag, stamp in FLAG_METRICS:
+            if flag not in after:
+                continue
+            if after[flag] and not before.get(flag):
+                yield metric, _day_of(after.get(stamp)) or today, 1
+            elif before.get(flag) and not after[flag]:
+                day = _day_of(before.get(stamp))
+                if day is not None:
+                    yield metric, day, -1
+
+
+@contextmanager
+def _file_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(f'{path}.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class RollupStore:
+    """Daily and weekly counters of created / completed / deleted tasks"""
+
+    def __init__(self, path=ANALYTICS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._buckets = {period: {} for period in PERIODS}
+
+    def _refresh(self):
+        """Re-read the file if it changed since it was last read or written"""
+        signature = file_signature(self.path)
+        if signature == self._signature:
+            return
+        self._signature = signature
+        self._buckets = {period: {} for period in PERIODS}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        for period in PERIODS:
+            buckets = data.get(period) if isinstance(data, dict) else None
+            if isinstance(buckets, dict):
+                self._buckets[period] = {key: list(counts) for key, counts in buckets.items()
+                                         if isinstance(counts, list) and len(counts) == len(METRICS)}
+
+    def _save(self):
+        tmp_path = f'{self.path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': 1, **self._buckets}, f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self._signature = file_signature(self.path)
+
+    def record(self, changes, today=None):
+        """Count the events in a list of history changes"""
+        today = today or date.today()
+        counted = list(events(changes, today))
+        if not counted:
+            return
+        with self._lock, _file_lock(self.path):
+            self._refresh()
+            for metric, day, step in counted:
+                column = METRICS.index(metric)
+                for period in PERIODS:
+                    key = bucket_start(period, day).isoformat()
+                    counts = self._buckets[period].get(key)
+                    if counts is None:
+                        if step < 0:
+                            continue
+                        counts = self._buckets[period][key] = [0] * len(METRICS)
+                    counts[column] = max(0, counts[column] + step)
+            cutoff = (today - timedelta(days=DAILY_RETENTION)).isoformat()
+            daily = self._buckets['day']
+            for key in [key for key in daily if key < cutoff]:
+                del daily[key]
+            self._save()
+
+    def series(self, period='day', count=30, end=None):
+        """The last `count` buckets of `period` up to the one holding `end`
+        (default today), oldest first, zero-filled"""
+        end = bucket_start(period, end or date.today())
+        step = timedelta(days=7 if period == 'week' else 1)
+        with self._lock:
+            self._refresh()
+            buckets = self._buckets[period]
+            series = []
+            for i in range(count - 1, -1, -1):
+                key = (end - step * i).isoformat()
+                counts = buckets.get(key) or (0,) * len(METRICS)
+                series.append({'start': key, **dict(zip(METRICS, counts))})
+        return series
@@ -1,13 +1,46 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file
+from flask import Flask, render_template, request, jsonify, redirect, url_for, send_file, Response, stream_with_context, g
+from jinja2 import FileSystemBytecodeCache
+import hashlib
+import io
 import json
+import math
+import mimetypes
 import os
-from datetime import datetime, timedelta
+import secrets
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
 import re
 
+from idempotency import IdempotencyStore
+from notifications import NotificationScheduler
+import admission
+import analytics
+import assets
+import columnar
+import history
+import indexes
+import reminders
+import schema
+import shared
+import snapshots
+import storage
+import suggest
+import transfer
+import watcher
+
 app = Flask(__name__)
+IMPORT_STARTED = time.perf_counter()
 
 TODO_FILE = 'todos.json'
 
+# Compiled template bytecode is cached on disk so a cold start skips parsing
+TEMPLATE_CACHE_DIR = os.environ.get(
+    'TEMPLATE_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.jinja_cache'))
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(TEMPLATE_CACHE_DIR)
+
 # ============================================================================
 # UTILITY FUNCTIONS (from main.py)
 # ============================================================================
@@ -17,28 +50,37 @@ def load_todos():
         return []
     try:
         with open(TODO_FILE, 'r') as f:
-            return json.load(f)
+            todos = json.load(f)
     except (json.JSONDecodeError, IOError):
         return []
+    # Records written after the migration by other tools (scripts, a
+    # restored backup) may predate the schema; views index keys directly
+    return schema.conform(todos) if isinstance(todos, list) else []
+
+def load_segment(path):
+    """Records of a cold segment, conformed like load_todos()"""
+    return schema.conform(storage.load_segment(path))
 
 def save_todos(todos):
-    try:
-        with open(TODO_FILE, 'w') as f:
-            json.dump(todos, f, indent=2)
-    except IOError:
-        return False
-    return True
+    # Written to a temporary file and renamed, so concurrent readers never
+    # see a half-written todos.json
+    return storage.save_segment(TODO_FILE, todos)
+
+# Completed tasks are purged from todos.json, deleted ones from the trash,
+# this long after being completed / deleted
+COMPLETED_RETENTION = timedelta(days=2)
+DELETED_RETENTION = timedelta(days=3)
 
 def cleanup_completed(todos):
     """Remove todos that were completed more than 2 days ago."""
     changed = False
     now = datetime.now()
-    cutoff = now - timedelta(days=2)
+    cutoff = now - COMPLETED_RETENTION
     remaining = []
     for t in todos:
-        if t.get('completed') and t.get('completed_at'):
+        if t['completed'] and t['completed_at']:
             try:
-                completed_at = datetime.fromisoformat(t.get('completed_at'))
+                completed_at = datetime.fromisoformat(t['completed_at'])
                 if completed_at < cutoff:
                     changed = True
                     continue
@@ -52,16 +94,76 @@ def cleanup_completed(todos):
 # Get port from environment variable (Railway provides PORT)
 PORT = int(os.environ.get('PORT', 5000))
 
+# Periodic snapshots (seconds between runs, 0 disables) and admin access
+SNAPSHOT_INTERVAL = int(os.environ.get('SNAPSHOT_INTERVAL', 3600))
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Admission control for mutations: token bucket per client (requests per
+# second and burst size), and a bound on writes running or waiting
+MUTATION_RATE = float(os.environ.get('MUTATION_RATE', 5))
+MUTATION_BURST = int(os.environ.get('MUTATION_BURST', 30))
+MAX_PENDING_WRITES = int(os.environ.get('MAX_PENDING_WRITES', 16))
+WRITE_TIMEOUT = float(os.environ.get('WRITE_TIMEOUT', 10))
+
+# Read-only views share one parsed task list and its indexes until
+# todos.json changes on disk. With SHARED_SNAPSHOT_FILE set, all worker
+# processes share one memory-mapped copy of it instead (see shared.py)
+SHARED_SNAPSHOT_FILE = os.environ.get('SHARED_SNAPSHOT_FILE')
+
+# Changes to todos.json, including edits by main.py or scripts, are applied
+# as a diff that only decodes the changed records, and published to
+# task_changes. FILE_WATCHER applies them in the background as soon as the
+# file changes: 'auto' (inotify where available, else polling every
+# WATCH_INTERVAL seconds), 'poll' or 'off'
+FILE_WATCHER = os.environ.get('FILE_WATCHER', 'auto')
+WATCH_INTERVAL = float(os.environ.get('WATCH_INTERVAL', 1))
+task_changes = watcher.ChangeFeed()
+
+if SHARED_SNAPSHOT_FILE:
+    task_index = shared.SharedIndexCache(TODO_FILE, SHARED_SNAPSHOT_FILE)
+else:
+    task_index = indexes.TaskIndexCache(TODO_FILE, load_todos,
+                                        watcher.IncrementalReloader(TODO_FILE, task_changes))
+file_watcher = watcher.FileWatcher([TODO_FILE], task_index.get, WATCH_INTERVAL,
+                                   use_inotify=FILE_WATCHER != 'poll')
+
+# Trash and archive live in cold segments outside todos.json (see storage.py)
+TRASH_FILE = storage.TRASH_FILE
+ARCHIVE_FILE = storage.ARCHIVE_FILE
+trash_index = indexes.TaskIndexCache(TRASH_FILE, lambda: load_segment(TRASH_FILE))
+
+def current_tasks():
+    """Snapshot of todos.json after cleanup_completed().
+
+    The snapshot's columnar table tells whether any completed task is past
+    retention, so the list is only reloaded and rewritten when one is.
+    """
+    snapshot = task_index.get()
+    table = snapshot.table
+    if table.count(table.expired_mask('completed_at', datetime.now() - COMPLETED_RETENTION)):
+        cleanup_completed(load_todos())
+        snapshot = task_index.get()
+    return snapshot
+
+def current_trash():
+    """Snapshot of the trash segment after cleanup_deleted(), see current_tasks()"""
+    snapshot = trash_index.get()
+    table = snapshot.table
+    if table.count(table.expired_mask('deleted_at', datetime.now() - DELETED_RETENTION)):
+        cleanup_deleted(load_segment(TRASH_FILE))
+        snapshot = trash_index.get()
+    return snapshot
+
 def cleanup_deleted(todos):
-    """Permanently remove todos that were deleted more than 3 days ago."""
+    """Permanently remove trash entries that were deleted more than 3 days ago."""
     changed = False
     now = datetime.now()
-    cutoff = now - timedelta(days=3)
+    cutoff = now - DELETED_RETENTION
     remaining = []
     for t in todos:
-        if t.get('deleted') and t.get('deleted_at'):
+        if t['deleted'] and t['deleted_at']:
             try:
-                deleted_at = datetime.fromisoformat(t.get('deleted_at'))
+                deleted_at = datetime.fromisoformat(t['deleted_at'])
                 if deleted_at < cutoff:
                     changed = True
                     continue
@@ -69,7 +171,7 @@ def cleanup_deleted(todos):
                 pass
         remaining.append(t)
     if changed:
-        save_todos(remaining)
+        storage.save_segment(TRASH_FILE, remaining)
     return remaining
 
 def validate_due_date(due):
@@ -96,6 +198,18 @@ def calculate_priority(due_date_str):
     except ValueError:
         return 'N/A'
 
+@lru_cache(maxsize=8192)
+def _priority_on(due_date_str, day):
+    return calculate_priority(due_date_str)
+
+def day_priority(due_date_str):
+    """calculate_priority() memoized per calendar day.
+
+    A task's priority only changes when the date changes, so list views parse
+    each distinct due date at most once a day.
+    """
+    return _priority_on(due_date_str, date.today())
+
 def get_priority_color(priority):
     """Return CSS class for priority color"""
     colors = {
@@ -141,66 +255,82 @@ def get_next_occurrence_date(due_date_str, pattern):
     except Exception:
         return None
 
-def check_and_handle_notifications(todos):
-    """Check for priority changes and create notifications"""
-    notifications = []
-    for idx, todo in enumerate(todos, 1):
-        if todo.get('deleted') or todo.get('saved'):
-            continue
-        current_priority = calculate_priority(todo.get('due', ''))
-        previous_priority = todo.get('previous_priority', None)
-        # If priority changed, log notification
-        if previous_priority and previous_priority != current_priority:
-            notifications.append({
-                'type': 'priority_change',
-                'task': todo.get('task'),
-                'old_priority': previous_priority,
-                'new_priority': current_priority,
-                'timestamp': datetime.now().isoformat()
-            })
-        # Update previous priority for next check
-        todo['previous_priority'] = current_priority
-    return notifications
+# Bring data files written by older versions to the current schema (this
+# also moves deleted and saved tasks out of todos.json). A file that cannot
+# be parsed is left alone for `main.py fsck` to report.
+try:
+    schema.ensure_current(TODO_FILE)
+except schema.SchemaError:
+    pass
+
+# Priority-threshold crossings are tracked by a heap-based scheduler instead
+# of re-deriving every task's priority on each request.
+notification_scheduler = NotificationScheduler()
+notification_scheduler.rebuild(task_index.get().todos)
+
+def sync_notifications(*todos):
+    """Reschedule notifications for tasks that were just changed"""
+    for todo in todos:
+        notification_scheduler.track(todo)
+
+def sync_changed_tasks(events):
+    """Follow changes to todos.json, including those made outside the app"""
+    for event in events:
+        if event['record'] is None:
+            notification_scheduler.forget(event['id'])
+        else:
+            notification_scheduler.track(event['record'])
+
+task_changes.subscribe(sync_changed_tasks)
+
+# Typeahead over task titles, following task_changes task by task
+suggest_index = suggest.SuggestIndex()
+task_changes.subscribe(suggest_index.apply)
+
+def task_suggestions():
+    """suggest_index, built on first use. Shared snapshot mode publishes no
+    change events, so there it is rebuilt for each new version."""
+    snapshot = task_index.get()
+    if not suggest_index.loaded or (SHARED_SNAPSHOT_FILE and suggest_index.source is not snapshot):
+        suggest_index.build(snapshot.todos, snapshot)
+    return suggest_index
 
-def get_high_priority_reminder(todos):
+def get_high_priority_reminder(snapshot):
     """Get count and summary of high priority tasks for daily reminder"""
+    table = snapshot.table
+    today = date.today()
+    pending = table.mask(clear_flags=columnar.COMPLETED | columnar.DELETED | columnar.SAVED)
+    urgent = table.priority_mask(today, ('HIGH', 'OVERDUE'), pending)
+    priorities = table.priorities(today)
     high_priority_tasks = []
-    for todo in todos:
-        if not todo.get('completed') and not todo.get('deleted') and not todo.get('saved'):
-            priority = calculate_priority(todo.get('due', ''))
-            if priority in ['HIGH', 'OVERDUE']:
-                high_priority_tasks.append({
-                    'task': todo.get('task'),
-                    'priority': priority,
-                    'due': todo.get('due')
-                })
+    for idx in table.positions(urgent):
+        todo = snapshot.todos[idx - 1]
+        high_priority_tasks.append({
+            'task': todo['task'],
+            'priority': priorities[idx - 1],
+            'due': todo['due']
+        })
     return high_priority_tasks
 
+def next_occurrence(todo):
+    """The next instance of a recurring task, or None"""
+    pattern = todo['recurrence']
+    if pattern and pattern != 'none':
+        next_due = get_next_occurrence_date(todo['due'], pattern)
+        if next_due:
+            return schema.new_record(todo['task'], next_due, todo['description'],
+                                     pattern, todo['project'], todo['tags'],
+                                     indexes.parent_path(todo['path']) or None)
+    return None
+
 def handle_recurring_task_completion(todos, idx):
     """When a recurring task is marked complete, create next occurrence"""
     if idx < 1 or idx > len(todos):
         return
-    todo = todos[idx - 1]
-    pattern = todo.get('recurrence')
-    if pattern and pattern != 'none':
-        next_due = get_next_occurrence_date(todo.get('due', ''), pattern)
-        if next_due:
-            # Create a new task for next occurrence
-            new_todo = {
-                'task': todo.get('task'),
-                'due': next_due,
-                'description': todo.get('description', ''),
-                'recurrence': pattern,
-                'completed': False,
-                'completed_at': None,
-                'deleted': False,
-                'deleted_at': None,
-                'saved': False,
-                'saved_at': None,
-                'previous_priority': None
-            }
-            todos.append(new_todo)
-            save_todos(todos)
+    new_todo = next_occurrence(todos[idx - 1])
+    if new_todo:
+        todos.append(new_todo)
+        sync_notifications(new_todo)
 
 # ============================================================================
 # JINJA2 CONTEXT PROCESSOR - Make functions available in templates
@@ -208,13 +338,189 @@ def handle_recurring_task_completion(todos, idx):
 
 @app.context_processor
 def inject_template_functions():
-    """Inject utility functions into Jinja2 template context"""
+    """Inject utility functions into Jinja2 template context.
+
+    Only O(1) helpers belong here. Anything that scans tasks or parses dates
+    is computed in the view and handed over as a view model.
+    """
     return {
-        'calculate_priority': calculate_priority,
         'get_priority_color': get_priority_color,
-        'get_high_priority_reminder': get_high_priority_reminder
+        'vapid_public_key': VAPID_PUBLIC_KEY
     }
 
+# ============================================================================
+# VIEW MODELS - only the fields each template renders
+# ============================================================================
+
+VIEW_FIELDS = {
+    'dashboard.html': ('task', 'due', 'priority', 'priority_color'),
+    'pending.html': ('task', 'description', 'due', 'project', 'tags', 'priority', 'priority_color'),
+    'completed.html': ('task', 'description', 'due', 'priority', 'priority_color'),
+    'deleted.html': ('task', 'description', 'due', 'days_until_permanent'),
+    'overdue.html': ('task', 'due', 'priority'),
+    'saved.html': ('task', 'due', 'completed'),
+    'search.html': ('task', 'description', 'due', 'completed', 'priority', 'priority_color'),
+    'calendar.html': ('task', 'due', 'completed', 'priority', 'priority_color'),
+}
+
+def task_view(todo, idx, template, priority=None):
+    """Build the minimal, precomputed view model of one task for a template.
+
+    The stored record is never mutated, so view-only keys (idx, priority, ...)
+    cannot leak back into todos.json.
+    """
+    fields = VIEW_FIELDS[template]
+    view = {'idx': idx, 'id': todo['id']}
+    for field in fields:
+        if field == 'priority' or field == 'priority_color':
+            if priority is None:
+                priority = day_priority(todo['due'])
+            view['priority'] = priority
+            view['priority_color'] = get_priority_color(priority)
+        elif field == 'completed':
+            view['completed'] = todo['completed']
+        elif field == 'days_until_permanent':
+            view['days_until_permanent'] = days_until_permanent(todo)
+        else:
+            view[field] = todo[field]
+    return view
+
+def days_until_permanent(todo):
+    """Days left before a deleted task is purged by cleanup_deleted"""
+    if not todo['deleted_at']:
+        return DELETED_RETENTION.days
+    try:
+        deleted_at = datetime.fromisoformat(todo['deleted_at'])
+    except ValueError:
+        return DELETED_RETENTION.days
+    return max(0, DELETED_RETENTION.days - (datetime.now() - deleted_at).days)
+
+# ============================================================================
+# COMPRESSION AND STATIC ASSET CACHING
+# ============================================================================
+
+# Fingerprinted static URLs never change content, so they can be cached forever
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+# Third-party assets the service worker precaches alongside our own
+CDN_ASSETS = [
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'
+]
+PRECACHE_STATIC = ['css/style.css', 'js/main.js', 'js/db.js']
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    """url_for('static', ...) appends ?v=<content hash>"""
+    if endpoint == 'static' and 'filename' in values and 'v' not in values:
+        digest = assets.fingerprint(values['filename'])
+        if digest:
+            values['v'] = digest
+
+@app.before_request
+def serve_precompressed_static():
+    """Serve a precompressed gzip/brotli variant of static files when accepted"""
+    if request.endpoint != 'static':
+        return None
+    filename = request.view_args.get('filename', '')
+    if not assets.is_compressible(filename):
+        return None
+    encoding = assets.negotiate(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return None
+    try:
+        path = assets.precompress(filename, encoding)
+    except (OSError, ValueError):
+        return None
+    if not path:
+        return None
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0], conditional=True)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+# Views the service worker serves stale-while-revalidate; they carry ETags so
+# revalidation is a cheap 304 when nothing changed
+ETAG_TYPES = ('text/html', 'application/json')
+
+@app.after_request
+def compress_and_cache(response):
+    """Cache headers for static files, ETags and on-the-fly compression of HTML/JSON"""
+    response.vary.add('Accept-Encoding')
+    if request.endpoint == 'static':
+        filename = (request.view_args or {}).get('filename', '')
+        if request.args.get('v') and request.args.get('v') == assets.fingerprint(filename):
+            response.headers['Cache-Control'] = IMMUTABLE_CACHE
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    if (request.method == 'GET' and response.status_code == 200 and response.mimetype in ETAG_TYPES
+            and not response.direct_passthrough and not response.is_streamed):
+        # Weak, because the bytes on the wire depend on the negotiated encoding
+        response.add_etag(weak=True)
+        response.make_conditional(request)
+
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code != 200
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in assets.COMPRESSIBLE_TYPES):
+        return response
+    data = response.get_data()
+    if len(data) < assets.MIN_COMPRESS_SIZE:
+        return response
+    encoding = assets.negotiate(request.headers.get('Accept-Encoding'))
+    if not encoding:
+        return response
+    response.set_data(assets.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def precache_manifest():
+    """Fingerprinted URLs for the service worker to precache, plus a version
+    that changes whenever any of them does"""
+    urls = ['/'] + [url_for('static', filename=f) for f in PRECACHE_STATIC] + CDN_ASSETS
+    version = hashlib.sha256('\n'.join(urls).encode('utf-8')).hexdigest()[:12]
+    return {'version': version, 'urls': urls}
+
+# ============================================================================
+# ADMISSION CONTROL - rate limiting and a bounded write queue for mutations
+# ============================================================================
+
+MUTATION_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
+rate_limiter = admission.RateLimiter(MUTATION_RATE, MUTATION_BURST)
+write_queue = admission.WriteQueue(MAX_PENDING_WRITES, WRITE_TIMEOUT)
+
+def too_many_requests(retry_after, error):
+    response = jsonify({'success': False, 'error': error})
+    response.status_code = 429
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+@app.before_request
+def admit_mutation():
+    """Rate limit mutations per client, then wait for a turn to write (or
+    shed the request when too many are already waiting)"""
+    if request.method not in MUTATION_METHODS or request.endpoint in (None, 'static'):
+        return None
+    # Admin routes are not rate limited, but their writes still take a turn
+    if not request.endpoint.startswith('admin_'):
+        retry_after = rate_limiter.check(request.remote_addr or 'unknown')
+        if retry_after:
+            return too_many_requests(retry_after, 'Too many requests. Slow down and retry later.')
+    started = write_queue.enter()
+    if started is None:
+        return too_many_requests(write_queue.retry_after(), 'Server is busy. Retry later.')
+    g.write_started = started
+    return None
+
+@app.teardown_request
+def release_write_turn(exc):
+    started = g.pop('write_started', None)
+    if started is not None:
+        write_queue.leave(started)
+
 # ============================================================================
 # PWA ROUTES
 # ============================================================================
@@ -223,194 +529,183 @@ def inject_template_functions():
 def manifest():
     """Serve PWA manifest for installation"""
     manifest_path = os.path.join(os.path.dirname(__file__), 'manifest.json')
-    return send_file(manifest_path, mimetype='application/manifest+json')
+    with open(manifest_path, 'rb') as f:
+        response = app.response_class(f.read(), mimetype='application/manifest+json')
+    response.headers['Cache-Control'] = 'public, max-age=86400'
+    return response.make_conditional(request)
 
 @app.route('/service-worker.js')
 def service_worker():
-    """Serve service worker for offline support and caching"""
+    """Serve service worker for offline support and caching.
+
+    The precache list is generated from the static asset hashes and injected
+    at the top of the script; the worker itself is always revalidated so
+    clients pick up new versions promptly.
+    """
     sw_path = os.path.join(os.path.dirname(__file__), 'static', 'js', 'service-worker.js')
-    return send_file(sw_path, mimetype='application/javascript')
+    with open(sw_path, 'r') as f:
+        script = f'self.PRECACHE_MANIFEST = {json.dumps(precache_manifest())};\n' + f.read()
+    response = app.response_class(script, mimetype='application/javascript')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
 # ============================================================================
 # ROUTES
 # ============================================================================
 
-def sort_tasks(tasks, sort_by='alpha-asc'):
-    """Sort tasks by different criteria"""
-    if sort_by == 'alpha-asc':
-        return sorted(tasks, key=lambda t: t.get('task', '').lower())
-    elif sort_by == 'alpha-desc':
-        return sorted(tasks, key=lambda t: t.get('task', '').lower(), reverse=True)
-    elif sort_by == 'date-oldest':
-        def parse_date(date_str):
-            try:
-                return datetime.strptime(date_str, '%m/%d/%Y')
-            except:
-                return datetime.max
-        return sorted(tasks, key=lambda t: parse_date(t.get('due', '')))
-    elif sort_by == 'date-newest':
-        def parse_date(date_str):
-            try:
-                return datetime.strptime(date_str, '%m/%d/%Y')
-            except:
-                return datetime.max
-        return sorted(tasks, key=lambda t: parse_date(t.get('due', '')), reverse=True)
-    return tasks
+# sort= values: (field, descending)
+SORT_ORDERS = {
+    'alpha-asc': ('task', False),
+    'alpha-desc': ('task', True),
+    'date-oldest': ('due', False),
+    'date-newest': ('due', True),
+}
+
+@lru_cache(maxsize=4096)
+def due_sort_key(date_str):
+    """Due date for sorting; undated and malformed tasks sort last"""
+    try:
+        return datetime.strptime(date_str, '%m/%d/%Y')
+    except (TypeError, ValueError):
+        return datetime.max
+
+def sort_tasks(tasks, sort_by='alpha-asc', record=None):
+    """Sort tasks by different criteria. `record(item)` gives the task of
+    each item when the items are not the task dicts themselves."""
+    if sort_by not in SORT_ORDERS:
+        return tasks
+    field, descending = SORT_ORDERS[sort_by]
+    record = record or (lambda t: t)
+    if field == 'task':
+        key = lambda t: record(t).get('task', '').lower()
+    else:
+        key = lambda t: due_sort_key(record(t).get('due', ''))
+    return sorted(tasks, key=key, reverse=descending)
 
 @app.route('/')
 def dashboard():
     """Main dashboard showing all tasks organized by status"""
-    todos = cleanup_completed(load_todos())
-    todos = cleanup_deleted(todos)
+    snapshot = current_tasks()
+    priorities = snapshot.table.priorities(date.today())
     # default to showing oldest due date first unless user overrides
     sort_by = request.args.get('sort', 'date-oldest')
 
-    # Build active_todos from the full list so `idx` refers to the global todos index
-    active_todos = []
-    for i, t in enumerate(todos, 1):
-        if not t.get('deleted', False) and not t.get('saved', False):
-            t['idx'] = i
-            t['priority'] = calculate_priority(t.get('due', ''))
-            t['priority_color'] = get_priority_color(t['priority'])
-            active_todos.append(t)
+    # The hot store only holds active tasks, so `idx` is the global todos index
+    pending, completed, overdue = [], [], []
+    for i, t in enumerate(snapshot.todos, 1):
+        view = task_view(t, i, 'dashboard.html', priorities[i - 1])
+        if t['completed']:
+            completed.append(view)
+        else:
+            pending.append(view)
+            if view['priority'] == 'OVERDUE':
+                overdue.append(view)
 
-    # Filter by status from the active set
-    pending = [t for t in active_todos if not t.get('completed', False)]
-    completed = [t for t in active_todos if t.get('completed', False)]
-    overdue = [t for t in active_todos if not t.get('completed', False) and t.get('priority') == 'OVERDUE']
-
-    # Sort each section
-    pending = sort_tasks(pending, sort_by)
-    completed = sort_tasks(completed, sort_by)
-    overdue = sort_tasks(overdue, sort_by)
-    
-    saved = [t for t in todos if t.get('saved', False) and not t.get('deleted', False)]
-    deleted = [t for t in todos if t.get('deleted', False)]
-    
-    # Get high priority reminder
-    high_priority_reminder = get_high_priority_reminder(todos)
-    
-    return render_template('dashboard.html', 
-                         pending=pending,
-                         completed=completed,
-                         overdue=overdue,
-                         saved_count=len(saved),
-                         deleted_count=len(deleted),
-                         total=len(active_todos),
-                         sort_by=sort_by,
-                         high_priority_reminder=high_priority_reminder,
-                         high_priority_count=len(high_priority_reminder))
+    activity = task_rollups.series('day', ACTIVITY_DAYS)
+    return render_template('dashboard.html',
+                         activity=activity,
+                         activity_peak=max(bucket['completed'] for bucket in activity),
+                         pending=sort_tasks(pending, sort_by),
+                         completed=sort_tasks(completed, sort_by),
+                         overdue=sort_tasks(overdue, sort_by),
+                         total=len(pending) + len(completed),
+                         sort_by=sort_by)
 
 
 
 @app.route('/pending')
 def pending_tasks():
-    """View pending (incomplete) tasks"""
-    todos = cleanup_completed(load_todos())
-    todos = cleanup_deleted(todos)
-    pending = []
-    for idx, todo in enumerate(todos, 1):
-        if not todo.get('completed', False) and not todo.get('deleted', False):
-            todo['idx'] = idx
-            todo['priority'] = calculate_priority(todo.get('due', ''))
-            todo['priority_color'] = get_priority_color(todo['priority'])
-            pending.append(todo)
-    return render_template('pending.html', todos=pending)
+    """View pending (incomplete) tasks, optionally narrowed by ?tag= / ?project="""
+    snapshot = current_tasks()
+    todos = snapshot.todos
+    table = snapshot.table
+    pending = table.positions(table.mask(clear_flags=columnar.COMPLETED))
+    priorities = table.priorities(date.today())
+
+    facets = snapshot.facets
+    filters = {f: v for f, v in facet_filters().items() if f in ('tag', 'project')}
+    selected, counts = facets.select(filters, indexes.bitmap_from_positions(pending, facets.size))
+    views = [task_view(todos[idx - 1], idx, 'pending.html', priorities[idx - 1])
+             for idx in indexes.positions_from_bitmap(selected)]
+    return render_template('pending.html', todos=views, filters=filters,
+                           tag_counts=sorted(counts['tag'].items()),
+                           project_counts=sorted(counts['project'].items()))
 
 @app.route('/completed')
 def completed_tasks():
     """View completed tasks"""
-    todos = cleanup_completed(load_todos())
-    todos = cleanup_deleted(todos)
-    completed = []
-    for idx, todo in enumerate(todos, 1):
-        if todo.get('completed', False) and not todo.get('deleted', False):
-            todo['idx'] = idx
-            todo['priority'] = calculate_priority(todo.get('due', ''))
-            todo['priority_color'] = get_priority_color(todo['priority'])
-            completed.append(todo)
+    snapshot = current_tasks()
+    table = snapshot.table
+    priorities = table.priorities(date.today())
+    completed = [task_view(snapshot.todos[idx - 1], idx, 'completed.html', priorities[idx - 1])
+                 for idx in table.positions(table.mask(columnar.COMPLETED))]
     return render_template('completed.html', todos=completed)
 
 @app.route('/deleted')
 def deleted_tasks():
-    """View deleted tasks"""
-    todos = load_todos()
-    deleted = []
-    for idx, todo in enumerate(todos, 1):
-        if todo.get('deleted', False):
-            todo['idx'] = idx
-            todo['priority'] = calculate_priority(todo.get('due', ''))
-            todo['priority_color'] = get_priority_color(todo['priority'])
-            if todo.get('deleted_at'):
-                deleted_at = datetime.fromisoformat(todo['deleted_at'])
-                days_deleted = (datetime.now() - deleted_at).days
-                todo['days_until_permanent'] = max(0, 3 - days_deleted)
-            deleted.append(todo)
+    """View deleted tasks; `idx` is the position in the trash segment"""
+    trash = current_trash().todos
+    deleted = [task_view(todo, idx, 'deleted.html') for idx, todo in enumerate(trash, 1)]
     return render_template('deleted.html', todos=deleted)
 
 @app.route('/overdue')
 def overdue_tasks():
-    """View overdue tasks"""
-    todos = cleanup_completed(load_todos())
-    todos = cleanup_deleted(todos)
+    """View overdue tasks (due today or earlier), straight from the due date index"""
+    snapshot = task_index.get()
     overdue = []
-    for idx, todo in enumerate(todos, 1):
-        if not todo.get('deleted', False) and not todo.get('saved', False):
-            priority = calculate_priority(todo.get('due', ''))
-            if priority == 'OVERDUE':
-                todo['idx'] = idx
-                todo['priority'] = priority
-                todo['priority_color'] = get_priority_color(priority)
-                overdue.append(todo)
+    for idx in snapshot.due.range(end=date.today()):
+        overdue.append(task_view(snapshot.todos[idx - 1], idx, 'overdue.html', 'OVERDUE'))
     return render_template('overdue.html', todos=overdue)
 
 @app.route('/saved')
 def saved_tasks():
-    """View saved/archived tasks"""
-    todos = cleanup_completed(load_todos())
-    todos = cleanup_deleted(todos)
-    saved = []
-    for idx, todo in enumerate(todos, 1):
-        if todo.get('saved', False) and not todo.get('deleted', False):
-            todo['idx'] = idx
-            todo['priority'] = calculate_priority(todo.get('due', ''))
-            todo['priority_color'] = get_priority_color(todo['priority'])
-            saved.append(todo)
+    """View saved/archived tasks; `idx` is the position in the archive segment"""
+    archive = load_segment(ARCHIVE_FILE)
+    saved = [task_view(todo, idx, 'saved.html') for idx, todo in enumerate(archive, 1)]
     return render_template('saved.html', todos=saved)
 
 @app.route('/add', methods=['GET', 'POST'])
 def add_task():
-    """Add a new task"""
+    """Add a new task, or a subtask of the active task given as ?parent= / parent=<id>"""
+    parent_id = (request.form.get('parent') or request.args.get('parent') or '').strip()
+    parent = None
+    if parent_id:
+        snapshot = task_index.get()
+        position = snapshot.by_id.get(parent_id)
+        if position is None:
+            return render_template('add_task.html', error='Parent task not found.'), 400
+        parent = snapshot.todos[position - 1]
+        if indexes.path_depth(parent['path']) >= MAX_SUBTASK_DEPTH:
+            return render_template('add_task.html', parent=parent,
+                                   error=f'Subtasks cannot be nested more than {MAX_SUBTASK_DEPTH} levels deep.'), 400
+    
     if request.method == 'POST':
         task = request.form.get('task', '').strip()
         due = request.form.get('due', '').strip()
         description = request.form.get('description', '').strip()
         recurrence = request.form.get('recurrence', 'none').strip()
+        project = request.form.get('project', '').strip()
+        tags = indexes.parse_tags(request.form.get('tags', ''))
         
         if not task:
-            return render_template('add_task.html', error='Task name cannot be empty.'), 400
+            return render_template('add_task.html', parent=parent, error='Task name cannot be empty.'), 400
         
         if not validate_due_date(due):
-            return render_template('add_task.html', error='Invalid date format. Use mm/dd/yyyy.'), 400
+            return render_template('add_task.html', parent=parent, error='Invalid date format. Use mm/dd/yyyy.'), 400
         
         todos = load_todos()
-        todos.append({
-            'task': task,
-            'due': due,
-            'description': description,
-            'recurrence': recurrence,
-            'completed': False,
-            'completed_at': None,
-            'deleted': False,
-            'deleted_at': None,
-            'saved': False,
-            'saved_at': None,
-            'previous_priority': None
-        })
+        new_todo = schema.new_record(task, due, description, recurrence, project, tags,
+                                     parent['path'] if parent else None)
+        todos.append(new_todo)
         save_todos(todos)
+        sync_notifications(new_todo)
+        record_history(history.diff(None, new_todo))
+        if parent:
+            return redirect(url_for('edit_task', idx=task_index.get().by_id[parent['id']]))
         return redirect(url_for('dashboard'))
     
-    return render_template('add_task.html')
+    return render_template('add_task.html', parent=parent)
 
 @app.route('/edit/<int:idx>', methods=['GET', 'POST'])
 def edit_task(idx):
@@ -424,6 +719,8 @@ def edit_task(idx):
         due = request.form.get('due', '').strip()
         description = request.form.get('description', '').strip()
         recurrence = request.form.get('recurrence', 'none').strip()
+        project = request.form.get('project', '').strip()
+        tags = indexes.parse_tags(request.form.get('tags', ''))
         
         if not task:
             todo = todos[idx - 1]
@@ -433,15 +730,21 @@ def edit_task(idx):
             todo = todos[idx - 1]
             return render_template('edit_task.html', idx=idx, todo=todo, error='Invalid date format. Use mm/dd/yyyy.'), 400
         
+        before = dict(todos[idx - 1])
         todos[idx - 1]['task'] = task
         todos[idx - 1]['due'] = due
         todos[idx - 1]['description'] = description
         todos[idx - 1]['recurrence'] = recurrence
+        todos[idx - 1]['project'] = project
+        todos[idx - 1]['tags'] = tags
         save_todos(todos)
+        sync_notifications(todos[idx - 1])
+        record_history(history.diff(before, todos[idx - 1]))
         return redirect(url_for('dashboard'))
     
     todo = todos[idx - 1]
-    return render_template('edit_task.html', idx=idx, todo=todo)
+    subtasks, rollup = subtask_views(task_index.get(), idx)
+    return render_template('edit_task.html', idx=idx, todo=todo, subtasks=subtasks, rollup=rollup)
 
 @app.route('/complete/<int:idx>', methods=['POST'])
 def complete_task(idx):
@@ -450,8 +753,11 @@ def complete_task(idx):
     if idx < 1 or idx > len(todos):
         return jsonify({'success': False}), 400
     
+    todo = todos[idx - 1]
+    before = dict(todo)
+    count = len(todos)
     # Toggle the completed status
-    if todos[idx - 1].get('completed', False):
+    if todos[idx - 1]['completed']:
         # If already completed, mark as incomplete
         todos[idx - 1]['completed'] = False
         todos[idx - 1]['completed_at'] = None
@@ -462,116 +768,163 @@ def complete_task(idx):
         # If recurring, create next occurrence
         handle_recurring_task_completion(todos, idx)
     
+    created = todos[count:]
     todos = cleanup_completed(todos)
-    # Check for priority changes and store for notifications
-    check_and_handle_notifications(todos)
     save_todos(todos)
+    sync_notifications(todo)
+    record_history(history.diff(before, todo), *(history.diff(None, t) for t in created))
     return jsonify({'success': True})
 
+def place_tasks(*todos):
+    """Append tasks to the segments their flags put them in (hot, trash or
+    archive), one append per segment"""
+    by_tier = {}
+    for todo in todos:
+        by_tier.setdefault(storage.tier_of(todo), []).append(todo)
+    paths = storage.segment_paths(TODO_FILE)
+    for tier, records in by_tier.items():
+        storage.append_segment(paths[tier], records)
+        for todo in records:
+            if tier == storage.HOT:
+                sync_notifications(todo)
+            else:
+                notification_scheduler.forget(todo['id'])
+
 @app.route('/delete/<int:idx>', methods=['POST'])
 def delete_task(idx):
-    """Soft delete a task - move to trash"""
-    todos = load_todos()
-    if idx < 1 or idx > len(todos):
-        return jsonify({'success': False}), 400
+    """Soft delete a task and its subtasks - move them to the trash segment.
+
+    `idx` indexes the active list, or the archive with ?from=saved.
+    """
+    from_archive = request.args.get('from') == 'saved'
+    if from_archive:
+        todos = load_segment(ARCHIVE_FILE)
+        if idx < 1 or idx > len(todos):
+            return jsonify({'success': False}), 400
+        # The archive is not indexed; its subtrees are picked by path prefix
+        parent = todos[idx - 1]
+        positions = [idx] + [i for i, t in enumerate(todos, 1) if is_subtask_of(t, parent)]
+    else:
+        snapshot = task_index.get()
+        todos = snapshot.todos
+        if idx < 1 or idx > len(todos):
+            return jsonify({'success': False}), 400
+        positions = subtree_positions(snapshot, idx)
     
-    # Mark as deleted instead of removing
-    todos[idx - 1]['deleted'] = True
-    todos[idx - 1]['deleted_at'] = datetime.now().isoformat()
-    save_todos(todos)
+    # Mark the task and its subtasks as deleted instead of removing them
+    moved, remaining, changes = flag_subtree(todos, positions, 'deleted', True)
+    # Write the destination first: a crash in between duplicates, never loses
+    place_tasks(*moved)
+    if from_archive:
+        storage.save_segment(ARCHIVE_FILE, remaining)
+    else:
+        save_todos(remaining)
+    record_history(*changes)
     return jsonify({'success': True})
 
 @app.route('/restore/<int:idx>', methods=['POST'])
 def restore_task(idx):
-    """Restore a deleted task"""
-    todos = load_todos()
-    if idx < 1 or idx > len(todos):
+    """Restore a deleted task and its deleted subtasks (`idx` indexes the trash)"""
+    trash = current_trash()
+    if idx < 1 or idx > len(trash.todos):
         return jsonify({'success': False}), 400
     
-    if todos[idx - 1].get('deleted', False):
-        todos[idx - 1]['deleted'] = False
-        todos[idx - 1]['deleted_at'] = None
-        save_todos(todos)
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False}), 400
+    moved, remaining, changes = flag_subtree(trash.todos, subtree_positions(trash, idx), 'deleted', False)
+    place_tasks(*moved)
+    storage.save_segment(TRASH_FILE, remaining)
+    record_history(*changes)
+    return jsonify({'success': True})
 
 @app.route('/permanent-delete/<int:idx>', methods=['POST'])
 def permanent_delete(idx):
-    """Permanently delete a task"""
-    todos = load_todos()
-    if idx < 1 or idx > len(todos):
+    """Permanently delete a task and its subtasks (`idx` indexes the trash)"""
+    trash = current_trash()
+    if idx < 1 or idx > len(trash.todos):
         return jsonify({'success': False}), 400
     
-    todos.pop(idx - 1)
-    save_todos(todos)
+    # Subtasks restored or archived on their own would be left pointing at
+    # a task that no longer exists
+    todo = trash.todos[idx - 1]
+    if has_subtasks(TODO_FILE, todo) or has_subtasks(ARCHIVE_FILE, todo):
+        return jsonify({'success': False,
+                        'error': 'This task has subtasks outside the trash. Delete them first.'}), 409
+    positions = subtree_positions(trash, idx)
+    selected = set(positions)
+    storage.save_segment(TRASH_FILE, [t for i, t in enumerate(trash.todos, 1) if i not in selected])
+    record_history(*(history.diff(trash.todos[i - 1], None) for i in positions))
     return jsonify({'success': True})
 
 @app.route('/save/<int:idx>', methods=['POST'])
 def save_task(idx):
-    """Save/archive a completed task"""
-    todos = load_todos()
-    if idx < 1 or idx > len(todos):
+    """Save/archive a completed task and its subtasks - move them to the
+    archive segment"""
+    snapshot = task_index.get()
+    if idx < 1 or idx > len(snapshot.todos):
         return jsonify({'success': False}), 400
     
-    todos[idx - 1]['saved'] = True
-    todos[idx - 1]['saved_at'] = datetime.now().isoformat()
-    save_todos(todos)
+    moved, remaining, changes = flag_subtree(snapshot.todos, subtree_positions(snapshot, idx), 'saved', True)
+    place_tasks(*moved)
+    save_todos(remaining)
+    record_history(*changes)
     return jsonify({'success': True})
 
 @app.route('/unsave/<int:idx>', methods=['POST'])
 def unsave_task(idx):
-    """Unsave/unarchive a task"""
-    todos = load_todos()
-    if idx < 1 or idx > len(todos):
+    """Unsave/unarchive a task and its archived subtasks (`idx` indexes the archive)"""
+    archive = load_segment(ARCHIVE_FILE)
+    if idx < 1 or idx > len(archive):
         return jsonify({'success': False}), 400
     
-    if todos[idx - 1].get('saved', False):
-        todos[idx - 1]['saved'] = False
-        todos[idx - 1]['saved_at'] = None
-        save_todos(todos)
-        return jsonify({'success': True})
-    
-    return jsonify({'success': False}), 400
+    parent = archive[idx - 1]
+    positions = [idx] + [i for i, t in enumerate(archive, 1) if is_subtask_of(t, parent)]
+    moved, remaining, changes = flag_subtree(archive, positions, 'saved', False)
+    place_tasks(*moved)
+    storage.save_segment(ARCHIVE_FILE, remaining)
+    record_history(*changes)
+    return jsonify({'success': True})
 
 @app.route('/api/task/<int:idx>')
 def get_task_details(idx):
     """Get task details for modal display"""
-    todos = load_todos()
+    todos = task_index.get().todos
     if idx < 1 or idx > len(todos):
         return jsonify({'success': False}), 400
     
     todo = todos[idx - 1]
     return jsonify({
         'success': True,
-        'task': todo.get('task', ''),
-        'description': todo.get('description', ''),
-        'due': todo.get('due', 'N/A'),
-        'priority': calculate_priority(todo.get('due', '')),
-        'completed': todo.get('completed', False),
-        'deleted': todo.get('deleted', False),
-        'saved': todo.get('saved', False)
+        'task': todo['task'],
+        'description': todo['description'],
+        'due': todo['due'],
+        'project': todo['project'],
+        'tags': todo['tags'],
+        'priority': calculate_priority(todo['due']),
+        'completed': todo['completed'],
+        'deleted': todo['deleted'],
+        'saved': todo['saved']
     })
 
 @app.route('/search')
 def search():
     """Search tasks across all statuses"""
     query = request.args.get('q', '').strip().lower()
-    todos = load_todos()
+    todos = task_index.get().todos
     
     if not query:
         matches = []
     else:
-        matches = []
-        for idx, todo in enumerate(todos, 1):
-            if query in todo.get('task', '').lower() or query in todo.get('description', '').lower():
-                todo['idx'] = idx
-                todo['priority'] = calculate_priority(todo.get('due', ''))
-                todo['priority_color'] = get_priority_color(todo['priority'])
-                matches.append(todo)
+        matches = [task_view(todo, idx, 'search.html') for idx, todo in enumerate(todos, 1)
+                   if query in todo['task'].lower() or query in todo['description'].lower()]
     
     return render_template('search.html', query=query, matches=matches)
 
+@app.route('/api/suggest')
+def suggest_tasks():
+    """Typeahead: tasks whose title words start with the words typed in ?q="""
+    limit = max(1, min(request.args.get('limit', suggest.DEFAULT_LIMIT, type=int), suggest.MAX_LIMIT))
+    suggestions = task_suggestions().suggest(request.args.get('q', ''), limit)
+    return jsonify({'success': True, 'count': len(suggestions), 'suggestions': suggestions})
+
 @app.route('/api/bulk-action', methods=['POST'])
 def bulk_action():
     """Handle bulk actions on multiple tasks"""
@@ -587,28 +940,757 @@ def bulk_action():
     # Sort indices in reverse to delete from end first (avoid index shifting)
     sorted_indices = sorted([int(i) for i in indices], reverse=True)
     
+    changes = []
     if action == 'delete':
+        # Subtasks are deleted with their parents
+        tree = indexes.PathIndex(todos)
+        selected = set()
         for idx in sorted_indices:
             if 1 <= idx <= len(todos):
-                todos.pop(idx - 1)
+                selected.update(tree.subtree(todos[idx - 1]['path']))
+        for idx in sorted(selected, reverse=True):
+            removed = todos.pop(idx - 1)
+            notification_scheduler.forget(removed['id'])
+            changes.append(history.diff(removed, None))
     elif action == 'complete':
         for idx in sorted_indices:
             if 1 <= idx <= len(todos):
+                before = dict(todos[idx - 1])
                 todos[idx - 1]['completed'] = True
                 todos[idx - 1]['completed_at'] = datetime.now().isoformat()
+                notification_scheduler.forget(todos[idx - 1]['id'])
+                changes.append(history.diff(before, todos[idx - 1]))
     
     todos = cleanup_completed(todos)
     save_todos(todos)
+    record_history(*changes)
     return jsonify({'success': True})
 
+# ============================================================================
+# BATCHED REPLAY OF OFFLINE MUTATIONS
+# ============================================================================
+
+# Ops are absolute (complete / uncomplete instead of a toggle) and address
+# tasks by id, so they stay correct however late or often they are replayed.
+BATCH_OPS = ('complete', 'uncomplete', 'delete', 'restore', 'save', 'unsave', 'edit')
+# Ops applied to a task's subtasks (in the same segment) too
+CASCADE_OPS = ('delete', 'restore')
+EDITABLE_FIELDS = ('task', 'due', 'description', 'recurrence', 'project', 'tags')
+MAX_BATCH_OPS = 500
+
+idempotency_store = IdempotencyStore()
+
+def load_tiers():
+    """Every segment by tier, plus a map of all tasks by id"""
+    paths = storage.segment_paths(TODO_FILE)
+    segments = {tier: load_todos() if tier == storage.HOT else load_segment(path)
+                for tier, path in paths.items()}
+    records = {t['id']: t for tier in segments.values() for t in tier}
+    return paths, segments, records
+
+def save_tiers(paths, segments, dirty, created=(), removed=()):
+    """Re-partition the tasks of load_tiers() after changes: tasks whose
+    flags changed move to their new segment, `created` tasks are added and
+    the ids in `removed` dropped. Only the `dirty` segments are written."""
+    placed = {tier: [] for tier in segments}
+    for records_in_tier in segments.values():
+        for todo in records_in_tier:
+            if todo['id'] not in removed:
+                placed[storage.tier_of(todo)].append(todo)
+    for todo in created:
+        placed[storage.tier_of(todo)].append(todo)
+    for tier in dirty:
+        if tier == storage.HOT:
+            save_todos(cleanup_completed(placed[tier]))
+        else:
+            storage.save_segment(paths[tier], placed[tier])
+
+def apply_task_op(todo, op, fields=None):
+    """Apply one batch op to a task record; returns 'applied' or 'noop'.
+
+    Raises ValueError for invalid edit fields. Moving the task to the
+    segment matching its new flags is left to the caller.
+    """
+    now = datetime.now().isoformat()
+    if op == 'complete' or op == 'uncomplete':
+        done = op == 'complete'
+        if todo['completed'] == done:
+            return 'noop'
+        todo['completed'] = done
+        todo['completed_at'] = now if done else None
+    elif op == 'delete' or op == 'restore':
+        deleted = op == 'delete'
+        if todo['deleted'] == deleted:
+            return 'noop'
+        todo['deleted'] = deleted
+        todo['deleted_at'] = now if deleted else None
+    elif op == 'save' or op == 'unsave':
+        saved = op == 'save'
+        if todo['saved'] == saved:
+            return 'noop'
+        todo['saved'] = saved
+        todo['saved_at'] = now if saved else None
+    elif op == 'edit':
+        updates = {f: indexes.parse_tags(v) if f == 'tags' else str(v).strip()
+                   for f, v in (fields or {}).items() if f in EDITABLE_FIELDS}
+        if 'task' in updates and not updates['task']:
+            raise ValueError('Task name cannot be empty.')
+        if 'due' in updates and not validate_due_date(updates['due']):
+            raise ValueError('Invalid date format. Use mm/dd/yyyy.')
+        if all(todo.get(f) == v for f, v in updates.items()):
+            return 'noop'
+        todo.update(updates)
+    return 'applied'
+
+@app.route('/api/batch', methods=['POST'])
+def batch_mutations():
+    """Apply a client outbox in one request: one load, one save.
+
+    Body: {"ops": [{"key": ..., "op": ..., "id": <task id>, "fields": {...}}]}
+    Each op reports its own status; a key seen before returns its original
+    result without being applied again.
+    """
+    data = request.get_json(silent=True) or {}
+    ops = data.get('ops')
+    if not isinstance(ops, list) or not ops:
+        return jsonify({'success': False, 'error': 'Invalid request'}), 400
+    if len(ops) > MAX_BATCH_OPS:
+        return jsonify({'success': False, 'error': f'At most {MAX_BATCH_OPS} ops per batch'}), 413
+    
+    results = []
+    changed = {}
+    originals = {}
+    created = []
+    with idempotency_store.lock:
+        # Ops can target tasks in any tier (e.g. restore from the trash)
+        paths, segments, records = load_tiers()
+        dirty = set()
+        for entry in ops:
+            if not isinstance(entry, dict):
+                results.append({'key': None, 'status': 'invalid', 'error': 'Op must be an object'})
+                continue
+            key = entry.get('key')
+            if not isinstance(key, str) or not key or len(key) > 128:
+                results.append({'key': key, 'status': 'invalid', 'error': 'Missing idempotency key'})
+                continue
+            previous = idempotency_store.get(key)
+            if previous is not None:
+                results.append(dict(previous, key=key, replayed=True))
+                continue
+            
+            op = entry.get('op')
+            todo = records.get(entry.get('id'))
+            if op not in BATCH_OPS:
+                result = {'status': 'invalid', 'error': f'Unknown op: {op}'}
+            elif todo is None:
+                result = {'status': 'not_found'}
+            else:
+                tier = storage.tier_of(todo)
+                before = dict(todo)
+                try:
+                    result = {'status': apply_task_op(todo, op, entry.get('fields'))}
+                except ValueError as e:
+                    result = {'status': 'invalid', 'error': str(e)}
+                if result['status'] == 'applied':
+                    changed[todo['id']] = todo
+                    originals.setdefault(todo['id'], before)
+                    dirty.update((tier, storage.tier_of(todo)))
+                    # Deleting or restoring takes the subtasks along, as
+                    # /delete and /restore do
+                    if op in CASCADE_OPS:
+                        for subtask in [t for t in records.values()
+                                        if is_subtask_of(t, todo) and storage.tier_of(t) == tier]:
+                            subtask_before = dict(subtask)
+                            if apply_task_op(subtask, op) == 'applied':
+                                changed[subtask['id']] = subtask
+                                originals.setdefault(subtask['id'], subtask_before)
+                    new_todo = next_occurrence(todo) if op == 'complete' else None
+                    if new_todo:
+                        created.append(new_todo)
+                        records[new_todo['id']] = new_todo
+                        dirty.add(storage.HOT)
+            idempotency_store.remember(key, result)
+            results.append(dict(result, key=key))
+        
+        if changed:
+            save_tiers(paths, segments, dirty, created)
+            sync_notifications(*changed.values(), *created)
+            record_history(*(history.diff(originals[i], t) for i, t in changed.items()),
+                           *(history.diff(None, t) for t in created))
+        idempotency_store.save()
+    
+    applied = sum(1 for r in results if r['status'] == 'applied' and not r.get('replayed'))
+    return jsonify({'success': True, 'applied': applied, 'results': results})
+
+# ============================================================================
+# FIELD-LEVEL TASK UPDATES - PATCH by task id with an If-Match precondition
+# ============================================================================
+
+# Flag fields a PATCH may set, with the batch ops setting them true / false
+FLAG_OPS = {'completed': ('complete', 'uncomplete'), 'deleted': ('delete', 'restore'),
+            'saved': ('save', 'unsave')}
+PATCH_FIELDS = EDITABLE_FIELDS + tuple(FLAG_OPS)
+
+def task_etag(todo):
+    """Version tag of a task record: a hash of its content"""
+    encoded = json.dumps(todo, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+def find_task(task_id):
+    """(segment path, record) of the task with id `task_id` in any tier,
+    or (None, None)"""
+    for path in storage.segment_paths(TODO_FILE).values():
+        todo = storage.read_record(path, task_id)
+        if todo is not None:
+            return path, todo
+    return None, None
+
+def has_subtasks(path, todo):
+    """Does `todo` have subtasks in the segment at `path`? Answered from
+    the path index of the hot store and the trash; the archive is scanned"""
+    index = {TODO_FILE: task_index, TRASH_FILE: trash_index}.get(path)
+    if index is not None:
+        # The task itself may or may not be in that segment
+        snapshot = index.get()
+        return any(snapshot.todos[i - 1]['path'] != todo['path'] for i in snapshot.tree.subtree(todo['path']))
+    return any(is_subtask_of(t, todo) for t in load_segment(path))
+
+def task_response(todo, status=200, **extra):
+    response = jsonify({'success': status == 200, 'task': todo, **extra})
+    response.status_code = status
+    response.set_etag(task_etag(todo))
+    return response
+
+@app.route('/api/tasks/<task_id>')
+def get_task(task_id):
+    """One task by id, with its ETag for a later PATCH"""
+    _, todo = find_task(task_id)
+    if todo is None:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    return task_response(todo)
+
+@app.route('/api/tasks/<task_id>', methods=['PATCH'])
+def patch_task(task_id):
+    """Change some fields of a task.
+
+    Body: {"field": value, ...} with only the fields to change (text
+    fields, tags, and the completed / deleted / saved flags). If-Match must
+    carry the task's ETag as last seen; 412 with the current task when it
+    has changed since. Only the given fields are validated, and only the
+    task's own record is rewritten (see storage.replace_record).
+    """
+    fields = request.get_json(silent=True)
+    if not isinstance(fields, dict) or not fields:
+        return jsonify({'success': False, 'error': 'Body must be an object of fields to change'}), 400
+    unknown = sorted(set(fields) - set(PATCH_FIELDS))
+    if unknown:
+        return jsonify({'success': False, 'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+    if any(not isinstance(v, bool) for f, v in fields.items() if f in FLAG_OPS):
+        return jsonify({'success': False, 'error': 'Flags must be true or false'}), 400
+    if any(not isinstance(v, str) for f, v in fields.items() if f in EDITABLE_FIELDS and f != 'tags'):
+        return jsonify({'success': False, 'error': 'Text fields must be strings'}), 400
+    tags = fields.get('tags', '')
+    if not isinstance(tags, str) and not (isinstance(tags, list) and all(isinstance(t, str) for t in tags)):
+        return jsonify({'success': False, 'error': 'Tags must be a list of strings or a comma separated string'}), 400
+    if not request.if_match:
+        return jsonify({'success': False, 'error': 'If-Match header with the task ETag is required'}), 428
+
+    path, todo = find_task(task_id)
+    if todo is None:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    if not request.if_match.contains(task_etag(todo)):
+        return task_response(todo, 412, error='Task was changed since it was read')
+
+    before = dict(todo)
+    edits = {f: v for f, v in fields.items() if f in EDITABLE_FIELDS}
+    try:
+        applied = edits and apply_task_op(todo, 'edit', edits) == 'applied'
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    for field, value in fields.items():
+        if field in FLAG_OPS:
+            applied = apply_task_op(todo, FLAG_OPS[field][0 if value else 1]) == 'applied' or applied
+    if not applied:
+        return task_response(todo)
+
+    if todo['deleted'] != before['deleted'] and has_subtasks(path, todo):
+        # Deleting or restoring takes the subtasks along, as /delete and
+        # /restore do: that rewrites the whole source segment
+        segment = load_segment(path)
+        positions = [i for i, t in enumerate(segment, 1) if is_subtask_of(t, todo)]
+        moved, remaining, changes = flag_subtree(segment, positions, 'deleted', todo['deleted'])
+        place_tasks(todo, *moved)
+        storage.save_segment(path, [t for t in remaining if t['id'] != task_id])
+        record_history(history.diff(before, todo), *changes)
+        return task_response(todo)
+
+    if storage.segment_paths(TODO_FILE)[storage.tier_of(todo)] == path:
+        storage.replace_record(path, task_id, todo)
+        if path == TODO_FILE:
+            sync_notifications(todo)
+    else:
+        # Destination first, as in delete_task()
+        place_tasks(todo)
+        storage.replace_record(path, task_id)
+    created = next_occurrence(todo) if todo['completed'] and not before['completed'] else None
+    if created:
+        storage.append_segment(TODO_FILE, [created])
+        sync_notifications(created)
+    record_history(history.diff(before, todo), history.diff(None, created))
+    return task_response(todo)
+
+# ============================================================================
+# UNDO / REDO - per-session history of compact task deltas (see history.py)
+# ============================================================================
+
+HISTORY_COOKIE = 'todohub_history'
+
+task_history = history.History()
+
+def history_session():
+    """Id of the browser session the history belongs to (a cookie, issued
+    on the first recorded action)"""
+    session_id = request.cookies.get(HISTORY_COOKIE)
+    if not session_id or len(session_id) > 64:
+        session_id = g.setdefault('new_history_session', secrets.token_hex(16))
+    return session_id
+
+@app.after_request
+def issue_history_cookie(response):
+    session_id = g.pop('new_history_session', None)
+    if session_id:
+        response.set_cookie(HISTORY_COOKIE, session_id, httponly=True, samesite='Lax')
+    return response
+
+def record_history(*changes):
+    """Record one undoable step made of the changes of one request, and
+    count them in the analytics rollups"""
+    task_history.record(history_session(), changes)
+    task_rollups.record(changes)
+
+def apply_changes(changes):
+    """Apply history changes to the stored tasks in one load and one save.
+    Nothing is written (returns False) if any task has changed since."""
+    paths, segments, records = load_tiers()
+    if any(history.conflicts(c, records.get(c[0])) for c in changes):
+        return False
+    dirty, created, removed, touched = set(), [], set(), []
+    for task_id, before, after in changes:
+        todo = records.get(task_id)
+        if after is None:
+            removed.add(task_id)
+            dirty.add(storage.tier_of(todo))
+            notification_scheduler.forget(task_id)
+        elif before is None:
+            todo = dict(after)
+            created.append(todo)
+            dirty.add(storage.tier_of(todo))
+            touched.append(todo)
+        else:
+            tier = storage.tier_of(todo)
+            todo.update(after)
+            dirty.update((tier, storage.tier_of(todo)))
+            touched.append(todo)
+    save_tiers(paths, segments, dirty, created, removed)
+    for todo in touched:
+        if storage.tier_of(todo) == storage.HOT:
+            sync_notifications(todo)
+        else:
+            notification_scheduler.forget(todo['id'])
+    return True
+
+def replay_history(direction):
+    session_id = history_session()
+    changes = task_history.take(session_id, direction)
+    if changes is None:
+        return jsonify({'success': False, 'error': f'Nothing to {direction}',
+                        'history': task_history.sizes(session_id)}), 409
+    if not apply_changes(changes):
+        # The step is dropped: the tasks it covers were changed since
+        return jsonify({'success': False, 'error': f'Cannot {direction}: the task was changed since',
+                        'history': task_history.sizes(session_id)}), 409
+    task_history.done(session_id, direction, changes)
+    task_rollups.record(changes)
+    return jsonify({
+        'success': True,
+        'tasks': [task_id for task_id, _, _ in changes],
+        'history': task_history.sizes(session_id)
+    })
+
+@app.route('/api/undo', methods=['POST'])
+def undo():
+    """Revert the last action of this session"""
+    return replay_history('undo')
+
+@app.route('/api/redo', methods=['POST'])
+def redo():
+    """Re-apply the last undone action of this session"""
+    return replay_history('redo')
+
+@app.route('/api/history')
+def history_status():
+    """Number of steps this session can undo and redo"""
+    return jsonify({'success': True, 'history': task_history.sizes(history_session())})
+
+# ============================================================================
+# SUBTASKS - hierarchy by materialized path (see indexes.PathIndex)
+# ============================================================================
+
+# Levels of subtasks below a top-level task
+MAX_SUBTASK_DEPTH = int(os.environ.get('MAX_SUBTASK_DEPTH', 5))
+
+def subtree_positions(snapshot, idx):
+    """Positions of the task at `idx` and of all its subtasks, parents first"""
+    return snapshot.tree.subtree(snapshot.todos[idx - 1]['path'])
+
+def is_subtask_of(todo, parent):
+    return todo['path'].startswith(parent['path'] + '/')
+
+def flag_subtree(todos, positions, flag, value):
+    """Set `flag` (and its timestamp) to `value` on copies of the tasks at
+    `positions`. Returns (the copies, the other tasks, history changes);
+    copies whose flag already had that value are otherwise unchanged."""
+    stamp = schema.FLAGS[flag]
+    now = datetime.now().isoformat()
+    moved, changes = [], []
+    for idx in positions:
+        before = todos[idx - 1]
+        todo = dict(before)
+        if todo[flag] != value:
+            todo[flag] = value
+            todo[stamp] = now if value else None
+        moved.append(todo)
+        changes.append(history.diff(before, todo))
+    selected = set(positions)
+    remaining = [t for i, t in enumerate(todos, 1) if i not in selected]
+    return moved, remaining, changes
+
+def completion_rollup(snapshot, positions):
+    """How many of the tasks at `positions` are completed"""
+    flags = snapshot.table.flags
+    completed = sum(1 for idx in positions if flags[idx - 1] & columnar.COMPLETED)
+    total = len(positions)
+    return {'total': total, 'completed': completed,
+            'percent': round(100 * completed / total) if total else None}
+
+def subtask_views(snapshot, idx):
+    """Subtasks of the task at `idx` for the edit page, with their rollup"""
+    positions = subtree_positions(snapshot, idx)[1:]
+    depth = indexes.path_depth(snapshot.todos[idx - 1]['path']) + 1
+    subtasks = []
+    for position in positions:
+        todo = snapshot.todos[position - 1]
+        subtasks.append({'idx': position, 'id': todo['id'], 'task': todo['task'],
+                         'completed': todo['completed'],
+                         'depth': indexes.path_depth(todo['path']) - depth})
+    return subtasks, completion_rollup(snapshot, positions)
+
+@app.route('/api/tasks/<task_id>/subtree')
+def task_subtree(task_id):
+    """An active task and all its subtasks, depth-first (`depth` is relative
+    to the task), with the completion rollup of the subtasks"""
+    snapshot = task_index.get()
+    idx = snapshot.by_id.get(task_id)
+    if idx is None:
+        return jsonify({'success': False, 'error': 'Task not found'}), 404
+    positions = subtree_positions(snapshot, idx)
+    depth = indexes.path_depth(snapshot.todos[idx - 1]['path'])
+    tasks = []
+    for position in positions:
+        todo = snapshot.todos[position - 1]
+        tasks.append(dict(task_summary(todo, position), depth=indexes.path_depth(todo['path']) - depth))
+    return jsonify({'success': True, 'tasks': tasks, 'rollup': completion_rollup(snapshot, positions[1:])})
+
+# ============================================================================
+# ANALYTICS - daily / weekly rollups of task activity (see analytics.py)
+# ============================================================================
+
+task_rollups = analytics.RollupStore()
+
+# Days of completions shown on the dashboard
+ACTIVITY_DAYS = 14
+
+@app.route('/api/analytics')
+def get_analytics():
+    """Tasks created, completed and deleted per day or week.
+
+    - period: day (default) or week
+    - count: number of buckets up to the current one (default 30 days or
+      12 weeks, at most analytics.MAX_BUCKETS)
+    """
+    period = request.args.get('period', 'day')
+    if period not in analytics.PERIODS:
+        return jsonify({'success': False, 'error': f'Invalid period: use one of {", ".join(analytics.PERIODS)}'}), 400
+    count = request.args.get('count', 30 if period == 'day' else 12, type=int)
+    count = max(1, min(count, analytics.MAX_BUCKETS))
+    series = task_rollups.series(period, count)
+    totals = {metric: sum(bucket[metric] for bucket in series) for metric in analytics.METRICS}
+    return jsonify({'success': True, 'period': period, 'series': series, 'totals': totals})
+
+# ============================================================================
+# DAILY REMINDER DIGEST - built once a day, delivered by background workers
+# (see reminders.py)
+# ============================================================================
+
+# Sinks the digest is delivered to, comma separated: mbox, webhook, webpush.
+# The webhook needs REMINDER_WEBHOOK_URL, Web Push the pywebpush package
+# and a VAPID key pair (VAPID_SUBJECT is a mailto: or https: contact)
+REMINDER_SINKS = [name.strip() for name in os.environ.get('REMINDER_SINKS', 'mbox').split(',') if name.strip()]
+REMINDER_MBOX = os.environ.get('REMINDER_MBOX', 'reminders.mbox')
+REMINDER_WEBHOOK_URL = os.environ.get('REMINDER_WEBHOOK_URL')
+VAPID_PUBLIC_KEY = os.environ.get('VAPID_PUBLIC_KEY')
+VAPID_PRIVATE_KEY = os.environ.get('VAPID_PRIVATE_KEY')
+VAPID_SUBJECT = os.environ.get('VAPID_SUBJECT', 'mailto:admin@localhost')
+REMINDER_WORKERS = int(os.environ.get('REMINDER_WORKERS', 2))
+REMINDER_QUEUE_SIZE = int(os.environ.get('REMINDER_QUEUE_SIZE', 100))
+
+push_subscriptions = reminders.PushSubscriptions()
+
+def build_reminder_digest():
+    """Count and summary of high priority tasks for the daily reminder"""
+    high_priority = get_high_priority_reminder(current_tasks())
+    return {
+        'count': len(high_priority),
+        'tasks': high_priority,
+        'message': f"You have {len(high_priority)} high priority tasks pending" if high_priority else "No high priority tasks today!"
+    }
+
+def reminder_sinks():
+    sinks = []
+    for name in REMINDER_SINKS:
+        if name == 'mbox':
+            sinks.append(reminders.MboxSink(REMINDER_MBOX))
+        elif name == 'webhook' and REMINDER_WEBHOOK_URL:
+            sinks.append(reminders.WebhookSink(REMINDER_WEBHOOK_URL))
+        elif name == 'webpush' and VAPID_PRIVATE_KEY and reminders.webpush is not None:
+            sinks.append(reminders.WebPushSink(push_subscriptions, VAPID_PRIVATE_KEY, VAPID_SUBJECT))
+        else:
+            print(f'Reminder sink {name!r} is unknown or not configured, skipped')
+    return sinks
+
+reminder_service = reminders.ReminderService(build_reminder_digest, reminder_sinks(),
+                                             workers=REMINDER_WORKERS, max_queue=REMINDER_QUEUE_SIZE)
+
+@app.route('/api/push-subscriptions', methods=['POST', 'DELETE'])
+def push_subscription():
+    """Register a browser push subscription (PushSubscription.toJSON()) for
+    the daily reminder, or remove one by endpoint with DELETE"""
+    if not VAPID_PUBLIC_KEY:
+        return jsonify({'success': False, 'error': 'Push notifications are not configured'}), 404
+
+    data = request.get_json(silent=True)
+    if request.method == 'DELETE':
+        endpoint = data.get('endpoint') if isinstance(data, dict) else None
+        if not isinstance(endpoint, str):
+            return jsonify({'success': False, 'error': 'endpoint is required'}), 400
+        return jsonify({'success': True, 'removed': push_subscriptions.remove(endpoint)})
+
+    if not reminders.is_push_subscription(data):
+        return jsonify({'success': False, 'error': 'Invalid push subscription'}), 400
+    subscription = {'endpoint': data['endpoint'],
+                    'keys': {'p256dh': data['keys']['p256dh'], 'auth': data['keys']['auth']}}
+    if not push_subscriptions.add(subscription):
+        return jsonify({'success': False, 'error': 'Could not save the subscription'}), 500
+    return jsonify({'success': True}), 201
+
+# ============================================================================
+# DUE DATE RANGE QUERIES AND CALENDAR
+# ============================================================================
+
+CALENDAR_VIEWS = ('week', 'month')
+
+# Fields of a task in API listings, in their default order
+SUMMARY_FIELDS = ('idx', 'id', 'task', 'description', 'due', 'project', 'tags', 'path', 'priority',
+                  'completed', 'saved', 'deleted')
+# Tasks serialized per chunk of a streamed listing
+STREAM_BATCH = 500
+
+def task_summary(todo, idx, fields=SUMMARY_FIELDS):
+    """JSON representation of a task for API listings, limited to `fields`"""
+    summary = {}
+    for field in fields:
+        if field == 'idx':
+            summary[field] = idx
+        elif field == 'priority':
+            summary[field] = day_priority(todo['due'])
+        else:
+            summary[field] = todo[field]
+    return summary
+
+def stream_json(head, key, items):
+    """Streamed JSON object: the fields of `head`, then `key` holding the
+    array of `items`, then a count of them. Items are serialized
+    STREAM_BATCH at a time and compressed on the fly when accepted."""
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+
+    def chunks():
+        yield f'{encode(head)[:-1]},{encode(key)}:['.encode('utf-8')
+        count = 0
+        for batch in transfer.batched(items, STREAM_BATCH):
+            yield ((',' if count else '') + ','.join(map(encode, batch))).encode('utf-8')
+            count += len(batch)
+        yield f'],"count":{count}}}'.encode('utf-8')
+
+    body, headers = chunks(), {}
+    encoding = assets.negotiate(request.headers.get('Accept-Encoding'))
+    if encoding:
+        body = assets.compress_stream(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(stream_with_context(body), mimetype='application/json', headers=headers)
+
+def parse_list_arg(name):
+    """Values of a repeatable, comma separated query parameter (?ids=a,b&ids=c)"""
+    return [v.strip() for arg in request.args.getlist(name) for v in arg.split(',') if v.strip()]
+
+def parse_range_arg(name):
+    """Date query parameter (mm/dd/yyyy or yyyy-mm-dd); raises ValueError if malformed"""
+    value = request.args.get(name, '').strip()
+    if not value:
+        return None
+    day = indexes.parse_day(value)
+    if day is None:
+        raise ValueError(f'Invalid {name}: use mm/dd/yyyy or yyyy-mm-dd')
+    return day
+
+def facet_filters():
+    """{facet: [values]} from repeatable query parameters (?tag=a&tag=b&status=pending)"""
+    filters = {}
+    for facet in indexes.FACETS:
+        values = [v.strip() for v in request.args.getlist(facet) if v.strip()]
+        if facet == 'tag':
+            values = indexes.parse_tags(values)
+        elif facet == 'priority':
+            values = [v.upper() for v in values]
+        if values:
+            filters[facet] = values
+    return filters
+
+@app.route('/api/tasks')
+def list_tasks():
+    """Filter tasks by due date range, facets and text, with facet counts.
+
+    - due_from / due_to: inclusive bounds (either optional); when given,
+      tasks come back in due order, otherwise in list order
+    - tag, project, status, priority: repeatable; values of one facet are
+      OR'ed, different facets are AND'ed
+    - ids: task ids to fetch (repeatable or comma separated), returned in
+      the order asked (due order with due bounds); unknown ones are
+      listed under `missing`
+    - q: text the title or description must contain (facet counts ignore it)
+    - sort: any order of sort_tasks(), e.g. date-oldest
+    - fields: the task fields to return (default all of SUMMARY_FIELDS)
+    The response is streamed. Only active tasks are searched; trash and
+    archive live in cold segments.
+    """
+    try:
+        due_from, due_to = parse_range_arg('due_from'), parse_range_arg('due_to')
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    filters = facet_filters()
+    fields = parse_list_arg('fields') or SUMMARY_FIELDS
+    unknown = [f for f in fields if f not in SUMMARY_FIELDS]
+    if unknown:
+        return jsonify({'success': False, 'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+    sort_by = request.args.get('sort')
+    if sort_by and sort_by not in SORT_ORDERS:
+        return jsonify({'success': False, 'error': f'Invalid sort: use one of {", ".join(SORT_ORDERS)}'}), 400
+    ids = parse_list_arg('ids')
+    query = request.args.get('q', '').strip().lower()
+    
+    snapshot = task_index.get()
+    facets = snapshot.facets
+    within = facets.all
+    ranged = due_from is not None or due_to is not None
+    if ranged:
+        in_range = snapshot.due.range(due_from, due_to)
+        within &= indexes.bitmap_from_positions(in_range, facets.size)
+    head = {'success': True}
+    if ids:
+        by_id = snapshot.by_id
+        found = list(dict.fromkeys(by_id[i] for i in ids if i in by_id))
+        head['missing'] = [i for i in ids if i not in by_id]
+        within &= indexes.bitmap_from_positions(found, facets.size)
+    
+    selected, head['facets'] = facets.select(filters, within, date.today())
+    positions = indexes.positions_from_bitmap(selected)
+    if ranged or ids:
+        wanted = set(positions)
+        positions = [idx for idx in (in_range if ranged else found) if idx in wanted]
+    
+    todos = snapshot.todos
+    rows = ((idx, todos[idx - 1]) for idx in positions)
+    if query:
+        rows = ((idx, t) for idx, t in rows if query in t['task'].lower() or query in t['description'].lower())
+    if sort_by:
+        rows = sort_tasks(list(rows), sort_by, record=lambda row: row[1])
+    return stream_json(head, 'tasks', (task_summary(todo, idx, fields) for idx, todo in rows))
+
+def calendar_bounds(view, anchor):
+    """First and last day shown by a week or month grid (weeks start on Monday)"""
+    if view == 'week':
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6)
+    first = anchor.replace(day=1)
+    next_month = (first + timedelta(days=32)).replace(day=1)
+    last = next_month - timedelta(days=1)
+    return first - timedelta(days=first.weekday()), last + timedelta(days=6 - last.weekday())
+
+@app.route('/calendar')
+def calendar_view():
+    """Week or month calendar, filled by a single due date range query"""
+    view = request.args.get('view', 'month')
+    if view not in CALENDAR_VIEWS:
+        view = 'month'
+    try:
+        anchor = parse_range_arg('date') or date.today()
+    except ValueError:
+        anchor = date.today()
+    
+    start, end = calendar_bounds(view, anchor)
+    snapshot = task_index.get()
+    by_day = snapshot.due.by_day(start, end)
+    
+    today = date.today()
+    weeks = []
+    day = start
+    while day <= end:
+        week = []
+        for _ in range(7):
+            tasks = [task_view(snapshot.todos[idx - 1], idx, 'calendar.html')
+                     for idx in by_day.get(day, ())]
+            week.append({
+                'date': day,
+                'in_range': view == 'week' or day.month == anchor.month,
+                'is_today': day == today,
+                'tasks': tasks
+            })
+            day += timedelta(days=1)
+        weeks.append(week)
+    
+    if view == 'week':
+        previous, following = anchor - timedelta(days=7), anchor + timedelta(days=7)
+        title = f"{start.strftime('%b %d')} - {end.strftime('%b %d, %Y')}"
+    else:
+        previous = (anchor.replace(day=1) - timedelta(days=1)).replace(day=1)
+        following = (anchor.replace(day=1) + timedelta(days=32)).replace(day=1)
+        title = anchor.strftime('%B %Y')
+    
+    return render_template('calendar.html',
+                         view=view,
+                         title=title,
+                         weeks=weeks,
+                         previous=previous.strftime('%m/%d/%Y'),
+                         following=following.strftime('%m/%d/%Y'),
+                         anchor=anchor.strftime('%m/%d/%Y'))
+
 @app.route('/api/stats')
 def get_stats():
     """API endpoint for stats"""
-    todos = cleanup_completed(load_todos())
-    total = len(todos)
-    completed = sum(1 for t in todos if t.get('completed', False))
+    table = current_tasks().table
+    total = table.size
+    completed = table.count(table.mask(columnar.COMPLETED))
     incomplete = total - completed
-    overdue = sum(1 for t in todos if not t.get('completed') and calculate_priority(t.get('due', '')) == 'OVERDUE')
+    overdue = table.overdue_count(date.today())
     
     return jsonify({
         'total': total,
@@ -619,46 +1701,270 @@ def get_stats():
 
 @app.route('/api/daily-reminder')
 def daily_reminder():
-    """Get daily reminder of high priority tasks"""
-    todos = cleanup_completed(load_todos())
-    todos = cleanup_deleted(todos)
-    high_priority = get_high_priority_reminder(todos)
+    """Today's reminder of high priority tasks, as built just after midnight"""
+    return jsonify({'success': True, **reminder_service.digest()})
+
+@app.route('/api/changes')
+def list_changes():
+    """Changes to todos.json after sequence number ?since=, oldest first.
+    `truncated` means some were dropped from the log: reload everything."""
+    task_index.get()   # apply a change the watcher has not picked up yet
+    since = request.args.get('since', 0, type=int)
+    events, truncated = task_changes.since(since)
+    return jsonify({
+        'success': True,
+        'seq': task_changes.sequence,
+        'truncated': truncated,
+        'changes': [{'seq': e['seq'], 'type': e['type'], 'id': e['id'], 'task': e['record']} for e in events]
+    })
+
+@app.route('/api/import', methods=['POST'])
+def import_tasks():
+    """Bulk import tasks from CSV, JSON Lines or iCalendar.
+
+    Accepts either a multipart upload (`file`) or the raw request body. The
+    upload is parsed as a stream and committed in chunks, so large files never
+    have to fit in memory.
+    """
+    upload = request.files.get('file')
+    filename = upload.filename if upload else ''
+    fmt = request.args.get('format') or transfer.detect_format(filename)
+    if fmt not in transfer.FORMATS:
+        return jsonify({'success': False, 'error': f'Unsupported format: {fmt}'}), 400
+    
+    stream = upload.stream if upload else request.stream
+    lines = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    
+    def on_commit(records):
+        sync_notifications(*records)
+        task_rollups.record([history.diff(None, record) for record in records])
+    
+    # Deleted / saved records go straight to the trash / archive segments
+    summary = transfer.import_stream(lines, fmt, storage.router(TODO_FILE), validate_due_date,
+                                     on_commit=on_commit)
+    return jsonify({'success': True, 'format': fmt, **summary})
+
+@app.route('/api/export')
+def export_tasks():
+    """Stream every task (active, trash and archive) as CSV, JSON Lines or iCalendar"""
+    fmt = request.args.get('format', 'jsonl')
+    if fmt not in transfer.FORMATS:
+        return jsonify({'success': False, 'error': f'Unsupported format: {fmt}'}), 400
+    
+    filename = f"todohub-export-{datetime.now().strftime('%Y-%m-%d')}.{fmt}"
+    return Response(stream_with_context(transfer.export_stream(list(storage.segment_paths(TODO_FILE).values()), fmt)),
+                    mimetype=transfer.MIME_TYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+# ============================================================================
+# ADMIN - SNAPSHOTS, SCHEMA CHECKS AND METRICS
+# ============================================================================
+
+# Scheduled snapshots wait for a write turn, so a task moving between
+# segments is never caught half way. The admin routes below already hold one.
+snapshot_scheduler = snapshots.SnapshotScheduler(TODO_FILE, SNAPSHOT_INTERVAL, lock=write_queue.lock,
+                                                 segments=storage.COLD_SEGMENTS)
+
+def admin_allowed():
+    """Admin routes require the X-Admin-Token header when ADMIN_TOKEN is set"""
+    return not ADMIN_TOKEN or request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+
+@app.route('/admin/snapshots', methods=['GET', 'POST'])
+def admin_snapshots():
+    """List snapshots, or take one now with POST"""
+    if not admin_allowed():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    if request.method == 'POST':
+        manifest = snapshots.create_snapshot(TODO_FILE, force=request.args.get('force') == '1',
+                                             segments=storage.COLD_SEGMENTS)
+        manifest.pop('chunks', None)
+        return jsonify({'success': True, 'snapshot': manifest})
+    
+    return jsonify({'success': True, 'snapshots': snapshots.list_snapshots()})
+
+@app.route('/admin/snapshots/<snapshot_id>/restore', methods=['POST'])
+def admin_restore_snapshot(snapshot_id):
+    """Replace the current task list with a snapshot"""
+    if not admin_allowed():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    try:
+        count = snapshots.restore_snapshot(snapshot_id, TODO_FILE, segments=storage.COLD_SEGMENTS)
+    except snapshots.SnapshotError as e:
+        return jsonify({'success': False, 'error': str(e)}), 404
+    # Snapshots may predate the current schema (or tiered storage, holding
+    # trash and archive inline)
+    schema.migrate(TODO_FILE)
+    task_index.invalidate()
+    trash_index.invalidate()
+    notification_scheduler.rebuild(task_index.get().todos)
+    return jsonify({'success': True, 'snapshot': snapshot_id, 'records': count})
+
+@app.route('/admin/metrics')
+def admin_metrics():
+    """Admission control counters (rate limiter hits, write queue depth),
+    the shared snapshot version mapped by this worker, reminder deliveries
+    and the startup metrics"""
+    if not admin_allowed():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
     
     return jsonify({
         'success': True,
-        'count': len(high_priority),
-        'tasks': high_priority,
-        'message': f"You have {len(high_priority)} high priority tasks pending" if high_priority else "No high priority tasks today!"
+        'rate_limiter': rate_limiter.metrics(),
+        'write_queue': write_queue.metrics(),
+        'shared_snapshot': task_index.metrics() if SHARED_SNAPSHOT_FILE else None,
+        'reminders': reminder_service.metrics(),
+        'startup': startup_metrics
+    })
+
+@app.route('/admin/fsck')
+def admin_fsck():
+    """Check every segment against the task schema without changing anything"""
+    if not admin_allowed():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    return jsonify({'success': True, 'report': schema.fsck(TODO_FILE)})
+
+@app.route('/admin/migrate', methods=['POST'])
+def admin_migrate():
+    """Rewrite all segments in the current schema and rebuild the indexes"""
+    if not admin_allowed():
+        return jsonify({'success': False, 'error': 'Forbidden'}), 403
+    
+    try:
+        summary = schema.migrate(TODO_FILE)
+    except schema.SchemaError as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
+    task_index.invalidate()
+    trash_index.invalidate()
+    notification_scheduler.rebuild(task_index.get().todos)
+    return jsonify({'success': True, 'migration': summary})
+
+@app.route('/api/notifications')
+def list_notifications():
+    """Paginated log of priority-change notifications, newest first.
+    Read-only: events are emitted by the scheduler thread, which runs in
+    one process only"""
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    notifications, total = notification_scheduler.events(page, per_page)
+    return jsonify({
+        'success': True,
+        'notifications': notifications,
+        'page': page,
+        'per_page': per_page,
+        'total': total
     })
 
 @app.route('/api/task-notifications/<int:idx>')
 def get_task_notifications(idx):
     """Get notifications for a specific task (priority changes)"""
-    todos = load_todos()
+    todos = task_index.get().todos
     if idx < 1 or idx > len(todos):
         return jsonify({'success': False}), 400
     
     todo = todos[idx - 1]
-    current_priority = calculate_priority(todo.get('due', ''))
-    previous_priority = todo.get('previous_priority')
-    
-    notifications = []
-    if previous_priority and previous_priority != current_priority:
-        notifications.append({
-            'message': f"{todo.get('task')} moved to {current_priority}",
-            'old_priority': previous_priority,
-            'new_priority': current_priority,
-            'type': 'priority_change'
-        })
+    page = request.args.get('page', 1, type=int)
+    per_page = max(1, min(request.args.get('per_page', 20, type=int), 100))
+    notifications, total = notification_scheduler.events(page, per_page, task_id=todo['id'])
     
     return jsonify({
         'success': True,
         'notifications': notifications,
-        'current_priority': current_priority
+        'total': total,
+        'current_priority': calculate_priority(todo['due'])
     })
 
+# ============================================================================
+# STARTUP - warm start before serving, and background threads per process
+# ============================================================================
+
+# Filled in by warm_up(); `ready` is what /api/ready reports
+startup_metrics = {'pid': os.getpid(), 'ready': False,
+                   'import_seconds': round(time.perf_counter() - IMPORT_STARTED, 4)}
+_warm_up_lock = threading.Lock()
+
+def warm_up():
+    """Load the dataset, compile every template and build the indexes and
+    caches the views use, so the first requests do not pay for them.
+
+    Safe to call more than once. A pre-fork server calls it in the master
+    before forking (see gunicorn.conf.py), so workers share the warmed pages.
+    """
+    with _warm_up_lock:
+        if startup_metrics['ready']:
+            return startup_metrics
+        started = time.perf_counter()
+        steps = {}
+
+        def step(name, fn):
+            at = time.perf_counter()
+            result = fn()
+            steps[name] = round(time.perf_counter() - at, 4)
+            return result
+
+        snapshot = step('dataset', current_tasks)
+        trash = step('trash', current_trash)
+
+        def build_indexes():
+            # The lazy indexes of TaskSnapshot are built on first access
+            for built in (snapshot, trash):
+                for name in ('table', 'facets', 'by_id', 'tree'):
+                    getattr(built, name)
+            task_suggestions()
+            reminder_service.digest()
+        step('indexes', build_indexes)
+
+        def compile_templates():
+            names = app.jinja_env.list_templates(extensions=('html',))
+            for name in names:
+                app.jinja_env.get_template(name)
+            return len(names)
+        templates = step('templates', compile_templates)
+        static_files = step('assets', lambda: len(assets.precompress_all()))
+
+        startup_metrics.update({
+            'pid': os.getpid(),
+            'ready': True,
+            'tasks': len(snapshot.todos),
+            'templates': templates,
+            'static_variants': static_files,
+            'steps': steps,
+            'warm_up_seconds': round(time.perf_counter() - started, 4),
+            'ready_at': datetime.now().isoformat(timespec='seconds')
+        })
+        print(f"Warm start: {startup_metrics['tasks']} tasks, {templates} templates "
+              f"in {startup_metrics['warm_up_seconds']:.2f}s")
+        return startup_metrics
+
+def start_background_services(singletons=True):
+    """Start the background threads. Threads do not survive fork(), so a
+    pre-fork server starts them in each worker after forking; the
+    singletons (notifications, snapshots, reminder delivery) write shared
+    files and run in one process only."""
+    if FILE_WATCHER != 'off':
+        file_watcher.start()
+    if singletons:
+        notification_scheduler.start()
+        snapshot_scheduler.start()
+        reminder_service.start()
+
+@app.route('/api/ready')
+def readiness():
+    """Readiness probe: 503 until warm_up() has run in this process, then
+    the startup metrics"""
+    if not startup_metrics['ready']:
+        response = jsonify({'success': False, 'error': 'Warming up', 'startup': startup_metrics})
+        response.status_code = 503
+        response.headers['Retry-After'] = '1'
+        return response
+    return jsonify({'success': True, 'startup': {**startup_metrics, 'pid': os.getpid()}})
+
 if __name__ == '__main__':
     # Production settings for Railway
     debug_mode = os.environ.get('FLASK_ENV') == 'development'
+    warm_up()
+    start_background_services()
     app.run(debug=debug_mode, host='0.0.0.0', port=PORT)
  
\ No newline at end of file
@@ -0,0 +1,156 @@
+"""
+Static asset fingerprinting and response compression helpers.
+
+- fingerprint(filename): short content hash used as the `v` query parameter
+  of static URLs, so fingerprinted URLs can be cached as immutable.
+- precompress(filename, encoding): gzip / brotli variant of a static file,
+  written once into ASSET_CACHE_DIR and reused until the source changes.
+- negotiate(accept_encoding): pick the best encoding the client accepts.
+- compress_stream(chunks, encoding): compress a streamed response as it
+  is generated.
+
+Brotli is optional: it is used when the `brotli` package is installed and
+otherwise everything falls back to gzip.
+
+Run `python assets.py` to precompress every file under static/ ahead of time.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+ASSET_CACHE_DIR = os.environ.get('ASSET_CACHE_DIR', os.path.join(BASE_DIR, '.static_cache'))
+
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_SIZE = 512
+COMPRESSIBLE_TYPES = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/calendar',
+    'application/json', 'application/manifest+json', 'application/javascript',
+    'text/javascript', 'application/x-ndjson'
+)
+EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+
+_lock = threading.Lock()
+_fingerprints = {}   # filename -> (mtime_ns, size, hash)
+
+
+def _source_path(filename):
+    path = os.path.normpath(os.path.join(STATIC_DIR, filename))
+    if not path.startswith(STATIC_DIR + os.sep):
+        raise ValueError(f'Invalid static path: {filename}')
+    return path
+
+
+def fingerprint(filename):
+    """Content hash of a static file, recomputed only when it changes"""
+    try:
+        path = _source_path(filename)
+        stat = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        cached = _fingerprints.get(filename)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+    with open(path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:12]
+    with _lock:
+        _fingerprints[filename] = (stat.st_mtime_ns, stat.st_size, digest)
+    return digest
+
+
+def static_files():
+    """Relative paths of every file under static/"""
+    for root, _, files in os.walk(STATIC_DIR):
+        for name in sorted(files):
+            yield os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, '/')
+
+
+def is_compressible(filename):
+    mimetype = mimetypes.guess_type(filename)[0]
+    return mimetype in COMPRESSIBLE_TYPES
+
+
+def negotiate(accept_encoding):
+    """Return 'br', 'gzip' or None for an Accept-Encoding header value"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        token, _, params = part.strip().partition(';')
+        q = 1.0
+        if params.strip().startswith('q='):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip().lower()] = q
+    if brotli is not None and accepted.get('br', 0) > 0:
+        return 'br'
+    if accepted.get('gzip', 0) > 0:
+        return 'gzip'
+    return None
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    return gzip.compress(data, compresslevel=6)
+
+
+def compress_stream(chunks, encoding):
+    """Compress an iterable of byte chunks chunk by chunk"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=5)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)   # gzip container
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+
+def precompress(filename, encoding):
+    """Path of the precompressed variant of a static file, creating it if
+    needed. Variants are keyed by content hash, so stale ones are never
+    served."""
+    digest = fingerprint(filename)
+    if digest is None or encoding not in EXTENSIONS:
+        return None
+    target = os.path.join(ASSET_CACHE_DIR, f'{filename}.{digest}{EXTENSIONS[encoding]}')
+    if not os.path.exists(target):
+        with open(_source_path(filename), 'rb') as f:
+            data = compress(f.read(), encoding)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = target + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, target)
+    return target
+
+
+def precompress_all():
+    """Build gzip (and brotli, when available) variants for all static files"""
+    encodings = ['gzip'] + (['br'] if brotli is not None else [])
+    built = []
+    for filename in static_files():
+        if not is_compressible(filename):
+            continue
+        for encoding in encodings:
+            built.append(precompress(filename, encoding))
+    return built
+
+
+if __name__ == '__main__':
+    for path in precompress_all():
+        print(f'  ✓ {os.path.relpath(path, BASE_DIR)}')
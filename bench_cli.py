@@ -0,0 +1,80 @@
+"""
+Benchmark for the main.py command line interface.
+
+Measures cold start time of `main.py list` and compares the per-command cost
+of running N separate invocations against a single `main.py batch` run.
+Everything runs in a temporary directory, your todos.json is not touched.
+
+Usage: python bench_cli.py [--tasks 1000] [--commands 50] [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'main.py')
+
+
+def make_dataset(path, count):
+    todos = []
+    for i in range(count):
+        todos.append({
+            'task': f'Benchmark task {i}',
+            'due': f'{(i % 12) + 1:02d}/{(i % 28) + 1:02d}/2030',
+            'description': 'Generated by bench_cli.py',
+            'completed': False,
+            'completed_at': None
+        })
+    with open(path, 'w') as f:
+        json.dump(todos, f, indent=2)
+
+
+def run_main(workdir, *args, stdin=None):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, MAIN_PY, *args], cwd=workdir, input=stdin,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, text=True, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark main.py startup and batch mode')
+    parser.add_argument('--tasks', type=int, default=1000, help='Tasks in the generated todos.json')
+    parser.add_argument('--commands', type=int, default=50, help='Commands per workload')
+    parser.add_argument('--runs', type=int, default=10, help='Repetitions for startup timing')
+    args = parser.parse_args()
+
+    commands = [f'add "Batch task {i}" 12/31/2030' for i in range(args.commands)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        todo_path = os.path.join(workdir, 'todos.json')
+
+        make_dataset(todo_path, args.tasks)
+        startup = [run_main(workdir, 'list') for _ in range(args.runs)]
+
+        make_dataset(todo_path, args.tasks)
+        start = time.perf_counter()
+        for i in range(args.commands):
+            run_main(workdir, 'add', f'Single task {i}', '12/31/2030')
+        separate = time.perf_counter() - start
+
+        make_dataset(todo_path, args.tasks)
+        batch = run_main(workdir, 'batch', '-', stdin='\n'.join(commands))
+
+    print('=' * 60)
+    print(f'  main.py benchmark ({args.tasks} tasks, {args.commands} commands)')
+    print('=' * 60)
+    print(f'  startup `list`   median {statistics.median(startup) * 1000:8.1f} ms'
+          f'   min {min(startup) * 1000:8.1f} ms')
+    print(f'  separate runs    total  {separate * 1000:8.1f} ms'
+          f'   per command {separate / args.commands * 1000:8.2f} ms')
+    print(f'  batch mode       total  {batch * 1000:8.1f} ms'
+          f'   per command {batch / args.commands * 1000:8.2f} ms')
+    print('=' * 60)
+
+
+if __name__ == '__main__':
+    main()
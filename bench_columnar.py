@@ -0,0 +1,143 @@
+"""
+Benchmark of columnar.TaskTable against the per-dict code paths of app.py.
+
+Generates synthetic tasks with populate_tasks.py (in memory, nothing is
+written) and times, for each dataset size, the operations the list views
+and /api/stats run on every request:
+
+    status filter    positions of the tasks not completed
+    priorities       priority bucket of every task
+    overdue count    tasks not completed and due today or earlier
+    retention scan   completed / deleted tasks past their retention
+
+once the way app.py did them on the dict records, and once on a TaskTable.
+Priorities are timed cold; the overdue count reuses them, as both paths
+cache priorities per day. Building the table is timed separately: it
+happens once per version of todos.json and is then shared by every request.
+
+Usage: python bench_columnar.py [--sizes 100000 1000000] [--repeat 3] [--seed 1]
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+import columnar
+import populate_tasks
+
+COMPLETED_RETENTION = timedelta(days=2)
+DELETED_RETENTION = timedelta(days=3)
+
+
+def calculate_priority(due_date_str):
+    """Same buckets as app.calculate_priority()"""
+    try:
+        days_remaining = (datetime.strptime(due_date_str, '%m/%d/%Y') - datetime.today()).days
+    except ValueError:
+        return 'N/A'
+    if days_remaining < 0:
+        return 'OVERDUE'
+    if days_remaining <= 3:
+        return 'HIGH'
+    if days_remaining <= 7:
+        return 'MEDIUM'
+    return 'LOW'
+
+
+def dict_priorities(todos, memo=None):
+    # app.day_priority() memoizes per due date string and day
+    memo = {} if memo is None else memo
+    priorities = []
+    for todo in todos:
+        priority = memo.get(todo['due'])
+        if priority is None:
+            priority = memo[todo['due']] = calculate_priority(todo['due'])
+        priorities.append(priority)
+    return priorities
+
+
+def dict_expired(todos, flag, stamp, cutoff):
+    expired = 0
+    for todo in todos:
+        if todo[flag] and todo[stamp]:
+            try:
+                if datetime.fromisoformat(todo[stamp]) < cutoff:
+                    expired += 1
+            except ValueError:
+                pass
+    return expired
+
+
+def dict_path(todos):
+    now = datetime.now()
+    memo = {}
+    dict_priorities(todos, memo)
+    return {
+        'status filter': lambda: [idx for idx, t in enumerate(todos, 1) if not t['completed']],
+        'priorities': lambda: dict_priorities(todos),
+        'overdue count': lambda: sum(1 for t in todos
+                                     if not t['completed'] and memo[t['due']] == 'OVERDUE'),
+        'retention scan': lambda: (dict_expired(todos, 'completed', 'completed_at', now - COMPLETED_RETENTION),
+                                   dict_expired(todos, 'deleted', 'deleted_at', now - DELETED_RETENTION)),
+    }
+
+
+def table_path(table):
+    now = datetime.now()
+    today = date.today()
+
+    def priorities():
+        # Codes are cached per day on the table; time the computation itself
+        table._priorities = table._names = (None, None)
+        return table.priorities(today)
+
+    return {
+        'status filter': lambda: table.positions(table.mask(clear_flags=columnar.COMPLETED)),
+        'priorities': priorities,
+        'overdue count': lambda: table.overdue_count(today),
+        'retention scan': lambda: (table.count(table.expired_mask('completed_at', now - COMPLETED_RETENTION)),
+                                   table.count(table.expired_mask('deleted_at', now - DELETED_RETENTION))),
+    }
+
+
+def best_of(repeat, func):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time TaskTable against the dict code paths')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100000, 1000000], help='Dataset sizes')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per operation (best is kept)')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the dataset')
+    args = parser.parse_args()
+
+    backend = 'numpy ' + columnar.np.__version__ if columnar.np is not None else 'array (numpy not installed)'
+    print('=' * 72)
+    print(f'  TaskTable vs dict records, columns backed by {backend}')
+    print('=' * 72)
+    for size in args.sizes:
+        start = time.perf_counter()
+        todos = list(populate_tasks.generate_tasks(size, args.seed))
+        generated = time.perf_counter() - start
+        build, table = best_of(args.repeat, lambda: columnar.TaskTable(todos))
+        print(f'  {size:,} tasks (generated in {generated:.1f}s), table built in {build * 1000:.0f} ms')
+        print(f'  {"operation":<18} {"dict ms":>10} {"table ms":>10} {"speedup":>9}')
+        dict_ops = dict_path(todos)
+        table_ops = table_path(table)
+        for name in dict_ops:
+            dict_time, expected = best_of(args.repeat, dict_ops[name])
+            table_time, result = best_of(args.repeat, table_ops[name])
+            if result != expected:
+                raise SystemExit(f'{name}: table result differs from the dict path')
+            print(f'  {name:<18} {dict_time * 1000:>10.1f} {table_time * 1000:>10.1f} '
+                  f'{dict_time / table_time:>8.1f}x')
+        print('-' * 72)
+        del todos, table
+
+
+if __name__ == '__main__':
+    main()
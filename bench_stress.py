@@ -0,0 +1,244 @@
+"""
+Stress harness for app.py.
+
+Generates a synthetic dataset with populate_tasks.py in a temporary
+directory, then replays a weighted mix of read and write requests against
+the Flask test client from several threads at once. Reports latency
+percentiles per route, status codes (429s come from admission control),
+throughput, and memory: the resident set size high-water mark sampled
+during the run, plus the peak of Python allocations with --tracemalloc.
+
+Your todos.json is not touched.
+
+Usage: python bench_stress.py [--tasks 100000] [--requests 2000] [--concurrency 8]
+                              [--seed 1] [--write-share 0.2] [--tracemalloc]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+try:
+    import resource
+except ImportError:   # Windows
+    resource = None
+
+SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (label, weight) per request kind; see make_request()
+READS = [('GET /', 10), ('GET /pending', 10), ('GET /pending?tag=', 5), ('GET /api/tasks?due_from=', 10),
+         ('GET /api/stats', 10), ('GET /overdue', 5), ('GET /calendar', 5), ('GET /search?q=', 3),
+         ('GET /api/task/<idx>', 10)]
+WRITES = [('POST /complete/<idx>', 5), ('POST /add', 3), ('POST /edit/<idx>', 2),
+          ('POST /delete/<idx>', 2), ('POST /api/batch', 2), ('POST /api/undo', 1)]
+SEARCH_TERMS = ['bill', 'clean', 'plan', 'buy', 'review', 'organize']
+TAGS = ['urgent', 'errand', 'weekly', 'bills']
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def rss_bytes():
+    """Current resident set size (Linux), or None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RssSampler(threading.Thread):
+    """Samples the resident set size in the background, keeping the maximum"""
+
+    def __init__(self, interval=0.02):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak = rss_bytes() or 0
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.peak = max(self.peak, rss_bytes() or 0)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def make_request(client, label, rng, app_module):
+    """Issue one request of the given kind; returns the status code"""
+    size = max(1, len(app_module.task_index.get().todos))
+    idx = rng.randint(1, size)
+    today = date.today()
+    if label == 'GET /':
+        return client.get('/').status_code
+    if label == 'GET /pending':
+        return client.get('/pending').status_code
+    if label == 'GET /pending?tag=':
+        return client.get(f'/pending?tag={rng.choice(TAGS)}').status_code
+    if label == 'GET /api/tasks?due_from=':
+        start = today + timedelta(days=rng.randint(-30, 60))
+        end = start + timedelta(days=rng.randint(0, 14))
+        return client.get(f'/api/tasks?due_from={start:%m/%d/%Y}&due_to={end:%m/%d/%Y}').status_code
+    if label == 'GET /api/stats':
+        return client.get('/api/stats').status_code
+    if label == 'GET /overdue':
+        return client.get('/overdue').status_code
+    if label == 'GET /calendar':
+        return client.get('/calendar?view=month').status_code
+    if label == 'GET /search?q=':
+        return client.get(f'/search?q={rng.choice(SEARCH_TERMS)}').status_code
+    if label == 'GET /api/task/<idx>':
+        return client.get(f'/api/task/{idx}').status_code
+    if label == 'POST /complete/<idx>':
+        return client.post(f'/complete/{idx}').status_code
+    if label == 'POST /add':
+        due = today + timedelta(days=rng.randint(0, 30))
+        return client.post('/add', data={'task': f'Stress task {rng.random():.6f}', 'due': f'{due:%m/%d/%Y}',
+                                         'tags': rng.choice(TAGS)}).status_code
+    if label == 'POST /edit/<idx>':
+        due = today + timedelta(days=rng.randint(0, 30))
+        return client.post(f'/edit/{idx}', data={'task': f'Edited {rng.random():.6f}',
+                                                 'due': f'{due:%m/%d/%Y}'}).status_code
+    if label == 'POST /delete/<idx>':
+        return client.post(f'/delete/{idx}').status_code
+    if label == 'POST /api/batch':
+        todos = app_module.task_index.get().todos
+        ops = [{'key': f'{rng.random():.12f}', 'op': rng.choice(['complete', 'uncomplete']),
+                'id': todos[rng.randrange(len(todos))]['id']} for _ in range(5)] if todos else []
+        return client.post('/api/batch', json={'ops': ops}).status_code
+    if label == 'POST /api/undo':
+        return client.post('/api/undo').status_code
+    raise ValueError(label)
+
+
+def worker(app_module, count, seed, write_share, results):
+    rng = random.Random(seed)
+    client = app_module.app.test_client()
+    reads, read_weights = zip(*READS)
+    writes, write_weights = zip(*WRITES)
+    for _ in range(count):
+        if rng.random() < write_share:
+            label = rng.choices(writes, write_weights)[0]
+        else:
+            label = rng.choices(reads, read_weights)[0]
+        start = time.perf_counter()
+        status = make_request(client, label, rng, app_module)
+        results.append((label, time.perf_counter() - start, status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay mixed traffic against app.py and report latencies')
+    parser.add_argument('--tasks', type=int, default=100000, help='Tasks in the generated dataset')
+    parser.add_argument('--requests', type=int, default=2000, help='Total requests')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for the dataset and the traffic')
+    parser.add_argument('--write-share', type=float, default=0.2, help='Fraction of requests that write')
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help='Also trace Python allocations (slows every request down)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='todo-stress-')
+    sys.path.insert(0, SOURCE_DIR)
+    # app.py works on files in the current directory; snapshots are off and
+    # the rate limit out of the way so the harness measures the app itself
+    os.chdir(workdir)
+    os.environ.setdefault('SNAPSHOT_INTERVAL', '0')
+    os.environ.setdefault('MUTATION_RATE', '1000000')
+    os.environ.setdefault('MUTATION_BURST', '1000000')
+
+    import populate_tasks
+    start = time.perf_counter()
+    counts = populate_tasks.write_dataset(args.tasks, args.seed, workdir)
+    generated = time.perf_counter() - start
+
+    start = time.perf_counter()
+    import app as app_module
+    app_module.task_index.get()
+    startup = time.perf_counter() - start
+    baseline_rss = rss_bytes()
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    sampler = RssSampler()
+    sampler.start()
+
+    results = []
+    per_thread = max(1, args.requests // args.concurrency)
+    threads = [threading.Thread(target=worker, args=(app_module, per_thread, args.seed + i,
+                                                     args.write_share, results))
+               for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    peak_rss = sampler.stop()
+    traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+    if args.tracemalloc:
+        tracemalloc.stop()
+
+    by_label = {}
+    failures = {}
+    statuses = {}
+    for label, seconds, status in results:
+        by_label.setdefault(label, []).append(seconds)
+        statuses[status] = statuses.get(status, 0) + 1
+        if status >= 400:
+            failures[label] = failures.get(label, 0) + 1
+
+    print('=' * 95)
+    print(f'  Stress run: {args.tasks} tasks ({", ".join(f"{n} {t}" for t, n in counts.items())}), '
+          f'{len(results)} requests, {args.concurrency} threads')
+    print(f'  dataset generated in {generated:.1f}s, app import + first index build {startup:.2f}s')
+    print('=' * 95)
+    print(f'  {"route":<30} {"count":>6} {"4xx/5xx":>8} {"p50 ms":>9} {"p90 ms":>9} {"p99 ms":>9} {"max ms":>9}')
+    all_latencies = []
+    for label in sorted(by_label):
+        values = sorted(by_label[label])
+        all_latencies.extend(values)
+        print(f'  {label:<30} {len(values):>6} {failures.get(label, 0):>8} {percentile(values, 50) * 1000:>9.1f} '
+              f'{percentile(values, 90) * 1000:>9.1f} {percentile(values, 99) * 1000:>9.1f} '
+              f'{values[-1] * 1000:>9.1f}')
+    all_latencies.sort()
+    print('-' * 95)
+    print(f'  {"all":<30} {len(all_latencies):>6} {sum(failures.values()):>8} '
+          f'{percentile(all_latencies, 50) * 1000:>9.1f} '
+          f'{percentile(all_latencies, 90) * 1000:>9.1f} {percentile(all_latencies, 99) * 1000:>9.1f} '
+          f'{all_latencies[-1] * 1000:>9.1f}')
+    print(f'  throughput {len(results) / elapsed:,.1f} req/s over {elapsed:.1f}s')
+    print('  status codes ' + ', '.join(f'{code}: {n}' for code, n in sorted(statuses.items())))
+    metrics = app_module.write_queue.metrics()
+    print(f'  write queue peak depth {metrics["peak"]}, shed {metrics["shed"]}, '
+          f'avg write {metrics["avg_write_ms"]} ms')
+    if baseline_rss:
+        print(f'  RSS after startup {baseline_rss / 2**20:.1f} MiB, high-water during run {peak_rss / 2**20:.1f} MiB')
+    if resource:
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        maxrss = maxrss if sys.platform == 'darwin' else maxrss * 1024
+        print(f'  process max RSS {maxrss / 2**20:.1f} MiB')
+    if traced_peak is not None:
+        print(f'  peak traced Python allocations during run {traced_peak / 2**20:.1f} MiB')
+    print('=' * 95)
+
+    os.chdir(SOURCE_DIR)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Render-time benchmark for every template in templates/.
+
+For each template this measures
+  - cold compile time without a bytecode cache (parse + compile),
+  - cold load time from the on-disk bytecode cache,
+  - warm render time with synthetic view models (median and p95).
+
+Usage: python bench_templates.py [--tasks 500] [--runs 50]
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from flask import render_template
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+import analytics
+from app import ACTIVITY_DAYS, VIEW_FIELDS, app, get_priority_color
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+PRIORITIES = ['OVERDUE', 'HIGH', 'MEDIUM', 'LOW']
+
+
+def make_views(template, count):
+    fields = VIEW_FIELDS.get(template, ('task', 'description', 'due', 'completed', 'priority', 'priority_color'))
+    views = []
+    for i in range(count):
+        priority = PRIORITIES[i % len(PRIORITIES)]
+        full = {
+            'idx': i + 1,
+            'task': f'Benchmark task {i}',
+            'description': 'A reasonably long description used for render benchmarking.',
+            'due': f'{(i % 12) + 1:02d}/{(i % 28) + 1:02d}/2030',
+            'completed': i % 3 == 0,
+            'priority': priority,
+            'priority_color': get_priority_color(priority),
+            'days_until_permanent': i % 4,
+            'recurrence': 'none',
+            'project': f'Project {i % 5}',
+            'tags': [f'tag{i % 7}', f'tag{i % 3}']
+        }
+        view = {'idx': full['idx'], 'id': f'{i:032x}'}
+        view.update({f: full[f] for f in fields})
+        if 'priority' in fields:
+            view['priority_color'] = full['priority_color']
+        views.append(view)
+    return views
+
+
+def activity_series(count):
+    """The dashboard's completion chart, from a rollup store holding a few
+    completions per day over the last ACTIVITY_DAYS days"""
+    with tempfile.TemporaryDirectory() as tmp:
+        store = analytics.RollupStore(os.path.join(tmp, 'analytics.json'))
+        today = date.today()
+        for back in range(ACTIVITY_DAYS):
+            stamp = datetime.combine(today - timedelta(days=back), datetime.min.time()).isoformat()
+            store.record([(f'{i:032x}', {'completed': False}, {'completed': True, 'completed_at': stamp})
+                          for i in range((back * 7 + count) % 11)], today)
+        return store.series('day', ACTIVITY_DAYS)
+
+
+def context_for(template, count):
+    views = make_views(template, count)
+    if template == 'dashboard.html':
+        activity = activity_series(count)
+        pending = [v for v in views if not v['idx'] % 3 == 1]
+        return {'pending': pending, 'completed': views[::3],
+                'overdue': [v for v in pending if v['priority'] == 'OVERDUE'],
+                'total': len(views), 'sort_by': 'date-oldest',
+                'activity': activity, 'activity_peak': max(bucket['completed'] for bucket in activity)}
+    if template == 'pending.html':
+        return {'todos': views, 'filters': {},
+                'tag_counts': sorted((f'tag{i}', count // 7) for i in range(7)),
+                'project_counts': sorted((f'Project {i}', count // 5) for i in range(5))}
+    if template == 'search.html':
+        return {'query': 'task', 'matches': views}
+    if template == 'edit_task.html':
+        return {'idx': 1, 'todo': {'task': 'Edit me', 'due': '01/01/2030', 'description': '', 'recurrence': 'none'}}
+    return {'todos': views}
+
+
+def cold_compile(name, cache_dir=None):
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    if cache_dir:
+        env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+    start = time.perf_counter()
+    env.get_template(name)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark template compile and render times')
+    parser.add_argument('--tasks', type=int, default=500, help='Tasks per rendered list')
+    parser.add_argument('--runs', type=int, default=50, help='Warm renders per template')
+    args = parser.parse_args()
+
+    names = sorted(n for n in os.listdir(TEMPLATE_DIR) if n.endswith('.html'))
+    print('=' * 78)
+    print(f'  Template benchmark ({args.tasks} tasks, {args.runs} runs)')
+    print('=' * 78)
+    print(f"  {'template':20} {'compile':>10} {'cached':>10} {'render p50':>12} {'render p95':>12}")
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        for name in names:
+            compile_time = cold_compile(name)
+            cold_compile(name, cache_dir)           # populate the cache
+            cached_time = cold_compile(name, cache_dir)
+
+            render = []
+            if name != 'base.html':
+                context = context_for(name, args.tasks)
+                with app.test_request_context('/'):
+                    for _ in range(args.runs):
+                        start = time.perf_counter()
+                        render_template(name, **context)
+                        render.append(time.perf_counter() - start)
+
+            p50 = f'{statistics.median(render) * 1000:9.2f} ms' if render else '        -   '
+            p95 = f'{sorted(render)[int(len(render) * 0.95) - 1] * 1000:9.2f} ms' if render else '        -   '
+            print(f'  {name:20} {compile_time * 1000:7.2f} ms {cached_time * 1000:7.2f} ms {p50:>12} {p95:>12}')
+    print('=' * 78)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""
+Columnar in-memory table of a task list.
+
+Instead of one dict per task, TaskTable keeps one column per attribute the
+list views filter or count on:
+
+    due            day ordinal of the due date (0 = no valid date)
+    flags          status bits: COMPLETED | DELETED | SAVED
+    completed_at   POSIX timestamps, NaN when unset
+    deleted_at
+    task, project  interned strings (built on first use)
+
+Status filters, priority buckets, overdue counts and the retention cutoffs
+of cleanup_completed / cleanup_deleted are then single passes over the
+columns instead of per-task dict lookups, strptime and datetime math.
+
+NumPy is optional: with it the columns are ndarrays and every pass is
+vectorized. Without it they are array.array columns, and each pass maps a
+small lookup table (8 flag combinations, the distinct due dates) over a
+column with map() and itertools.compress, which still runs in C. Masks are
+NumPy bool arrays or lists of bools accordingly; callers only hand them
+back to the table.
+
+Priorities only change with the date, so they are computed once per day
+per table.
+
+Rows are 0-based internally; positions() returns the 1-based `idx` the
+routes use.
+"""
+import math
+import operator
+import sys
+from array import array
+from collections import Counter
+from datetime import datetime
+from itertools import compress
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from indexes import DUE_FORMAT
+
+COMPLETED, DELETED, SAVED = 1, 2, 4
+FLAG_FIELDS = (('completed', COMPLETED), ('deleted', DELETED), ('saved', SAVED))
+
+# Priority codes, in the order of the buckets of calculate_priority()
+PRIORITIES = ('OVERDUE', 'HIGH', 'MEDIUM', 'LOW', 'N/A')
+OVERDUE, HIGH, MEDIUM, LOW, NO_DATE = range(len(PRIORITIES))
+
+
+def _timestamp(value):
+    if not value:
+        return math.nan
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _priority_code(days):
+    """Bucket of a task due `days` after today (calculate_priority() counts
+    from the current time, so a task due today is already OVERDUE)"""
+    if days <= 0:
+        return OVERDUE
+    if days <= 4:
+        return HIGH
+    if days <= 8:
+        return MEDIUM
+    return LOW
+
+
+def row_columns(todo, ordinals):
+    """(due ordinal, flags, completed_at, deleted_at) of one task; `ordinals`
+    caches parsed due strings across calls"""
+    value = todo['due']
+    ordinal = ordinals.get(value)
+    if ordinal is None:
+        try:
+            ordinal = datetime.strptime(value, DUE_FORMAT).toordinal()
+        except (TypeError, ValueError):
+            ordinal = 0
+        ordinals[value] = ordinal
+    bits = 0
+    for field, bit in FLAG_FIELDS:
+        if todo[field]:
+            bits |= bit
+    return (ordinal, bits,
+            _timestamp(todo['completed_at']) if bits & COMPLETED else math.nan,
+            _timestamp(todo['deleted_at']) if bits & DELETED else math.nan)
+
+
+class TaskTable:
+    """Column store of a task list; read-only once built.
+
+    `columns` are the (due, flags, completed_at, deleted_at) columns already
+    computed with row_columns() as int64, int8, float64 and float64 buffers,
+    e.g. memoryviews over a shared snapshot (see shared.py); without them
+    the columns are built from `todos`.
+    """
+
+    def __init__(self, todos, columns=None):
+        if columns is None:
+            columns = due, flags, completed_at, deleted_at = (array('q'), array('b'), array('d'), array('d'))
+            ordinals = {}
+            for todo in todos:
+                row_due, row_flags, row_completed_at, row_deleted_at = row_columns(todo, ordinals)
+                due.append(row_due)
+                flags.append(row_flags)
+                completed_at.append(row_completed_at)
+                deleted_at.append(row_deleted_at)
+        if np is not None:
+            columns = [np.frombuffer(column, dtype=dtype)
+                       for column, dtype in zip(columns, (np.int64, np.int8, np.float64, np.float64))]
+        self.due, self.flags, self.completed_at, self.deleted_at = columns
+        self.size = len(self.due)
+        self._todos = todos
+        self._strings = None
+        self._priorities = (None, None)
+        self._names = (None, None)
+
+    def patched(self, todos, changed):
+        """Table of `todos`, which differs from this table's tasks only at
+        the 1-based positions in `changed`: the columns are copied and
+        those rows recomputed"""
+        if np is not None:
+            columns = [np.array(column) for column in (self.due, self.flags, self.completed_at, self.deleted_at)]
+        else:
+            columns = [array(code, column) for code, column in
+                       zip('qbdd', (self.due, self.flags, self.completed_at, self.deleted_at))]
+        ordinals = {}
+        for idx in changed:
+            for column, value in zip(columns, row_columns(todos[idx - 1], ordinals)):
+                column[idx - 1] = value
+        return TaskTable(todos, columns)
+
+    def _interned(self):
+        if self._strings is None:
+            intern = sys.intern
+            task, project = [], []
+            for todo in self._todos:
+                task.append(intern(todo['task']))
+                project.append(intern(todo['project']))
+            self._strings = (task, project)
+        return self._strings
+
+    @property
+    def task(self):
+        """Task names, interned; built on first use"""
+        return self._interned()[0]
+
+    @property
+    def project(self):
+        return self._interned()[1]
+
+    def mask(self, set_flags=0, clear_flags=0):
+        """Rows with all of `set_flags` and none of `clear_flags` set"""
+        wanted = set_flags | clear_flags
+        if np is not None:
+            return (self.flags & wanted) == set_flags
+        lookup = [(bits & wanted) == set_flags for bits in range(8)]
+        return list(map(lookup.__getitem__, self.flags))
+
+    def positions(self, mask):
+        """1-based positions of the rows in a mask"""
+        if np is not None:
+            return (np.flatnonzero(mask) + 1).tolist()
+        return list(compress(range(1, self.size + 1), mask))
+
+    def count(self, mask):
+        if np is not None:
+            return int(np.count_nonzero(mask))
+        return sum(mask)
+
+    def priority_codes(self, today):
+        """Priority code of every row on `today` (a date), computed once per day"""
+        day, codes = self._priorities
+        if day == today:
+            return codes
+        ordinal = today.toordinal()
+        if np is not None:
+            # Day offsets 1-4 are HIGH, 5-8 MEDIUM, 9+ LOW, anything earlier OVERDUE
+            codes = np.digitize(self.due - ordinal, (1, 5, 9)).astype(np.int8)
+            codes[self.due == 0] = NO_DATE
+        else:
+            lookup = {due: _priority_code(due - ordinal) if due else NO_DATE for due in set(self.due)}
+            codes = bytes(map(lookup.__getitem__, self.due))
+        self._priorities = (today, codes)
+        return codes
+
+    def priorities(self, today):
+        """Priority name of every row, also computed once per day; treat the
+        list as read-only"""
+        day, names = self._names
+        if day == today:
+            return names
+        codes = self.priority_codes(today)
+        names = list(map(PRIORITIES.__getitem__, codes.tolist() if np is not None else codes))
+        self._names = (today, names)
+        return names
+
+    def priority_counts(self, today, mask=None):
+        """{priority: number of rows} over the rows of `mask` (all rows by default)"""
+        codes = self.priority_codes(today)
+        if np is not None:
+            selected = codes if mask is None else codes[mask]
+            counts = np.bincount(selected, minlength=len(PRIORITIES)).tolist()
+        else:
+            counted = Counter(codes if mask is None else compress(codes, mask))
+            counts = [counted[code] for code in range(len(PRIORITIES))]
+        return dict(zip(PRIORITIES, counts))
+
+    def priority_mask(self, today, names, within=None):
+        """Rows in one of the priorities `names` (restricted to `within`)"""
+        codes = self.priority_codes(today)
+        wanted = [PRIORITIES.index(name) for name in names]
+        if np is not None:
+            mask = np.isin(codes, wanted)
+            return mask if within is None else mask & within
+        lookup = [code in wanted for code in range(len(PRIORITIES))]
+        mask = list(map(lookup.__getitem__, codes))
+        return mask if within is None else list(map(operator.and_, mask, within))
+
+    def overdue_count(self, today):
+        """Tasks not completed that are due today or earlier"""
+        return self.priority_counts(today, self.mask(clear_flags=COMPLETED))['OVERDUE']
+
+    def expired_mask(self, column, cutoff):
+        """Rows whose `column` ('completed_at' or 'deleted_at') timestamp is
+        older than `cutoff` (a datetime); unset timestamps never expire"""
+        values = getattr(self, column)
+        threshold = cutoff.timestamp()
+        if np is not None:
+            return values < threshold
+        # NaN compares False, so unset timestamps drop out
+        return list(map(threshold.__gt__, values))
@@ -0,0 +1,26 @@
+import pytest
+
+import admission
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Test client of the app working on empty data files in `tmp_path`"""
+    monkeypatch.chdir(tmp_path)
+    import app
+    monkeypatch.setattr(app, 'rate_limiter', admission.RateLimiter(1000, 1000))
+    app.task_index.invalidate()
+    app.trash_index.invalidate()
+    return app.app.test_client()
+
+
+@pytest.fixture
+def add_task(client):
+    """Add a task through the form route; returns its stored record"""
+    import app
+
+    def add(task, due='03/01/2030'):
+        response = client.post('/add', data={'task': task, 'due': due, 'description': '', 'recurrence': 'none'})
+        assert response.status_code == 302
+        return next(t for t in app.load_todos() if t['task'] == task)
+    return add
@@ -0,0 +1,48 @@
+"""
+Gunicorn settings for TodoHub:  gunicorn -c gunicorn.conf.py app:app
+
+The app is loaded and warmed up (dataset, templates, indexes, compressed
+assets; see app.warm_up) in the master before any worker is forked, so
+workers start ready and share those pages copy-on-write. gc.freeze() moves
+the warmed objects out of the collector's reach, which would otherwise
+touch, and so copy, them in every worker.
+
+Background threads are started in each worker after the fork. The ones
+that must run once (notifications, snapshots, reminder delivery) run in the
+worker holding SERVICES_LOCK_FILE; when it exits, its replacement takes
+the lock over.
+"""
+import fcntl
+import gc
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+preload_app = True
+
+SERVICES_LOCK_FILE = os.environ.get('SERVICES_LOCK_FILE', 'todohub.services.lock')
+_services_lock = None   # kept open for the life of the worker holding it
+
+
+def _take_services_lock():
+    global _services_lock
+    f = open(SERVICES_LOCK_FILE, 'a')
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return False
+    _services_lock = f
+    return True
+
+
+def when_ready(server):
+    import app
+    app.warm_up()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    import app
+    app.warm_up()   # already done unless preload_app is turned off
+    app.start_background_services(singletons=_take_services_lock())
@@ -0,0 +1,123 @@
+"""
+Per-session undo/redo history of task changes.
+
+Every user action is recorded as a list of changes, one per task it
+touched. A change is a compact delta `(id, before, after)` holding only
+the fields that differ:
+
+    ('3f2a...', {'completed': False, 'completed_at': None},
+                {'completed': True, 'completed_at': '2026-10-19T09:30:00'})
+
+A created task has before=None and the whole record as `after`; a removed
+task the other way around. Undo applies the inverse delta (after -> before)
+and redo the delta itself, both only if the task still holds the values
+the delta starts from; otherwise the step conflicts and is dropped.
+
+Each session keeps at most `depth` steps to undo in a ring buffer (the
+oldest fall off), plus the steps undone since its last new action. State is
+in memory and per process; the least recently active sessions are dropped
+beyond `max_sessions`.
+"""
+import os
+import threading
+from collections import OrderedDict, deque
+
+HISTORY_DEPTH = int(os.environ.get('HISTORY_DEPTH', 50))
+MAX_SESSIONS = int(os.environ.get('HISTORY_MAX_SESSIONS', 1000))
+
+
+def diff(before, after):
+    """Change from one version of a task to another (either may be None),
+    or None when nothing differs"""
+    if before is None and after is None:
+        return None
+    if before is None:
+        return (after['id'], None, dict(after))
+    if after is None:
+        return (before['id'], dict(before), None)
+    keys = [k for k in after if before.get(k) != after[k]]
+    if not keys:
+        return None
+    return (after['id'], {k: before.get(k) for k in keys}, {k: after[k] for k in keys})
+
+
+def invert(change):
+    task_id, before, after = change
+    return (task_id, after, before)
+
+
+def conflicts(change, todo):
+    """True when `todo` (None if absent) is not in the state `change` starts from"""
+    _, before, _ = change
+    if before is None:
+        return todo is not None
+    if todo is None:
+        return True
+    return any(todo.get(k) != v for k, v in before.items())
+
+
+class _Session:
+    __slots__ = ('undo', 'redo')
+
+    def __init__(self, depth):
+        self.undo = deque(maxlen=depth)
+        self.redo = deque(maxlen=depth)
+
+
+class History:
+    """Undo and redo stacks per session"""
+
+    def __init__(self, depth=HISTORY_DEPTH, max_sessions=MAX_SESSIONS):
+        self.depth = depth
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _session(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = _Session(self.depth)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def record(self, session_id, changes):
+        """Add one step (an action's changes); a new action clears redo"""
+        changes = [c for c in changes if c is not None]
+        if not changes:
+            return
+        with self._lock:
+            session = self._session(session_id)
+            session.undo.append(changes)
+            session.redo.clear()
+
+    def take(self, session_id, direction):
+        """Pop the next step to apply for 'undo' or 'redo', already turned
+        into the changes to apply, or None when there is none"""
+        with self._lock:
+            session = self._session(session_id)
+            stack = session.undo if direction == 'undo' else session.redo
+            if not stack:
+                return None
+            step = stack.pop()
+        if direction == 'undo':
+            return [invert(c) for c in reversed(step)]
+        return step
+
+    def done(self, session_id, direction, changes):
+        """File a step applied by take() on the opposite stack"""
+        with self._lock:
+            session = self._session(session_id)
+            if direction == 'undo':
+                session.redo.append([invert(c) for c in reversed(changes)])
+            else:
+                session.undo.append(changes)
+
+    def sizes(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return {'undo': 0, 'redo': 0}
+            return {'undo': len(session.undo), 'redo': len(session.redo)}
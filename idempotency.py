@@ -0,0 +1,68 @@
+"""
+Bounded store of idempotency keys for replayed client mutations.
+
+Offline clients queue mutations and replay them later through /api/batch.
+A replay can be cut short after the server applied it (connection drops
+before the response arrives), so every op carries a client-generated key.
+The result of each applied key is remembered here and returned again on a
+repeat instead of applying the op twice.
+
+Only the newest MAX_KEYS keys are kept; clients flush their outbox within
+minutes of reconnecting, so older keys are never replayed in practice.
+"""
+import json
+import os
+import threading
+from collections import OrderedDict
+
+IDEMPOTENCY_FILE = os.environ.get('IDEMPOTENCY_FILE', 'idempotency.json')
+MAX_KEYS = int(os.environ.get('IDEMPOTENCY_MAX_KEYS', 5000))
+
+
+class IdempotencyStore:
+    """Insertion-ordered key -> result map, oldest keys evicted first"""
+
+    def __init__(self, path=IDEMPOTENCY_FILE, max_keys=MAX_KEYS):
+        self.path = path
+        self.max_keys = max_keys
+        # Held by callers around check-apply-remember so concurrent replays
+        # of the same key cannot both apply
+        self.lock = threading.RLock()
+        self._results = OrderedDict()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return
+        for key, result in entries[-self.max_keys:]:
+            self._results[key] = result
+
+    def get(self, key):
+        with self.lock:
+            return self._results.get(key)
+
+    def remember(self, key, result):
+        with self.lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_keys:
+                self._results.popitem(last=False)
+
+    def save(self):
+        with self.lock:
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump(list(self._results.items()), f)
+                os.replace(tmp_path, self.path)
+            except IOError:
+                return False
+        return True
+
+    def __len__(self):
+        return len(self._results)
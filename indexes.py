@@ -0,0 +1,407 @@
+"""
+In-memory indexes over todos.json, rebuilt only when the file changes.
+
+- DueDateIndex: task positions sorted by due date (day ordinal), so a due
+  date range is two bisections plus a slice: O(log N + k).
+- FacetIndex: one bitmap (a Python int, bit i = task idx i) per tag,
+  project, status and priority bucket. Filters combine with & and |, and
+  facet counts are popcounts of the intersections.
+- PathIndex: task positions sorted by materialized path, so the subtree
+  of a task is a bisected range.
+- columnar.TaskTable (TaskSnapshot.table): status flags, due ordinals and
+  timestamps as columns, for counts, priorities and retention cutoffs.
+- TaskIndexCache: loads the task list and builds its indexes once per file
+  version, detected by the file's stat signature. With a reloader (see
+  watcher.py) a new version is applied as a diff: indexes are patched at
+  the positions that changed.
+
+Positions are 1-based, like the `idx` used by the routes.
+"""
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, timedelta
+
+DUE_FORMAT = '%m/%d/%Y'
+
+FACETS = ('tag', 'project', 'status', 'priority')
+STATUSES = ('pending', 'completed', 'saved', 'deleted')
+MAX_TAGS = 20
+MAX_TAG_LENGTH = 40
+
+
+def parse_day(value):
+    """Parse a mm/dd/yyyy (or ISO yyyy-mm-dd) string into a date, or None"""
+    for fmt in (DUE_FORMAT, '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+def parse_tags(value):
+    """Normalize tags given as a list or a comma separated string:
+    lowercased, stripped, de-duplicated, in their original order"""
+    if isinstance(value, str):
+        value = value.split(',')
+    elif not isinstance(value, (list, tuple)):
+        value = ()
+    tags = []
+    for tag in value or ():
+        tag = str(tag).strip().lower()[:MAX_TAG_LENGTH]
+        if tag and tag not in tags:
+            tags.append(tag)
+    return tags[:MAX_TAGS]
+
+
+def task_status(todo):
+    """Single status bucket of a task, most specific first"""
+    if todo['deleted']:
+        return 'deleted'
+    if todo['saved']:
+        return 'saved'
+    if todo['completed']:
+        return 'completed'
+    return 'pending'
+
+
+def facet_values(todo):
+    """(facet, value) pairs a task is indexed under, except priority"""
+    for tag in todo['tags']:
+        yield 'tag', tag
+    if todo['project']:
+        yield 'project', todo['project']
+    yield 'status', task_status(todo)
+
+
+def file_signature(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class DueDateIndex:
+    """Task positions ordered by due date; tasks without a valid date are left out"""
+
+    def __init__(self, todos):
+        entries = []
+        for idx, todo in enumerate(todos, 1):
+            day = parse_day(todo['due'])
+            if day is not None:
+                entries.append((day.toordinal(), idx))
+        entries.sort()
+        self._ordinals = [ordinal for ordinal, _ in entries]
+        self._positions = [idx for _, idx in entries]
+
+    def patched(self, old, new, changed):
+        """Copy for the task list `new`, which differs from `old` only at
+        the 1-based positions in `changed`"""
+        ordinals, positions = list(self._ordinals), list(self._positions)
+        for idx in changed:
+            for todos, insert in ((old, False), (new, True)):
+                day = parse_day(todos[idx - 1]['due'])
+                if day is None:
+                    continue
+                ordinal = day.toordinal()
+                # Entries are sorted by (ordinal, position)
+                lo = bisect_left(ordinals, ordinal)
+                hi = bisect_right(ordinals, ordinal, lo)
+                at = bisect_left(positions, idx, lo, hi)
+                if insert:
+                    ordinals.insert(at, ordinal)
+                    positions.insert(at, idx)
+                else:
+                    del ordinals[at]
+                    del positions[at]
+        return DueDateIndex.from_sorted(ordinals, positions)
+
+    @classmethod
+    def from_sorted(cls, ordinals, positions):
+        """Index over prebuilt, equally long sequences: ascending due
+        ordinals and the position of each (e.g. memoryviews, see shared.py)"""
+        index = cls.__new__(cls)
+        index._ordinals = ordinals
+        index._positions = positions
+        return index
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _bounds(self, start, end):
+        lo = bisect_left(self._ordinals, start.toordinal()) if start else 0
+        hi = bisect_right(self._ordinals, end.toordinal()) if end else len(self._ordinals)
+        return lo, max(lo, hi)
+
+    def range(self, start=None, end=None):
+        """Positions of tasks due between `start` and `end` (dates, inclusive)"""
+        lo, hi = self._bounds(start, end)
+        return self._positions[lo:hi]
+
+    def count(self, start=None, end=None):
+        lo, hi = self._bounds(start, end)
+        return hi - lo
+
+    def by_day(self, start, end):
+        """Positions due in [start, end] grouped by date"""
+        lo, hi = self._bounds(start, end)
+        days = {}
+        for ordinal, idx in zip(self._ordinals[lo:hi], self._positions[lo:hi]):
+            days.setdefault(date.fromordinal(ordinal), []).append(idx)
+        return days
+
+
+# Path ids are 32 hex digits, so the paths of a task's descendants all
+# start with its path + '/', and '0' is the character right after '/'
+_SUBTREE_END = '0'
+
+
+def parent_path(path):
+    """Path of the parent of the task at `path` ('' for a top-level task)"""
+    return path.rpartition('/')[0]
+
+
+def path_depth(path):
+    """0 for a top-level task, 1 for its subtasks, ..."""
+    return path.count('/')
+
+
+class PathIndex:
+    """Task positions ordered by materialized path (schema.FIELDS), i.e.
+    depth-first with parents before their subtasks. The subtree of a task
+    is one contiguous run: two bisections and a slice."""
+
+    def __init__(self, todos):
+        entries = sorted((todo['path'], idx) for idx, todo in enumerate(todos, 1))
+        self._paths = [path for path, _ in entries]
+        self._positions = [idx for _, idx in entries]
+
+    def subtree(self, path):
+        """Positions of the task at `path` and of all its descendants"""
+        start = bisect_left(self._paths, path)
+        end = bisect_left(self._paths, path + _SUBTREE_END, start)
+        return self._positions[start:end]
+
+
+def bitmap_from_positions(positions, size):
+    """Bitmap with the bits of `positions` (all <= size) set"""
+    data = bytearray((size >> 3) + 1)
+    for idx in positions:
+        data[idx >> 3] |= 1 << (idx & 7)
+    return int.from_bytes(data, 'little')
+
+
+def positions_from_bitmap(bits):
+    """Set bit positions of a bitmap, ascending"""
+    positions = []
+    data = bits.to_bytes((bits.bit_length() + 7) >> 3, 'little')
+    for offset, byte in enumerate(data):
+        if byte:
+            base = offset << 3
+            positions.extend(base + bit for bit in range(8) if byte >> bit & 1)
+    return positions
+
+
+class FacetIndex:
+    """Bitmaps per facet value over task positions.
+
+    Priority buckets move with the calendar, so they are not stored per task:
+    they are due date ranges, cut from the DueDateIndex once per day.
+    """
+
+    def __init__(self, todos, due_index):
+        self.size = len(todos)
+        self.all = (1 << (self.size + 1)) - 2   # bits 1..size
+        self._due = due_index
+        self._priority = (None, {})
+
+        groups = {facet: {} for facet in FACETS if facet != 'priority'}
+        for idx, todo in enumerate(todos, 1):
+            for facet, value in facet_values(todo):
+                groups[facet].setdefault(value, []).append(idx)
+        self._bitmaps = {
+            facet: {value: bitmap_from_positions(positions, self.size)
+                    for value, positions in values.items()}
+            for facet, values in groups.items()
+        }
+
+    def patched(self, old, new, changed, due_index):
+        """Copy for the task list `new`, which differs from `old` only at
+        the 1-based positions in `changed`"""
+        index = FacetIndex.__new__(FacetIndex)
+        index.size = self.size
+        index.all = self.all
+        index._due = due_index
+        index._priority = (None, {})
+        bitmaps = {facet: dict(values) for facet, values in self._bitmaps.items()}
+        for idx in changed:
+            bit = 1 << idx
+            for facet, value in facet_values(old[idx - 1]):
+                values = bitmaps[facet]
+                values[value] &= ~bit
+                if not values[value]:
+                    del values[value]
+            for facet, value in facet_values(new[idx - 1]):
+                bitmaps[facet][value] = bitmaps[facet].get(value, 0) | bit
+        index._bitmaps = bitmaps
+        return index
+
+    def _priority_bitmaps(self, today):
+        day, bitmaps = self._priority
+        if day == today:
+            return bitmaps
+        # Same buckets as calculate_priority(): due today or earlier is
+        # OVERDUE, then HIGH up to 4 days out and MEDIUM up to 8
+        ranges = {
+            'OVERDUE': (None, today),
+            'HIGH': (today + timedelta(days=1), today + timedelta(days=4)),
+            'MEDIUM': (today + timedelta(days=5), today + timedelta(days=8)),
+            'LOW': (today + timedelta(days=9), None)
+        }
+        bitmaps = {name: bitmap_from_positions(self._due.range(start, end), self.size)
+                   for name, (start, end) in ranges.items()}
+        dated = bitmap_from_positions(self._due.range(), self.size)
+        bitmaps['N/A'] = self.all & ~dated
+        self._priority = (today, bitmaps)
+        return bitmaps
+
+    def values(self, facet, today=None):
+        if facet == 'priority':
+            return self._priority_bitmaps(today or date.today())
+        return self._bitmaps.get(facet, {})
+
+    def bitmap(self, facet, value, today=None):
+        return self.values(facet, today).get(value, 0)
+
+    def select(self, filters, within=None, today=None):
+        """Apply {facet: [values]} filters: values of one facet are OR'ed,
+        facets are AND'ed. Returns (bitmap, facet counts).
+
+        The counts of each facet ignore that facet's own filter, so they tell
+        how many tasks each alternative value would match.
+        """
+        within = self.all if within is None else within
+        masks = {}
+        for facet, wanted in filters.items():
+            mask = 0
+            for value in wanted:
+                mask |= self.bitmap(facet, value, today)
+            masks[facet] = mask
+
+        selected = within
+        for mask in masks.values():
+            selected &= mask
+
+        counts = {}
+        for facet in FACETS:
+            base = within
+            for other, mask in masks.items():
+                if other != facet:
+                    base &= mask
+            counts[facet] = {}
+            for value, bits in self.values(facet, today).items():
+                count = (base & bits).bit_count()
+                if count:
+                    counts[facet][value] = count
+        return selected, counts
+
+
+class TaskSnapshot:
+    """One version of the task list with its indexes; the facet index and
+    the columnar table are built the first time they are needed"""
+
+    def __init__(self, todos, due=None, table=None, facets=None):
+        self.todos = todos
+        self.due = DueDateIndex(todos) if due is None else due
+        self._facets = facets
+        self._table = table
+        self._by_id = None
+        self._tree = None
+        self._lock = threading.Lock()
+
+    @property
+    def facets(self):
+        with self._lock:
+            if self._facets is None:
+                self._facets = FacetIndex(self.todos, self.due)
+            return self._facets
+
+    def patched(self, todos, changed):
+        """Snapshot of `todos`, which differs from this one only at the 1-based
+        positions in `changed`; the indexes built so far are patched"""
+        due = self.due.patched(self.todos, todos, changed)
+        with self._lock:
+            facets, table, by_id, tree = self._facets, self._table, self._by_id, self._tree
+        snapshot = TaskSnapshot(
+            todos, due=due,
+            table=table.patched(todos, changed) if table is not None else None,
+            facets=facets.patched(self.todos, todos, changed, due) if facets is not None else None)
+        if by_id is not None:
+            by_id = dict(by_id)
+            for idx in changed:
+                by_id.pop(self.todos[idx - 1]['id'], None)
+            by_id.update((todos[idx - 1]['id'], idx) for idx in changed)
+            snapshot._by_id = by_id
+        # The path index only holds paths and positions, which edits keep
+        if tree is not None and all(self.todos[idx - 1]['path'] == todos[idx - 1]['path'] for idx in changed):
+            snapshot._tree = tree
+        return snapshot
+
+    @property
+    def by_id(self):
+        """{task id: 1-based position}"""
+        with self._lock:
+            if self._by_id is None:
+                self._by_id = {todo['id']: idx for idx, todo in enumerate(self.todos, 1)}
+            return self._by_id
+
+    @property
+    def tree(self):
+        with self._lock:
+            if self._tree is None:
+                self._tree = PathIndex(self.todos)
+            return self._tree
+
+    @property
+    def table(self):
+        # columnar imports this module, hence the late import
+        import columnar
+        with self._lock:
+            if self._table is None:
+                self._table = columnar.TaskTable(self.todos)
+            return self._table
+
+
+class TaskIndexCache:
+    """Task list plus indexes, shared across requests until the file changes.
+
+    The snapshot's todos must be treated as read-only; routes that modify
+    tasks load their own copy with load_todos() and save it.
+    """
+
+    def __init__(self, path, loader, reloader=None):
+        self.path = path
+        self.loader = loader
+        self.reloader = reloader
+        self._lock = threading.Lock()
+        self._signature = None
+        self._snapshot = TaskSnapshot([])
+
+    def get(self):
+        with self._lock:
+            # Stat before loading: a write landing in between makes the
+            # next call reload instead of being missed
+            signature = file_signature(self.path)
+            if signature is None or signature != self._signature:
+                if self.reloader is not None:
+                    self._snapshot = self.reloader(self._snapshot)
+                else:
+                    self._snapshot = TaskSnapshot(self.loader())
+                self._signature = signature
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
@@ -1,11 +1,20 @@
 import json
 import os
-import argparse
 import re
+import sys
 from datetime import datetime, timedelta
 
+# argparse, shlex, transfer, storage, schema and snapshots are imported lazily
+# where needed: they are only used for --help, batch scripts, saving and adding
+# tasks, import/export, schema checks and snapshots, and importing them
+# dominates startup for one-off commands like `main.py list`.
+
 TODO_FILE = 'todos.json'
 
+# In batch mode saves are deferred and the list is written once at the end
+_batch_mode = False
+_dirty = False
+
 def load_todos():
     if not os.path.exists(TODO_FILE):
         return []
@@ -17,16 +26,22 @@ def load_todos():
         return []
 
 def save_todos(todos):
-    try:
-        with open(TODO_FILE, 'w') as f:
-            json.dump(todos, f, indent=2)
-    except IOError:
+    global _dirty
+    if _batch_mode:
+        _dirty = True
+        return
+    import storage
+    # Written to a temporary file and renamed: the server's file watcher and
+    # shared snapshot read todos.json while it changes
+    if not storage.save_segment(TODO_FILE, todos):
         print('Error: Could not save todos.')
 
 
 def cleanup_completed(todos):
-    """Remove todos that were completed more than 2 days ago."""
-    changed = False
+    """Remove todos that were completed more than 2 days ago.
+
+    Does not save; callers persist the result together with their own change.
+    """
     now = datetime.now()
     cutoff = now - timedelta(days=2)
     remaining = []
@@ -35,14 +50,11 @@ def cleanup_completed(todos):
             try:
                 completed_at = datetime.fromisoformat(t.get('completed_at'))
                 if completed_at < cutoff:
-                    changed = True
                     continue
             except Exception:
                 # if parsing fails, keep the item
                 pass
         remaining.append(t)
-    if changed:
-        save_todos(remaining)
     return remaining
 
 def validate_due_date(due):
@@ -113,7 +125,8 @@ def add_todo(todos, task, due, description=''):
     if not validate_due_date(due):
         print('  ✗ Error: Due date must be in mm/dd/yyyy format.')
         return False
-    todos.append({'task': task, 'due': due, 'completed': False, 'description': description, 'completed_at': None})
+    import schema
+    todos.append(schema.new_record(task, due, description))
     save_todos(todos)
     priority = calculate_priority(due)
     print(f'  ✓ Added: "{task}" (Due: {due}) - Priority: [{priority}]')
@@ -136,12 +149,11 @@ def complete_todo(todos, idx):
         return False
     todos[idx - 1]['completed'] = True
     todos[idx - 1]['completed_at'] = datetime.now().isoformat()
-    save_todos(todos)
     print(f'  ✓ Completed: "{todos[idx - 1]["task"]}"')
-    # Cleanup any old completed tasks and update the list in-place
-    remaining = cleanup_completed(todos)
-    todos.clear()
-    todos.extend(remaining)
+    # Cleanup any old completed tasks and update the list in-place,
+    # then write both changes in a single save
+    todos[:] = cleanup_completed(todos)
+    save_todos(todos)
     return todos
 
 def edit_todo(todos, idx):
@@ -201,6 +213,119 @@ def search_todos(todos, query):
             print(f"      → {desc}")
     print('-'*60 + '\n')
 
+def import_file(path, fmt=None):
+    """Stream tasks from a CSV / JSONL / .ics file into todos.json
+    (deleted and saved tasks go to the trash / archive segments)"""
+    import storage
+    import transfer
+    fmt = fmt or transfer.detect_format(path)
+    if fmt not in transfer.FORMATS:
+        print(f'  ✗ Error: Unsupported format "{fmt}". Use csv, jsonl or ics.')
+        return False
+    try:
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            summary = transfer.import_stream(f, fmt, storage.router(TODO_FILE), validate_due_date)
+    except IOError:
+        print(f'  ✗ Error: Could not read "{path}".')
+        return False
+    print(f'  ✓ Imported {summary["imported"]} task(s) in {summary["chunks"]} chunk(s), '
+          f'{summary["rejected"]} rejected.')
+    for err in summary['errors']:
+        print(f'      record {err["record"]}: {err["error"]}')
+    return True
+
+def export_file(path, fmt=None):
+    """Stream all tasks (active, trash and archive) out as CSV / JSONL / .ics
+    (path '-' for stdout)"""
+    import storage
+    import transfer
+    paths = list(storage.segment_paths(TODO_FILE).values())
+    fmt = fmt or transfer.detect_format(path)
+    if fmt not in transfer.FORMATS:
+        print(f'  ✗ Error: Unsupported format "{fmt}". Use csv, jsonl or ics.')
+        return False
+    if path == '-':
+        for chunk in transfer.export_stream(paths, fmt):
+            sys.stdout.write(chunk)
+        return True
+    try:
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            for chunk in transfer.export_stream(paths, fmt):
+                f.write(chunk)
+    except IOError:
+        print(f'  ✗ Error: Could not write "{path}".')
+        return False
+    print(f'  ✓ Exported tasks to {path}')
+    return True
+
+def snapshot_command(args):
+    """snapshot [create | list | restore <id> | prune]"""
+    import snapshots
+    import storage
+    action = args[0].lower() if args else 'create'
+    if action == 'create':
+        manifest = snapshots.create_snapshot(TODO_FILE, segments=storage.COLD_SEGMENTS)
+        print(f'  ✓ Snapshot {manifest["id"]}: {manifest["records"]} task(s), '
+              f'{manifest["new_chunks"]} new chunk(s), {manifest["bytes_written"]} bytes written')
+    elif action == 'list':
+        items = snapshots.list_snapshots()
+        if not items:
+            print('  ℹ  No snapshots yet.')
+        for m in items:
+            print(f'  {m["id"]}  {m["created_at"][:19]}  {m["records"]:>7} task(s)')
+    elif action == 'restore' and len(args) > 1:
+        try:
+            count = snapshots.restore_snapshot(args[1], TODO_FILE, segments=storage.COLD_SEGMENTS)
+        except snapshots.SnapshotError as e:
+            print(f'  ✗ Error: {e}')
+            return False
+        print(f'  ✓ Restored {count} task(s) from snapshot {args[1]}')
+        # The snapshot may predate the current schema
+        return schema_command(['migrate'])
+    elif action == 'prune':
+        removed = snapshots.prune_snapshots()
+        print(f'  ✓ Removed {removed} old snapshot(s)')
+    else:
+        print('  ✗ Usage: snapshot [create | list | restore <id> | prune]')
+        return False
+    return True
+
+def schema_command(args):
+    """fsck | migrate: check or rewrite all segments in the current task schema"""
+    import schema
+    action = args[0].lower() if args else 'fsck'
+    if action == 'fsck':
+        report = schema.fsck(TODO_FILE)
+        print(f'  Schema version {report["version"]} (current {report["current"]}), '
+              f'{report["records"]} task(s): ' +
+              ', '.join(f'{n} {tier}' for tier, n in report['segments'].items()))
+        for error in report['errors']:
+            print(f'  ✗ {error}')
+        for problem in report['problems']:
+            print(f'      {problem["segment"]} record {problem["record"]}: {", ".join(problem["problems"])}')
+        if report['invalid'] > len(report['problems']):
+            print(f'      ... {report["invalid"] - len(report["problems"])} more')
+        for code, count in sorted(report['counts'].items()):
+            print(f'  {code:<28} {count:>7}')
+        if report['ok']:
+            print('  ✓ All tasks match the current schema.')
+        else:
+            print(f'  ✗ {report["invalid"]} task(s) do not match the schema. `migrate` fixes all '
+                  'but bad-due and empty-task, which need an edit.')
+        return report['ok']
+    if action == 'migrate':
+        try:
+            summary = schema.migrate(TODO_FILE)
+        except schema.SchemaError as e:
+            print(f'  ✗ Error: {e}')
+            return False
+        print(f'  ✓ Migrated {summary["records"]} task(s) to schema version {schema.SCHEMA_VERSION}: '
+              f'{summary["normalized"]} normalized, {summary["moved"]} moved, '
+              f'{summary["new_ids"]} new id(s), {summary["dropped"]} dropped')
+        return True
+    print('  ✗ Usage: fsck | migrate')
+    return False
+
 def display_menu():
     """Display main menu options"""
     print('\n' + '='*70)
@@ -213,6 +338,7 @@ def display_menu():
     print('  5. edit [e] <#>      - Edit a task (name/description/due)')
     print('  6. search [s] <term> - Search tasks by keyword')
     print('  7. quit [q]          - Exit application')
+    print('  (Tip: `main.py batch <file>` runs many commands with a single save)')
     print('='*70 + '\n')
 
 def interactive_add(todos):
@@ -237,37 +363,119 @@ def interactive_add(todos):
     
     return add_todo(todos, task, due, description)
 
-def main():
-    parser = argparse.ArgumentParser(description='Todo List App - Stay Organized & On Time')
-    parser.add_argument('command', nargs='?', help='Command: add/list/delete/complete/quit')
-    parser.add_argument('arg', nargs='*', help='Additional arguments')
-    args = parser.parse_args()
+def run_command(todos, cmd, args):
+    """Run a single command-line style command. Returns False on failure."""
+    cmd = cmd.lower()
+    if cmd in ('add', 'a') and len(args) >= 2:
+        *task_parts, due = args
+        return add_todo(todos, ' '.join(task_parts), due, '')
+    elif cmd in ('list', 'l'):
+        list_todos(todos)
+    elif cmd in ('delete', 'd') and args and args[0].isdigit():
+        return delete_todo(todos, int(args[0]))
+    elif cmd in ('complete', 'c') and args and args[0].isdigit():
+        return complete_todo(todos, int(args[0])) is not False
+    elif cmd in ('edit', 'e') and args and args[0].isdigit():
+        return edit_todo(todos, int(args[0]))
+    elif cmd in ('search', 's') and args:
+        search_todos(todos, ' '.join(args))
+    elif cmd in ('quit', 'q'):
+        print('  Goodbye!')
+    else:
+        print('  ✗ Invalid command or missing argument.')
+        return False
+    return True
+
+def run_batch(todos, lines):
+    """Apply many commands against one loaded list and write it once.
+
+    Each line is a command as it would be typed after `main.py`, e.g.
+    `add Buy milk 02/14/2026` or `complete 3`. Blank lines and lines
+    starting with # are ignored. Interactive commands (edit) are skipped.
+    """
+    global _batch_mode, _dirty
+    import shlex
+
+    _batch_mode, _dirty = True, False
+    applied = failed = 0
+    try:
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            try:
+                cmd, *args = shlex.split(line)
+            except ValueError as e:
+                print(f'  ✗ Line {lineno}: {e}')
+                failed += 1
+                continue
+            if cmd.lower() in ('edit', 'e'):
+                print(f'  ✗ Line {lineno}: edit is interactive and not supported in batch mode.')
+                failed += 1
+                continue
+            if run_command(todos, cmd, args):
+                applied += 1
+            else:
+                failed += 1
+    finally:
+        _batch_mode = False
+        if _dirty:
+            save_todos(todos)
+    print(f'  ✓ Batch finished: {applied} command(s) applied, {failed} failed.')
+    return failed == 0
+
+def parse_args(argv):
+    """Split argv into (command, args); argparse is only loaded for --help"""
+    if any(a in ('-h', '--help') for a in argv):
+        import argparse
+        parser = argparse.ArgumentParser(description='Todo List App - Stay Organized & On Time')
+        parser.add_argument('command', nargs='?', help='Command: add/list/delete/complete/search/batch/import/export/snapshot/fsck/migrate/quit')
+        parser.add_argument('arg', nargs='*', help='Additional arguments (batch: script file or -; import/export: file [csv|jsonl|ics])')
+        args = parser.parse_args(argv)
+        return args.command, args.arg
+    if not argv:
+        return None, []
+    return argv[0], argv[1:]
+
+def main(argv=None):
+    command, cmd_args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    # Import/export stream the file directly instead of loading the list
+    if command and command.lower() in ('import', 'export'):
+        if not cmd_args:
+            print(f'  ✗ Usage: {command.lower()} <file> [csv|jsonl|ics]')
+            return False
+        handler = import_file if command.lower() == 'import' else export_file
+        return handler(cmd_args[0], cmd_args[1] if len(cmd_args) > 1 else None)
+
+    if command and command.lower() == 'snapshot':
+        return snapshot_command(cmd_args)
+
+    if command and command.lower() in ('fsck', 'migrate'):
+        return schema_command([command.lower()])
 
     todos = load_todos()
     # Remove completed tasks older than 2 days on startup
-    todos = cleanup_completed(todos)
+    remaining = cleanup_completed(todos)
+    if len(remaining) != len(todos):
+        todos = remaining
+        save_todos(todos)
+
+    # Batch mode: many commands, one load, one write
+    if command and command.lower() in ('batch', 'b'):
+        source = cmd_args[0] if cmd_args else '-'
+        if source == '-':
+            return run_batch(todos, sys.stdin)
+        try:
+            with open(source, 'r') as f:
+                return run_batch(todos, f)
+        except IOError:
+            print(f'  ✗ Error: Could not read batch file "{source}".')
+            return False
 
     # Command-line mode
-    if args.command:
-        cmd = args.command.lower()
-        if cmd in ('add', 'a') and len(args.arg) >= 2:
-            *task_parts, due = args.arg
-            add_todo(todos, ' '.join(task_parts), due, '')
-        elif cmd in ('list', 'l'):
-            list_todos(todos)
-        elif cmd in ('delete', 'd') and args.arg and args.arg[0].isdigit():
-            delete_todo(todos, int(args.arg[0]))
-        elif cmd in ('complete', 'c') and args.arg and args.arg[0].isdigit():
-            complete_todo(todos, int(args.arg[0]))
-        elif cmd in ('edit', 'e') and args.arg and args.arg[0].isdigit():
-            edit_todo(todos, int(args.arg[0]))
-        elif cmd in ('search', 's') and args.arg:
-            search_todos(todos, ' '.join(args.arg))
-        elif cmd in ('quit', 'q'):
-            print('  Goodbye!')
-        else:
-            print('  ✗ Invalid command or missing argument.')
-        return
+    if command:
+        return run_command(todos, command, cmd_args) is not False
 
     # Interactive mode
     print('\n' + '='*70)
@@ -319,10 +527,12 @@ def main():
             break
         else:
             print('  ✗ Unknown command. Please try again.')
+    return True
 
 def run():
+    """Entry point: exits with status 1 when a command (or a batch line) failed"""
     try:
-        main()
+        sys.exit(0 if main() else 1)
     except KeyboardInterrupt:
         print('\n\n  Exiting. Goodbye!')
 
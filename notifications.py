@@ -0,0 +1,245 @@
+"""
+Due-date notification scheduler for TodoHub.
+
+Every open task crosses at most three priority thresholds during its life
+(LOW -> MEDIUM, MEDIUM -> HIGH, HIGH -> OVERDUE). Instead of recomputing the
+priority of every task on each request, the scheduler keeps the upcoming
+crossings in a min-heap ordered by the moment they happen and emits an event
+when one is reached. Emitted events go into a bounded log persisted to
+notifications.json.
+"""
+import atexit
+import heapq
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, timedelta
+
+from indexes import file_signature
+
+NOTIFICATIONS_FILE = 'notifications.json'
+MAX_EVENTS = 500
+
+# Offset from the due date at which a task enters each priority, mirroring
+# calculate_priority(): MEDIUM within 7 days, HIGH within 3 days, OVERDUE after.
+THRESHOLDS = [
+    (timedelta(days=-8), 'LOW', 'MEDIUM'),
+    (timedelta(days=-4), 'MEDIUM', 'HIGH'),
+    (timedelta(0), 'HIGH', 'OVERDUE'),
+]
+
+# Upper bound on how long the worker sleeps, so clock jumps are picked up
+MAX_SLEEP_SECONDS = 3600
+# The time of the last run is persisted at least this often (and whenever
+# events are emitted), so a restart does not replay crossings already past
+LAST_RUN_SAVE_INTERVAL = timedelta(seconds=60)
+
+
+def parse_due(due_date_str):
+    """Parse a mm/dd/yyyy due date, returning None when invalid"""
+    try:
+        return datetime.strptime(due_date_str or '', '%m/%d/%Y')
+    except ValueError:
+        return None
+
+
+def is_schedulable(todo):
+    """Only open tasks (not completed, deleted or archived) get notifications"""
+    return not (todo.get('completed') or todo.get('deleted') or todo.get('saved'))
+
+
+class NotificationScheduler:
+    """Min-heap of upcoming priority crossings plus a bounded event log"""
+
+    def __init__(self, path=NOTIFICATIONS_FILE, max_events=MAX_EVENTS):
+        self.path = path
+        self._lock = threading.RLock()
+        self._wakeup = threading.Condition(self._lock)
+        self._heap = []        # (fire_at, generation, task_id, old, new)
+        self._tasks = {}       # task_id -> (generation, task name)
+        self._generation = 0
+        self._events = deque(maxlen=max_events)
+        self._next_event_id = 1
+        self._last_run = None
+        self._saved_run = None    # _last_run as last written to the log
+        self._signature = None    # of the log file as last read or written
+        self._thread = None
+        self._load_log()
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def _load_log(self):
+        if not os.path.exists(self.path):
+            return
+        signature = file_signature(self.path)
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError):
+            return
+        self._signature = signature
+        self._events.clear()
+        self._events.extend(data.get('events', []))
+        self._next_event_id = data.get('next_id', len(self._events) + 1)
+        if data.get('last_run'):
+            try:
+                self._last_run = datetime.fromisoformat(data['last_run'])
+            except ValueError:
+                self._last_run = None
+
+    def _save_log(self):
+        data = {
+            'last_run': self._last_run.isoformat() if self._last_run else None,
+            'next_id': self._next_event_id,
+            'events': list(self._events)
+        }
+        tmp_path = self.path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(data, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except IOError:
+            return False
+        self._saved_run = self._last_run
+        self._signature = file_signature(self.path)
+        return True
+
+    def _refresh_log(self):
+        """Re-read the log if another process (the one running the
+        scheduler thread) wrote it since"""
+        if file_signature(self.path) != self._signature:
+            self._load_log()
+
+    def flush(self):
+        """Emit what is due and persist the log, e.g. on shutdown"""
+        with self._lock:
+            self.run_pending()
+            self._save_log()
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def rebuild(self, todos):
+        """Schedule all open tasks. Crossings missed while the app was down
+        (after the last recorded run) are still emitted once."""
+        with self._lock:
+            self._heap = []
+            self._tasks = {}
+            since = self._last_run or datetime.now()
+            for todo in todos:
+                self._schedule(todo, since)
+            heapq.heapify(self._heap)
+            self._wakeup.notify()
+
+    def track(self, todo):
+        """(Re)schedule a single task after it was added or changed"""
+        with self._lock:
+            self._tasks.pop(todo.get('id'), None)
+            if self._schedule(todo, datetime.now(), push=True):
+                self._wakeup.notify()
+
+    def forget(self, task_id):
+        """Stop notifying for a task; its heap entries become stale"""
+        with self._lock:
+            self._tasks.pop(task_id, None)
+
+    def _schedule(self, todo, since, push=False):
+        task_id = todo.get('id')
+        due = parse_due(todo.get('due', ''))
+        if not task_id or due is None or not is_schedulable(todo):
+            return False
+        self._generation += 1
+        self._tasks[task_id] = (self._generation, todo.get('task'))
+        for offset, old, new in THRESHOLDS:
+            fire_at = due + offset
+            if fire_at > since:
+                entry = (fire_at, self._generation, task_id, old, new)
+                if push:
+                    heapq.heappush(self._heap, entry)
+                else:
+                    self._heap.append(entry)
+        return True
+
+    def next_fire_time(self):
+        """Moment of the earliest live crossing, or None"""
+        with self._lock:
+            while self._heap and not self._is_live(self._heap[0]):
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def _is_live(self, entry):
+        current = self._tasks.get(entry[2])
+        return current is not None and current[0] == entry[1]
+
+    def run_pending(self, now=None):
+        """Emit an event for every crossing that is due. Returns new events."""
+        now = now or datetime.now()
+        emitted = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                entry = heapq.heappop(self._heap)
+                if not self._is_live(entry):
+                    continue
+                fire_at, _, task_id, old, new = entry
+                emitted.append(self._emit(task_id, old, new, fire_at))
+            self._last_run = now
+            if emitted or self._saved_run is None or now - self._saved_run >= LAST_RUN_SAVE_INTERVAL:
+                self._save_log()
+        return emitted
+
+    def _emit(self, task_id, old, new, fire_at):
+        name = self._tasks[task_id][1]
+        event = {
+            'id': self._next_event_id,
+            'type': 'priority_change',
+            'task_id': task_id,
+            'task': name,
+            'old_priority': old,
+            'new_priority': new,
+            'message': f"{name} moved to {new}",
+            'timestamp': fire_at.isoformat()
+        }
+        self._next_event_id += 1
+        self._events.append(event)
+        return event
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def events(self, page=1, per_page=20, task_id=None):
+        """Return one page of events (newest first) and the total count"""
+        with self._lock:
+            self._refresh_log()
+            events = [e for e in reversed(self._events)
+                      if task_id is None or e.get('task_id') == task_id]
+        page = max(page, 1)
+        start = (page - 1) * per_page
+        return events[start:start + per_page], len(events)
+
+    # ------------------------------------------------------------------
+    # Background worker
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the daemon thread that fires crossings as they come due"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='notification-scheduler', daemon=True)
+            self._thread.start()
+            atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                self.run_pending()
+                next_at = self.next_fire_time()
+                timeout = MAX_SLEEP_SECONDS
+                if next_at is not None:
+                    timeout = min(timeout, max((next_at - datetime.now()).total_seconds(), 0))
+                self._wakeup.wait(timeout)
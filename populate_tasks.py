@@ -1,9 +1,25 @@
 """
 Script to populate todos.json with sample tasks
 Run this once to load the sample data into your app
+
+With --count it generates a synthetic dataset of any size instead (10k to
+10M tasks) for load testing: mixed statuses, recurring tasks, long
+descriptions, projects and tags, and due dates bunched around today with a
+long tail. Records are streamed straight into todos.json, trash.json and
+archive.json, so memory use does not grow with the dataset.
+
+Usage: python populate_tasks.py [--count 100000] [--seed 1] [--dir .]
 """
+import argparse
 import json
-from datetime import datetime
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+import schema
+import storage
 
 sample_tasks = [
   {"title":"Replace car windshield wipers","dueDate":"2026-04-03","description":"Improve visibility before spring rains."},
@@ -116,17 +132,8 @@ def populate_tasks():
     todos = []
     
     for task_data in sample_tasks:
-        todo = {
-            "task": task_data["title"],
-            "due": convert_date_format(task_data["dueDate"]),
-            "description": task_data["description"],
-            "completed": False,
-            "completed_at": None,
-            "deleted": False,
-            "deleted_at": None,
-            "saved": False,
-            "saved_at": None
-        }
+        todo = schema.new_record(task_data["title"], convert_date_format(task_data["dueDate"]),
+                                 task_data["description"])
         todos.append(todo)
     
     # Save to todos.json
@@ -136,5 +143,110 @@ def populate_tasks():
     print(f"✅ Successfully loaded {len(todos)} tasks into todos.json!")
     print("Refresh your app in the browser to see all the new tasks.")
 
+# ============================================================================
+# SYNTHETIC DATASETS
+# ============================================================================
+
+PROJECTS = ['home', 'work', 'garden', 'finance', 'health', 'travel', 'car', 'family',
+            'side-project', 'learning', 'kitchen', 'pets', 'admin', 'events', 'fitness']
+TAGS = ['errand', 'urgent', 'weekly', 'phone', 'online', 'shopping', 'cleaning', 'bills',
+        'someday', 'waiting', 'quick', 'outdoors', 'paperwork', 'kids', 'repair', 'email',
+        'appointments', 'gifts', 'reading', 'planning']
+RECURRENCE_WEIGHTS = {'none': 80, 'daily': 8, 'weekly': 7, 'monthly': 4, 'yearly': 1}
+# Share of tasks per status; the rest are pending
+STATUS_WEIGHTS = {'pending': 60, 'completed': 20, 'saved': 10, 'deleted': 10}
+LONG_DESCRIPTION_SHARE = 0.15
+
+def _zipf_weights(count):
+    """Cumulative weights under which a few values are common, most rare"""
+    return list(accumulate(1 / rank for rank in range(1, count + 1)))
+
+def generate_tasks(count, seed=None, today=None):
+    """Yield `count` synthetic tasks in the canonical schema"""
+    rng = random.Random(seed)
+    today = today or datetime.now()
+    words = ' '.join(t['description'] for t in sample_tasks).lower().replace('.', '').split()
+    # random.choices() is given cumulative weights so it does not sum them
+    # again on every call
+    project_weights = _zipf_weights(len(PROJECTS))
+    tag_weights = _zipf_weights(len(TAGS))
+    recurrences, recurrence_weights = zip(*RECURRENCE_WEIGHTS.items())
+    recurrence_weights = list(accumulate(recurrence_weights))
+    statuses, status_weights = zip(*STATUS_WEIGHTS.items())
+    status_weights = list(accumulate(status_weights))
+    due_dates = {}
+
+    for _ in range(count):
+        sample = rng.choice(sample_tasks)
+        # Most due dates fall within a few weeks, a long tail runs for years;
+        # a quarter are already past due
+        if rng.random() < 0.25:
+            offset = -int(rng.expovariate(1 / 10))
+        else:
+            offset = min(int(rng.lognormvariate(2.0, 1.0)), 3650)
+        due = due_dates.get(offset)
+        if due is None:
+            due = due_dates[offset] = (today + timedelta(days=offset)).strftime('%m/%d/%Y')
+        if rng.random() < LONG_DESCRIPTION_SHARE:
+            description = ' '.join(rng.choices(words, k=rng.randint(50, 400))).capitalize() + '.'
+        else:
+            description = sample['description']
+        project = rng.choices(PROJECTS, cum_weights=project_weights)[0] if rng.random() < 0.7 else ''
+        tags = set(rng.choices(TAGS, cum_weights=tag_weights, k=rng.randint(0, 4)))
+        todo = schema.new_record(sample['title'], due, description,
+                                 rng.choices(recurrences, cum_weights=recurrence_weights)[0], project, sorted(tags))
+
+        status = rng.choices(statuses, cum_weights=status_weights)[0]
+        # Timestamps stay recent enough that the cleanup of old completed
+        # and deleted tasks does not purge them on the first request
+        if status == 'completed' or (status == 'saved' and rng.random() < 0.5):
+            todo['completed'] = True
+            todo['completed_at'] = (today - timedelta(hours=rng.uniform(0, 36))).isoformat()
+        if status == 'saved':
+            todo['saved'] = True
+            todo['saved_at'] = (today - timedelta(days=rng.uniform(0, 365))).isoformat()
+        elif status == 'deleted':
+            todo['deleted'] = True
+            todo['deleted_at'] = (today - timedelta(hours=rng.uniform(0, 60))).isoformat()
+        yield todo
+
+def write_dataset(count, seed=None, directory='.'):
+    """Stream a synthetic dataset into the segment files in `directory`,
+    replacing what is there. Returns the number of tasks per segment."""
+    hot_path = os.path.join(directory, 'todos.json')
+    writers = {tier: storage.SegmentWriter(os.path.join(directory, os.path.basename(path)))
+               for tier, path in storage.segment_paths('todos.json').items()}
+    try:
+        for todo in generate_tasks(count, seed):
+            writers[storage.tier_of(todo)].write(todo)
+    except BaseException:
+        for writer in writers.values():
+            writer.discard()
+        raise
+    for writer in writers.values():
+        writer.replace()
+    counts = {tier: writer.count for tier, writer in writers.items()}
+    schema.record_version(hot_path, counts)
+    return counts
+
+def main():
+    parser = argparse.ArgumentParser(description='Load sample tasks, or generate a synthetic dataset')
+    parser.add_argument('--count', type=int, help='Generate this many synthetic tasks instead of the samples')
+    parser.add_argument('--seed', type=int, help='Random seed for a reproducible dataset')
+    parser.add_argument('--dir', default='.', help='Directory to write the dataset to')
+    args = parser.parse_args()
+
+    if args.count is None:
+        populate_tasks()
+        return
+
+    start = time.perf_counter()
+    counts = write_dataset(args.count, args.seed, args.dir)
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(os.path.join(args.dir, os.path.basename(path)))
+               for path in storage.segment_paths('todos.json').values())
+    print(f"✅ Generated {args.count} tasks in {elapsed:.1f}s ({args.count / max(elapsed, 1e-9):,.0f} tasks/s), "
+          f"{size / 1e6:.1f} MB: " + ', '.join(f'{n} {tier}' for tier, n in counts.items()))
+
 if __name__ == "__main__":
-    populate_tasks()
+    main()
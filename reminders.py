@@ -0,0 +1,317 @@
+"""
+Daily reminder digest, computed once a day and delivered in the background.
+
+ReminderService builds the digest of high-priority tasks just after
+midnight (DIGEST_DELAY past it) and caches it, so /api/daily-reminder only
+reads the cache. The first read of a day the scheduler has not reached
+yet (it is not running, or the app started after midnight) builds it once.
+
+Each digest built by the scheduler is queued once per sink and delivered
+by a small pool of worker threads:
+
+    MboxSink     appends an email message to a local mbox file
+    WebhookSink  POSTs {"digests": [...]} as JSON to a URL
+    WebPushSink  sends a notification to every stored browser push
+                 subscription (needs the optional pywebpush package and
+                 VAPID keys)
+
+The queue is bounded: jobs beyond `max_queue` are dropped and counted. A
+worker takes whatever is queued, up to `batch_size` jobs, and hands each
+sink its digests in one call; a failed call is retried with exponential
+backoff before the digests are counted as failed.
+"""
+import email.utils
+import json
+import mailbox
+import os
+import queue
+import threading
+import urllib.request
+import uuid
+from datetime import date, datetime, time, timedelta
+from email.message import EmailMessage
+
+try:
+    from pywebpush import webpush, WebPushException
+except ImportError:   # Web Push delivery is unavailable
+    webpush = None
+    WebPushException = None
+
+# Time after midnight at which the day's digest is built and delivered
+DIGEST_DELAY = timedelta(seconds=int(os.environ.get('REMINDER_DIGEST_DELAY', 60)))
+# Upper bound on how long the scheduler sleeps, so clock jumps are picked up
+MAX_SLEEP_SECONDS = 3600
+
+PUSH_SUBSCRIPTIONS_FILE = os.environ.get('PUSH_SUBSCRIPTIONS_FILE', 'push_subscriptions.json')
+
+
+def digest_lines(digest):
+    """Subject and body lines of a digest, shared by the text sinks"""
+    subject = f"TodoHub {digest['date']}: {digest['message']}"
+    lines = [f"- {t['task']} ({t['priority']}, due {t['due']})" for t in digest['tasks']]
+    return subject, lines
+
+
+# ----------------------------------------------------------------------
+# Sinks
+# ----------------------------------------------------------------------
+
+class MboxSink:
+    """Appends one email message per digest to an mbox file"""
+    name = 'mbox'
+
+    def __init__(self, path, sender='todohub@localhost', recipient='me@localhost'):
+        self.path = path
+        self.sender = sender
+        self.recipient = recipient
+
+    def deliver(self, digests):
+        box = mailbox.mbox(self.path)
+        box.lock()
+        try:
+            for digest in digests:
+                subject, lines = digest_lines(digest)
+                message = EmailMessage()
+                message['From'] = self.sender
+                message['To'] = self.recipient
+                message['Subject'] = subject
+                message['Date'] = email.utils.formatdate(localtime=True)
+                message.set_content('\n'.join(lines or [digest['message']]) + '\n')
+                box.add(message)
+            box.flush()
+        finally:
+            box.unlock()
+            box.close()
+
+
+class WebhookSink:
+    """POSTs the digests of a batch as one JSON document"""
+    name = 'webhook'
+
+    def __init__(self, url, timeout=10):
+        self.url = url
+        self.timeout = timeout
+
+    def deliver(self, digests):
+        body = json.dumps({'digests': digests}).encode('utf-8')
+        req = urllib.request.Request(self.url, data=body, method='POST',
+                                     headers={'Content-Type': 'application/json'})
+        # urlopen raises HTTPError for 4xx / 5xx responses, which retries
+        with urllib.request.urlopen(req, timeout=self.timeout) as response:
+            response.read()
+
+
+class PushSubscriptions:
+    """Browser push subscriptions (PushSubscription.toJSON()), by endpoint"""
+
+    def __init__(self, path=PUSH_SUBSCRIPTIONS_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return []
+        return data if isinstance(data, list) else []
+
+    def _save(self, subscriptions):
+        tmp_path = f'{self.path}.{uuid.uuid4().hex}.tmp'
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(subscriptions, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+        return True
+
+    def all(self):
+        with self._lock:
+            return self._load()
+
+    def add(self, subscription):
+        with self._lock:
+            subscriptions = [s for s in self._load() if s.get('endpoint') != subscription['endpoint']]
+            subscriptions.append(subscription)
+            return self._save(subscriptions)
+
+    def remove(self, endpoint):
+        with self._lock:
+            subscriptions = self._load()
+            kept = [s for s in subscriptions if s.get('endpoint') != endpoint]
+            return len(kept) < len(subscriptions) and self._save(kept)
+
+
+def is_push_subscription(data):
+    """Does `data` look like PushSubscription.toJSON()?"""
+    if not isinstance(data, dict) or not isinstance(data.get('keys'), dict):
+        return False
+    endpoint = data.get('endpoint')
+    return (isinstance(endpoint, str) and endpoint.startswith('https://')
+            and all(isinstance(data['keys'].get(key), str) for key in ('p256dh', 'auth')))
+
+
+class WebPushSink:
+    """Sends the latest digest of a batch to every push subscription.
+    Subscriptions the push service reports gone (404 / 410) are dropped."""
+    name = 'webpush'
+
+    def __init__(self, subscriptions, private_key, subject, ttl=24 * 3600):
+        if webpush is None:
+            raise RuntimeError('Web Push needs the pywebpush package')
+        self.subscriptions = subscriptions
+        self.private_key = private_key
+        self.subject = subject
+        self.ttl = ttl
+
+    def deliver(self, digests):
+        digest = digests[-1]   # older ones are superseded
+        payload = json.dumps({'title': 'TodoHub', 'body': digest['message'], 'url': '/'})
+        subscriptions = self.subscriptions.all()
+        errors = []
+        for subscription in subscriptions:
+            try:
+                webpush(subscription, payload, vapid_private_key=self.private_key,
+                        vapid_claims={'sub': self.subject}, ttl=self.ttl)
+            except WebPushException as e:
+                status = getattr(e.response, 'status_code', None)
+                if status in (404, 410):
+                    self.subscriptions.remove(subscription['endpoint'])
+                else:
+                    errors.append(e)
+        # Retrying resends to every subscription, so only when none got it
+        if errors and len(errors) == len(subscriptions):
+            raise errors[0]
+        for e in errors:
+            print(f'Web Push delivery failed: {e}')
+
+
+# ----------------------------------------------------------------------
+# Digest cache and delivery pool
+# ----------------------------------------------------------------------
+
+class ReminderService:
+    """Cached daily digest plus a bounded queue of deliveries to sinks"""
+
+    def __init__(self, build, sinks=(), workers=2, max_queue=100, batch_size=20,
+                 retries=3, backoff=2.0):
+        self.build = build
+        self.sinks = list(sinks)
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retries = retries
+        self.backoff = backoff
+        self._queue = queue.Queue(max_queue)
+        self._lock = threading.Lock()
+        self._digest = None
+        self._stop = threading.Event()
+        self._threads = []
+        self.delivered = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def digest(self, today=None):
+        """The digest of `today`, built on first use if not yet cached"""
+        today = (today or date.today()).isoformat()
+        with self._lock:
+            if self._digest is None or self._digest['date'] != today:
+                self._digest = {**self.build(), 'date': today,
+                                'generated_at': datetime.now().isoformat(timespec='seconds')}
+            return self._digest
+
+    def publish(self, today=None):
+        """Build today's digest if needed and queue it for every sink"""
+        digest = self.digest(today)
+        for sink in self.sinks:
+            self.enqueue(sink, digest)
+        return digest
+
+    def enqueue(self, sink, digest):
+        try:
+            self._queue.put_nowait((sink, digest))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        return True
+
+    def metrics(self):
+        with self._lock:
+            return {
+                'digest_date': self._digest['date'] if self._digest else None,
+                'sinks': [sink.name for sink in self.sinks],
+                'queued': self._queue.qsize(),
+                'delivered': self.delivered,
+                'failed': self.failed,
+                'dropped': self.dropped
+            }
+
+    # ------------------------------------------------------------------
+    # Background threads
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the midnight scheduler and, with sinks, the delivery pool"""
+        if any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)]
+        if self.sinks:
+            self._threads += [threading.Thread(target=self._run_worker, name=f'reminder-worker-{i}', daemon=True)
+                              for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            now = datetime.now()
+            run_at = datetime.combine(now.date(), time()) + DIGEST_DELAY
+            if run_at <= now:
+                run_at += timedelta(days=1)
+            if self._stop.wait(min((run_at - now).total_seconds(), MAX_SLEEP_SECONDS)):
+                return
+            if datetime.now() >= run_at:
+                try:
+                    self.publish()
+                except Exception as e:
+                    print(f'Reminder digest failed: {e}')
+
+    def _run_worker(self):
+        while not self._stop.is_set():
+            try:
+                jobs = [self._queue.get(timeout=1)]
+            except queue.Empty:
+                continue
+            while len(jobs) < self.batch_size:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            batches = {}
+            for sink, digest in jobs:
+                batches.setdefault(sink, []).append(digest)
+            for sink, digests in batches.items():
+                self._deliver(sink, digests)
+            for _ in jobs:
+                self._queue.task_done()
+
+    def _deliver(self, sink, digests):
+        for attempt in range(self.retries + 1):
+            try:
+                sink.deliver(digests)
+            except Exception as e:
+                if attempt == self.retries or self._stop.wait(self.backoff * 2 ** attempt):
+                    print(f'Reminder delivery to {sink.name} failed: {e}')
+                    with self._lock:
+                        self.failed += len(digests)
+                    return False
+            else:
+                with self._lock:
+                    self.delivered += len(digests)
+                return True
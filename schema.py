@@ -0,0 +1,338 @@
+"""
+Versioned task schema, integrity check (fsck) and migration.
+
+Version 1 is everything written before the schema had a version: records
+with 5 keys (main.py), 11-13 keys (app.py), `title`/`dueDate` keys
+(populate_tasks.py) or view-only keys such as `idx` and `priority`.
+
+Version 2 records have every key of FIELDS but `path`. Version 3
+(SCHEMA_VERSION) is the canonical record: exactly the keys of FIELDS, in
+that order, with these types:
+
+    id            32 hex digits, unique across all segments
+    task          non-empty string
+    due           mm/dd/yyyy string
+    description   string
+    recurrence    one of RECURRENCES
+    project       string
+    tags          list of lowercase strings (see indexes.parse_tags)
+    path          ids of the task's ancestors and its own, root first, joined
+                  by '/': the id alone for a top-level task (see PathIndex)
+    completed, deleted, saved            booleans
+    completed_at, deleted_at, saved_at   ISO timestamp when the flag is set, else null
+
+and every record sits in the segment of its tier (storage.tier_of).
+
+The version of the data files is kept in SCHEMA_FILE. migrate() rewrites
+all segments in one streaming pass and then records the new version, so
+code reading the segments can index records directly instead of guarding
+every key with .get().
+"""
+import hashlib
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+
+import storage
+from indexes import DUE_FORMAT, parse_tags
+from transfer import RECURRENCES, iter_todos, normalize_record
+
+SCHEMA_VERSION = 3
+SCHEMA_FILE = os.environ.get('SCHEMA_FILE', 'todos.schema.json')
+
+FIELDS = ('id', 'task', 'due', 'description', 'recurrence', 'project', 'tags', 'path',
+          'completed', 'completed_at', 'deleted', 'deleted_at', 'saved', 'saved_at')
+FLAGS = {'completed': 'completed_at', 'deleted': 'deleted_at', 'saved': 'saved_at'}
+VIEW_FIELDS = ('idx', 'priority', 'priority_color', 'days_until_permanent')
+LEGACY_FIELDS = ('title', 'dueDate')
+_FIELD_SET = frozenset(FIELDS)
+
+# fsck keeps the details of this many bad records; counts cover all of them
+MAX_REPORTED = 100
+
+_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+_PATH_PATTERN = re.compile(r'^(?:[0-9a-f]{32}/)*[0-9a-f]{32}$')
+
+
+class SchemaError(Exception):
+    pass
+
+
+def new_record(task, due, description='', recurrence='none', project='', tags=(), parent_path=None):
+    """A new pending task in the canonical shape; a subtask of the task
+    whose path is `parent_path`, if given"""
+    task_id = uuid.uuid4().hex
+    return {
+        'id': task_id,
+        'task': task,
+        'due': due,
+        'description': description,
+        'recurrence': recurrence if recurrence in RECURRENCES else 'none',
+        'project': project,
+        'tags': list(tags),
+        'path': f'{parent_path}/{task_id}' if parent_path else task_id,
+        'completed': False,
+        'completed_at': None,
+        'deleted': False,
+        'deleted_at': None,
+        'saved': False,
+        'saved_at': None
+    }
+
+
+def _is_timestamp(value):
+    if not isinstance(value, str):
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _is_due(value):
+    try:
+        datetime.strptime(value, DUE_FORMAT)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def normalize(record):
+    """Canonical copy of a stored record.
+
+    Legacy keys are mapped, view-only and unknown keys dropped, and values
+    coerced to their types; a record with a valid id keeps it, and its path
+    when that is valid too (otherwise it becomes a top-level task). A due
+    date that cannot be parsed is kept as it is (fsck keeps reporting it).
+    """
+    canonical = normalize_record(record)
+    if isinstance(record.get('id'), str) and _ID_PATTERN.match(record['id']):
+        canonical['id'] = canonical['path'] = record['id']
+        if is_path_of(record.get('path'), record['id']):
+            canonical['path'] = record['path']
+    for stamp in FLAGS.values():
+        if not _is_timestamp(canonical[stamp]):
+            canonical[stamp] = None
+    return canonical
+
+
+def conformed(records):
+    """Yield the records of a segment with every key of FIELDS.
+
+    Records that already have exactly those keys are passed through as they
+    are; others (legacy, view-polluted or partial records written after the
+    migration, e.g. by a script or a restored backup) are normalized, and
+    anything that is not an object is dropped. A record without a valid id
+    gets one derived from its content, so it keeps the same id on every
+    load until it is written back.
+    """
+    seen = {}
+    for record in records:
+        if not isinstance(record, dict):
+            continue
+        if record.keys() == _FIELD_SET:
+            yield record
+            continue
+        canonical = normalize(record)
+        if canonical['id'] != record.get('id'):
+            text = json.dumps(record, sort_keys=True, default=str)
+            seen[text] = seen.get(text, 0) + 1
+            digest = hashlib.md5(f'{text}#{seen[text]}'.encode('utf-8')).hexdigest()
+            canonical['id'] = canonical['path'] = digest
+        yield canonical
+
+
+def conform(records):
+    """List of conformed(records)"""
+    return list(conformed(records))
+
+
+def is_path_of(path, task_id):
+    """Is `path` a well-formed materialized path ending with `task_id`?"""
+    return (isinstance(path, str) and _PATH_PATTERN.match(path) is not None
+            and path.rsplit('/', 1)[-1] == task_id)
+
+
+def validate(record):
+    """Problems of a record as short codes; an empty list means canonical"""
+    if not isinstance(record, dict):
+        return ['not-an-object']
+    problems = []
+    for key in record:
+        if key in FIELDS:
+            continue
+        if key in VIEW_FIELDS:
+            problems.append(f'view-only:{key}')
+        elif key in LEGACY_FIELDS:
+            problems.append(f'legacy:{key}')
+        else:
+            problems.append(f'unknown:{key}')
+    missing = [field for field in FIELDS if field not in record]
+    problems.extend(f'missing:{field}' for field in missing)
+    if missing:
+        return problems
+
+    if not isinstance(record['id'], str) or not _ID_PATTERN.match(record['id']):
+        problems.append('bad-id')
+    if not isinstance(record['task'], str) or not record['task'].strip():
+        problems.append('empty-task')
+    if not _is_due(record['due']):
+        problems.append('bad-due')
+    for field in ('description', 'project'):
+        if not isinstance(record[field], str):
+            problems.append(f'bad-type:{field}')
+    if record['recurrence'] not in RECURRENCES:
+        problems.append('bad-recurrence')
+    if not is_path_of(record['path'], record['id']):
+        problems.append('bad-path')
+    tags = record['tags']
+    if not isinstance(tags, list) or tags != parse_tags(tags):
+        problems.append('bad-tags')
+    for flag, stamp in FLAGS.items():
+        if not isinstance(record[flag], bool):
+            problems.append(f'bad-type:{flag}')
+        elif record[flag] and record[stamp] is not None and not _is_timestamp(record[stamp]):
+            problems.append(f'bad-timestamp:{stamp}')
+        elif not record[flag] and record[stamp] is not None:
+            problems.append(f'stale-timestamp:{stamp}')
+    if list(record) != list(FIELDS) and not problems:
+        problems.append('key-order')
+    return problems
+
+
+def schema_path(hot_path):
+    """SCHEMA_FILE lives next to the hot store"""
+    return os.path.join(os.path.dirname(hot_path), SCHEMA_FILE)
+
+
+def stored_version(hot_path):
+    """Schema version of the data files; 1 when they predate versioning"""
+    try:
+        with open(schema_path(hot_path), 'r') as f:
+            return int(json.load(f).get('version', 1))
+    except (OSError, ValueError, AttributeError):
+        return 1
+
+
+def record_version(hot_path, counts):
+    """Mark the data files as written in SCHEMA_VERSION"""
+    path = schema_path(hot_path)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({
+            'version': SCHEMA_VERSION,
+            'migrated_at': datetime.now().isoformat(),
+            'records': counts
+        }, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def fsck(hot_path):
+    """Stream every segment and check each record against the schema.
+
+    Nothing is modified. The report counts problems by code and lists the
+    first MAX_REPORTED bad records as {segment, record, id, problems}, where
+    `record` is the 1-based position in the segment.
+    """
+    report = {
+        'version': stored_version(hot_path),
+        'current': SCHEMA_VERSION,
+        'records': 0,
+        'invalid': 0,
+        'segments': {},
+        'counts': {},
+        'problems': [],
+        'errors': []
+    }
+    seen = set()
+    for tier, path in storage.segment_paths(hot_path).items():
+        count = 0
+        try:
+            for count, record in enumerate(iter_todos(path), 1):
+                problems = validate(record)
+                if isinstance(record, dict):
+                    if isinstance(record.get('id'), str):
+                        if record['id'] in seen:
+                            problems.append('duplicate-id')
+                        seen.add(record['id'])
+                    if storage.tier_of(record) != tier:
+                        problems.append('wrong-segment')
+                if problems:
+                    report['invalid'] += 1
+                    for code in problems:
+                        report['counts'][code] = report['counts'].get(code, 0) + 1
+                    if len(report['problems']) < MAX_REPORTED:
+                        report['problems'].append({
+                            'segment': tier,
+                            'record': count,
+                            'id': record.get('id') if isinstance(record, dict) else None,
+                            'problems': problems
+                        })
+        except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+            report['errors'].append(f'{path}: unreadable after record {count} ({e})')
+        report['segments'][tier] = count
+        report['records'] += count
+    report['ok'] = (not report['invalid'] and not report['errors']
+                    and report['version'] == SCHEMA_VERSION)
+    return report
+
+
+def migrate(hot_path):
+    """Rewrite every segment in the canonical schema in one streaming pass.
+
+    Records are normalized, moved to the segment of their tier and given a
+    fresh id when theirs was already taken; anything that is not an object
+    is dropped. The new segments replace the old ones only once all of them
+    are written, then the schema version is recorded. Indexes built on the
+    segments (TaskIndexCache, notifications) must be rebuilt by the caller.
+    Returns a summary dict.
+    """
+    paths = storage.segment_paths(hot_path)
+    summary = {'records': 0, 'normalized': 0, 'moved': 0, 'dropped': 0, 'new_ids': 0}
+    writers = {tier: storage.SegmentWriter(path) for tier, path in paths.items()}
+    seen = set()
+    try:
+        for tier, path in paths.items():
+            for record in iter_todos(path):
+                if not isinstance(record, dict):
+                    summary['dropped'] += 1
+                    continue
+                canonical = normalize(record)
+                if canonical['id'] in seen:
+                    canonical['id'] = canonical['path'] = uuid.uuid4().hex
+                    summary['new_ids'] += 1
+                seen.add(canonical['id'])
+                if canonical != record or list(record) != list(FIELDS):
+                    summary['normalized'] += 1
+                target = storage.tier_of(canonical)
+                if target != tier:
+                    summary['moved'] += 1
+                writers[target].write(canonical)
+                summary['records'] += 1
+        for writer in writers.values():
+            writer.close()
+    except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+        for writer in writers.values():
+            writer.discard()
+        raise SchemaError(f'Migration aborted, nothing was changed: {e}') from e
+
+    for tier, writer in writers.items():
+        # Segments that do not exist and stay empty are not created
+        if writer.count or os.path.exists(writer.path):
+            writer.replace()
+        else:
+            writer.discard()
+    summary['segments'] = {tier: writer.count for tier, writer in writers.items()}
+    record_version(hot_path, summary['segments'])
+    return summary
+
+
+def ensure_current(hot_path):
+    """Migrate the data files if they predate SCHEMA_VERSION.
+    Returns the migration summary, or None when nothing had to be done."""
+    if stored_version(hot_path) >= SCHEMA_VERSION:
+        return None
+    return migrate(hot_path)
@@ -0,0 +1,251 @@
+"""
+Shared, memory-mapped snapshot of todos.json for multi-worker servers.
+
+With several gunicorn workers, each one parsing todos.json into its own
+list of dicts makes memory grow with workers x dataset size. In shared mode
+(SHARED_SNAPSHOT_FILE set) one worker publishes each version of todos.json
+as an immutable binary file that every worker maps read-only, so the OS
+page cache holds a single copy for all of them. Records are decoded one at
+a time when a route reads them; the columns of columnar.TaskTable and the
+due date order are used in place, without copying.
+
+File layout (native byte order, sections 8-byte aligned):
+
+    header     see HEADER
+    records    compact JSON of every record, back to back
+    offsets    count + 1 uint64: record i is records[offsets[i]:offsets[i + 1]]
+    due        count int64 day ordinals  \\
+    flags      count int8 status bits     | TaskTable columns
+    completed_at, deleted_at  float64    /
+    by_due     ordinals (int64) and positions (uint64) of the dated tasks,
+               sorted by due date (indexes.DueDateIndex)
+
+The first worker to notice that todos.json changed takes an exclusive lock
+on `<file>.lock`, streams todos.json into a temporary file and renames it
+over the snapshot, so readers never see a partial file; the others wait for
+the lock and map the result. Each publish bumps the version by one. A
+worker keeps serving the version it has mapped until it sees a new one;
+requests still holding an older snapshot keep reading its mapping, which
+stays valid after the rename.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+from array import array
+from collections.abc import Sequence
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:   # Windows: publishes are not serialized, only atomic
+    fcntl = None
+
+import columnar
+import indexes
+import schema
+from transfer import iter_todos
+
+MAGIC = b'TODOSNAP'
+FORMAT = 1
+# magic, format, version, record count, dated task count, stat signature of
+# the source file (mtime_ns, size, inode), and the start of each section
+SECTIONS = ('records', 'offsets', 'due', 'flags', 'completed_at', 'deleted_at',
+            'due_ordinals', 'due_positions')
+HEADER = struct.Struct(f'8sIIQQqqq{len(SECTIONS)}Q')
+
+
+def _pad(f):
+    f.write(bytes(-f.tell() % 8))
+
+
+def _write(f, records, version, signature):
+    """Write a snapshot of `records` to `f`; returns the record count"""
+    f.write(bytes(HEADER.size))
+    offsets = array('Q', [0])
+    due, flags, completed_at, deleted_at = columns = (array('q'), array('b'), array('d'), array('d'))
+    ordinals = {}
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    for todo in records:
+        data = encode(todo).encode()
+        f.write(data)
+        offsets.append(offsets[-1] + len(data))
+        row_due, row_flags, row_completed_at, row_deleted_at = columnar.row_columns(todo, ordinals)
+        due.append(row_due)
+        flags.append(row_flags)
+        completed_at.append(row_completed_at)
+        deleted_at.append(row_deleted_at)
+
+    # Stable sort: tasks due the same day stay in position order
+    order = sorted((row for row in range(len(due)) if due[row]), key=due.__getitem__)
+    by_due = (array('q', (due[row] for row in order)), array('Q', (row + 1 for row in order)))
+    starts = [HEADER.size]
+    for column in (offsets,) + columns + by_due:
+        _pad(f)
+        starts.append(f.tell())
+        column.tofile(f)
+    f.seek(0)
+    f.write(HEADER.pack(MAGIC, FORMAT, version, len(due), len(order), *signature, *starts))
+    return len(due)
+
+
+def read_header(path):
+    """Header fields of a snapshot file as a dict, or None if there is no valid one"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(data) < HEADER.size:
+        return None
+    magic, fmt, version, count, dated, *rest = HEADER.unpack(data)
+    if magic != MAGIC or fmt != FORMAT:
+        return None
+    return {'version': version, 'count': count, 'dated': dated, 'source': tuple(rest[:3]),
+            'sections': dict(zip(SECTIONS, rest[3:]))}
+
+
+def publish(source, path):
+    """Write a new version of the snapshot of `source` (a JSON array file)
+    to `path`. Returns the new version."""
+    # Stat before reading: a write landing in between gets published again
+    signature = indexes.file_signature(source) or (0, 0, 0)
+    header = read_header(path)
+    version = header['version'] + 1 if header else 1
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            try:
+                _write(f, schema.conformed(iter_todos(source)), version, signature)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                # Same as load_todos(): an unreadable todos.json is an empty list
+                f.seek(0)
+                f.truncate()
+                _write(f, (), version, signature)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return version
+
+
+@contextmanager
+def publish_lock(path):
+    if fcntl is None:
+        yield
+        return
+    with open(f'{path}.lock', 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+class MappedTasks(Sequence):
+    """Read-only task list over the records section; every access decodes a
+    fresh dict, so nothing read from it is kept in memory"""
+
+    def __init__(self, data, start, offsets):
+        self._data = data
+        self._start = start
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError('task index out of range')
+        return json.loads(self._data[self._start + self._offsets[i]:self._start + self._offsets[i + 1]])
+
+    def __iter__(self):
+        data, start, offsets = self._data, self._start, self._offsets
+        for i in range(len(offsets) - 1):
+            yield json.loads(data[start + offsets[i]:start + offsets[i + 1]])
+
+
+class MappedSnapshot:
+    """One version of the snapshot file, mapped read-only"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.size = len(self._map)
+        magic, fmt, self.version, count, dated, *rest = HEADER.unpack_from(self._map)
+        if magic != MAGIC or fmt != FORMAT:
+            raise ValueError(f'{path} is not a task snapshot')
+        self.source = tuple(rest[:3])
+        sections = dict(zip(SECTIONS, rest[3:]))
+        view = memoryview(self._map)
+
+        def column(name, code, length):
+            start = sections[name]
+            return view[start:start + length * struct.calcsize(code)].cast(code)
+
+        self.todos = MappedTasks(self._map, sections['records'], column('offsets', 'Q', count + 1))
+        self.columns = (column('due', 'q', count), column('flags', 'b', count),
+                        column('completed_at', 'd', count), column('deleted_at', 'd', count))
+        self.by_due = (column('due_ordinals', 'q', dated), column('due_positions', 'Q', dated))
+
+    def task_snapshot(self):
+        """indexes.TaskSnapshot over the mapping; the facet index is still
+        built per process, from the records, when first needed"""
+        return indexes.TaskSnapshot(self.todos, due=indexes.DueDateIndex.from_sorted(*self.by_due),
+                                    table=columnar.TaskTable(self.todos, self.columns))
+
+
+class SharedIndexCache:
+    """Drop-in for indexes.TaskIndexCache that serves the shared snapshot
+    of `source` kept in `path`, publishing a new version when needed"""
+
+    def __init__(self, source, path):
+        self.source = source
+        self.path = path
+        self._lock = threading.Lock()
+        self._mapped = None
+        self._snapshot = indexes.TaskSnapshot([])
+
+    def _map_current(self):
+        try:
+            return MappedSnapshot(self.path)
+        except (OSError, ValueError, struct.error):
+            return None
+
+    def get(self):
+        with self._lock:
+            signature = indexes.file_signature(self.source) or (0, 0, 0)
+            if self._mapped is not None and self._mapped.source == signature:
+                return self._snapshot
+            mapped = self._map_current()
+            if mapped is None or mapped.source != signature:
+                with publish_lock(self.path):
+                    # Another worker may have published while we waited
+                    header = read_header(self.path)
+                    if header is None or header['source'] != (indexes.file_signature(self.source) or (0, 0, 0)):
+                        try:
+                            publish(self.source, self.path)
+                        except OSError:
+                            pass   # keep serving the version mapped before
+                    mapped = self._map_current()
+            if mapped is not None and (self._mapped is None or mapped.version != self._mapped.version):
+                self._mapped = mapped
+                self._snapshot = mapped.task_snapshot()
+            return self._snapshot
+
+    def invalidate(self):
+        with self._lock:
+            self._mapped = None
+
+    def metrics(self):
+        mapped = self._mapped
+        if mapped is None:
+            return {'path': self.path, 'version': None}
+        return {'path': self.path, 'version': mapped.version, 'records': len(mapped.todos),
+                'bytes': mapped.size}
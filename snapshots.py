@@ -0,0 +1,293 @@
+"""
+Point-in-time snapshots of todos.json stored as content-addressed chunks.
+
+Records are grouped into chunks using content-defined boundaries: a record
+ends a chunk when its hash matches a bit pattern. Because boundaries depend on
+content rather than position, inserting or editing a task only changes the
+chunk(s) around it. Each chunk is stored once under the hash of its content,
+and a snapshot is just a small manifest listing chunk hashes, so the bytes
+written per snapshot scale with the volume of changes, not the dataset size.
+
+Extra files (the trash and archive segments) can be captured in the same
+snapshot; their chunk lists are kept under `segments` in the manifest.
+
+Layout:
+    snapshots/objects/ab/<sha256>.json.gz   chunk of records (JSON array)
+    snapshots/manifests/<snapshot id>.json  manifest
+    snapshots/.lock                         held while snapshotting,
+                                            restoring or pruning
+"""
+import gzip
+import hashlib
+import json
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:   # Windows: only threads of one process are serialized
+    fcntl = None
+
+from transfer import iter_todos
+
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_RETENTION = int(os.environ.get('SNAPSHOT_RETENTION', 20))
+
+# A record closes a chunk when the low bits of its hash are zero, giving
+# chunks of ~64 records on average; MAX_CHUNK bounds the worst case.
+CHUNK_MASK = 0x3F
+MAX_CHUNK = 512
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot cannot be found or read"""
+
+
+def _canonical(record):
+    return json.dumps(record, separators=(',', ':'))
+
+
+def _object_path(base, digest):
+    return os.path.join(base, 'objects', digest[:2], digest + '.json.gz')
+
+
+def _manifest_dir(base):
+    return os.path.join(base, 'manifests')
+
+
+_store_lock = threading.Lock()
+
+
+@contextmanager
+def _locked(base):
+    """Serialize snapshot, restore and prune on the store at `base` across
+    threads and processes (the server, its scheduler and main.py): a prune
+    must not drop chunks a snapshot has written but not yet referenced"""
+    with _store_lock:
+        if fcntl is None:
+            yield
+            return
+        os.makedirs(base, exist_ok=True)
+        with open(os.path.join(base, '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def iter_chunks(records):
+    """Group records into content-defined chunks of canonical JSON strings"""
+    chunk = []
+    for record in records:
+        canonical = _canonical(record)
+        chunk.append(canonical)
+        digest = hashlib.sha1(canonical.encode('utf-8')).digest()
+        if (digest[-1] & CHUNK_MASK) == 0 or len(chunk) >= MAX_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def list_snapshots(base=SNAPSHOT_DIR):
+    """Return manifests (without chunk lists), newest first"""
+    directory = _manifest_dir(base)
+    if not os.path.isdir(directory):
+        return []
+    snapshots = []
+    for name in sorted(os.listdir(directory), reverse=True):
+        if name.endswith('.json'):
+            manifest = load_manifest(name[:-5], base)
+            manifest.pop('chunks', None)
+            manifest.pop('segments', None)
+            snapshots.append(manifest)
+    return snapshots
+
+
+def load_manifest(snapshot_id, base=SNAPSHOT_DIR):
+    path = os.path.join(_manifest_dir(base), os.path.basename(snapshot_id) + '.json')
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (IOError, json.JSONDecodeError):
+        raise SnapshotError(f'Snapshot not found: {snapshot_id}')
+
+
+def _latest_manifest(base):
+    directory = _manifest_dir(base)
+    if not os.path.isdir(directory):
+        return None
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.json'))
+    return load_manifest(names[-1][:-5], base) if names else None
+
+
+def _store_chunks(path, base, stats):
+    """Store the chunks of one task file; returns their digests"""
+    chunks = []
+    for chunk in iter_chunks(iter_todos(path)):
+        data = ('[' + ','.join(chunk) + ']').encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = _object_path(base, digest)
+        if not os.path.exists(object_path):
+            compressed = gzip.compress(data, compresslevel=6, mtime=0)
+            _write_atomic(object_path, compressed)
+            stats['new_chunks'] += 1
+            stats['bytes_written'] += len(compressed)
+        chunks.append(digest)
+        stats['records'] += len(chunk)
+    return chunks
+
+
+def create_snapshot(todo_file, base=SNAPSHOT_DIR, retention=SNAPSHOT_RETENTION, force=False, segments=None):
+    """Snapshot `todo_file` plus optional `segments` ({name: path}). Only
+    chunks not already stored are written.
+
+    Returns the new manifest, or the latest one unchanged when nothing changed
+    since the previous snapshot (unless `force`).
+    """
+    with _locked(base):
+        return _create_snapshot(todo_file, base, retention, force, segments)
+
+
+def _create_snapshot(todo_file, base, retention, force, segments):
+    stats = {'records': 0, 'new_chunks': 0, 'bytes_written': 0}
+    chunks = _store_chunks(todo_file, base, stats)
+    segment_chunks = {name: _store_chunks(path, base, stats) for name, path in (segments or {}).items()}
+
+    previous = _latest_manifest(base)
+    if (previous and previous['chunks'] == chunks
+            and previous.get('segments', {}) == segment_chunks and not force):
+        return previous
+
+    now = datetime.now()
+    manifest = {
+        'id': f"{now.strftime('%Y%m%dT%H%M%S%f')}-{uuid.uuid4().hex[:6]}",
+        'created_at': now.isoformat(),
+        'parent': previous['id'] if previous else None,
+        'records': stats['records'],
+        'chunks': chunks,
+        'segments': segment_chunks,
+        'new_chunks': stats['new_chunks'],
+        'bytes_written': stats['bytes_written']
+    }
+    _write_atomic(os.path.join(_manifest_dir(base), manifest['id'] + '.json'),
+                  json.dumps(manifest, indent=2).encode('utf-8'))
+    _prune_snapshots(base, retention)
+    return manifest
+
+
+def iter_snapshot_records(snapshot_id, base=SNAPSHOT_DIR, segment=None):
+    """Yield the records of a snapshot (or of one of its segments), one
+    chunk in memory at a time"""
+    manifest = load_manifest(snapshot_id, base)
+    chunks = manifest['chunks'] if segment is None else manifest.get('segments', {}).get(segment, [])
+    for digest in chunks:
+        try:
+            with gzip.open(_object_path(base, digest), 'rb') as f:
+                yield from json.loads(f.read())
+        except (IOError, json.JSONDecodeError):
+            raise SnapshotError(f'Snapshot {snapshot_id} is missing chunk {digest}')
+
+
+def _restore_file(records, path):
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    count = 0
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write('[')
+            for record in records:
+                f.write(',\n' if count else '\n')
+                f.write('  ' + json.dumps(record, indent=2).replace('\n', '\n  '))
+                count += 1
+            f.write('\n]' if count else ']')
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def restore_snapshot(snapshot_id, todo_file, base=SNAPSHOT_DIR, segments=None):
+    """Atomically replace `todo_file` (and the files of `segments` captured
+    by the snapshot) with the contents of a snapshot. Returns the number of
+    records restored."""
+    with _locked(base):
+        manifest = load_manifest(snapshot_id, base)   # fail early on an unknown id
+        count = _restore_file(iter_snapshot_records(snapshot_id, base), todo_file)
+        for name, path in (segments or {}).items():
+            if name in manifest.get('segments', {}):
+                count += _restore_file(iter_snapshot_records(snapshot_id, base, name), path)
+    return count
+
+
+def prune_snapshots(base=SNAPSHOT_DIR, retention=SNAPSHOT_RETENTION):
+    """Keep the newest `retention` snapshots and drop unreferenced chunks"""
+    with _locked(base):
+        return _prune_snapshots(base, retention)
+
+
+def _prune_snapshots(base, retention):
+    directory = _manifest_dir(base)
+    if retention <= 0 or not os.path.isdir(directory):
+        return 0
+    names = sorted(n for n in os.listdir(directory) if n.endswith('.json'))
+    expired = names[:-retention]
+    if not expired:
+        return 0
+    for name in expired:
+        os.remove(os.path.join(directory, name))
+
+    referenced = set()
+    for name in names[-retention:]:
+        manifest = load_manifest(name[:-5], base)
+        referenced.update(manifest['chunks'])
+        for chunks in manifest.get('segments', {}).values():
+            referenced.update(chunks)
+    objects = os.path.join(base, 'objects')
+    for prefix in os.listdir(objects):
+        for name in os.listdir(os.path.join(objects, prefix)):
+            if name.split('.', 1)[0] not in referenced:
+                os.remove(os.path.join(objects, prefix, name))
+    return len(expired)
+
+
+class SnapshotScheduler:
+    """Daemon thread taking a snapshot every `interval` seconds"""
+
+    def __init__(self, todo_file, interval, base=SNAPSHOT_DIR, lock=None, segments=None):
+        self.todo_file = todo_file
+        self.segments = segments
+        self.interval = interval
+        self.base = base
+        self.lock = lock or threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._thread = threading.Thread(target=self._run, name='snapshot-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                with self.lock:
+                    create_snapshot(self.todo_file, self.base, segments=self.segments)
+            except (IOError, OSError, ValueError, SnapshotError) as e:
+                print(f'Snapshot failed: {e}')
@@ -4,9 +4,25 @@
  */
 
 const DB_NAME = 'TodoHub';
-const DB_VERSION = 1;
+const DB_VERSION = 2;
 const STORE_NAME = 'tasks';
 const SETTINGS_STORE = 'settings';
+const OUTBOX_STORE = 'outbox';
+
+// Mutations queued while offline are replayed through /api/batch
+const BATCH_URL = '/api/batch';
+const MAX_BATCH_OPS = 500;
+const OUTBOX_SYNC_TAG = 'todohub-outbox';
+
+// Queuing an op whose inverse is still waiting cancels both
+const INVERSE_OPS = {
+  complete: 'uncomplete',
+  uncomplete: 'complete',
+  delete: 'restore',
+  restore: 'delete',
+  save: 'unsave',
+  unsave: 'save'
+};
 
 class TodoDatabase {
   constructor() {
@@ -51,10 +67,27 @@ class TodoDatabase {
           db.createObjectStore(SETTINGS_STORE, { keyPath: 'key' });
           console.log('Settings object store created');
         }
+
+        // Create outbox object store (seq keeps replay order)
+        if (!db.objectStoreNames.contains(OUTBOX_STORE)) {
+          const outbox = db.createObjectStore(OUTBOX_STORE, { keyPath: 'seq', autoIncrement: true });
+          outbox.createIndex('taskId', 'taskId', { unique: false });
+          console.log('Outbox object store created');
+        }
       };
     });
   }
 
+  /**
+   * Open the database on first use (the service worker has no page to do it)
+   */
+  async ready() {
+    if (!this.db) {
+      await this.init();
+    }
+    return this.db;
+  }
+
   /**
    * Get or create device ID (permanent identifier for this device)
    */
@@ -377,6 +410,136 @@ class TodoDatabase {
     }
   }
 
+  /**
+   * Queue a mutation for later replay, collapsing it against ops already
+   * waiting for the same task:
+   *   - the inverse op is pending (complete then uncomplete): both are dropped
+   *   - the same op is pending: nothing new is queued
+   *   - edits are merged into the pending edit, later fields winning
+   * Resolves to the queued op, or null when nothing is left to send.
+   */
+  async enqueueMutation(op, taskId, fields = null) {
+    await this.ready();
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction([OUTBOX_STORE], 'readwrite');
+      const store = transaction.objectStore(OUTBOX_STORE);
+      const request = store.index('taskId').getAll(taskId);
+      let result = null;
+
+      request.onsuccess = () => {
+        const pending = request.result;
+        const inverse = pending.find((entry) => entry.op === INVERSE_OPS[op]);
+        const same = pending.find((entry) => entry.op === op);
+
+        if (inverse) {
+          store.delete(inverse.seq);
+        } else if (same && op === 'edit') {
+          same.fields = { ...same.fields, ...fields };
+          store.put(same);
+          result = same;
+        } else if (same) {
+          result = same;
+        } else {
+          result = {
+            key: this._generateKey(),
+            op,
+            taskId,
+            fields,
+            queued_at: new Date().toISOString()
+          };
+          store.add(result).onsuccess = (event) => {
+            result.seq = event.target.result;
+          };
+        }
+      };
+
+      request.onerror = () => reject(request.error);
+      transaction.oncomplete = () => resolve(result);
+      transaction.onerror = () => reject(transaction.error);
+    });
+  }
+
+  /**
+   * Get queued mutations in the order they were made
+   */
+  async getOutbox() {
+    await this.ready();
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction([OUTBOX_STORE], 'readonly');
+      const request = transaction.objectStore(OUTBOX_STORE).getAll();
+
+      request.onerror = () => reject(request.error);
+      request.onsuccess = () => resolve(request.result);
+    });
+  }
+
+  /**
+   * Remove mutations the server has answered
+   */
+  async removeFromOutbox(seqs) {
+    await this.ready();
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction([OUTBOX_STORE], 'readwrite');
+      const store = transaction.objectStore(OUTBOX_STORE);
+      seqs.forEach((seq) => store.delete(seq));
+
+      transaction.oncomplete = () => resolve(seqs.length);
+      transaction.onerror = () => reject(transaction.error);
+    });
+  }
+
+  async outboxSize() {
+    await this.ready();
+    return new Promise((resolve, reject) => {
+      const transaction = this.db.transaction([OUTBOX_STORE], 'readonly');
+      const request = transaction.objectStore(OUTBOX_STORE).count();
+
+      request.onerror = () => reject(request.error);
+      request.onsuccess = () => resolve(request.result);
+    });
+  }
+
+  /**
+   * Replay the outbox through the bulk endpoint, MAX_BATCH_OPS per request.
+   * Every answered op leaves the outbox whatever its status: the server
+   * remembers idempotency keys, so resending after a lost response is safe,
+   * but an op it rejected would be rejected again. Network errors propagate
+   * so Background Sync retries later.
+   */
+  async flushOutbox() {
+    const queued = await this.getOutbox();
+    const summary = { sent: 0, applied: 0, failed: [] };
+
+    for (let start = 0; start < queued.length; start += MAX_BATCH_OPS) {
+      const batch = queued.slice(start, start + MAX_BATCH_OPS);
+      const response = await fetch(BATCH_URL, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'same-origin',
+        body: JSON.stringify({
+          ops: batch.map((entry) => ({ key: entry.key, op: entry.op, id: entry.taskId, fields: entry.fields }))
+        })
+      });
+      if (!response.ok) {
+        throw new Error(`Batch replay failed with status ${response.status}`);
+      }
+
+      const data = await response.json();
+      await this.removeFromOutbox(batch.map((entry) => entry.seq));
+      summary.sent += batch.length;
+      summary.applied += data.applied;
+      summary.failed.push(...data.results.filter((r) => r.status === 'invalid' || r.status === 'not_found'));
+    }
+    return summary;
+  }
+
+  _generateKey() {
+    if (self.crypto && self.crypto.randomUUID) {
+      return self.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).substr(2, 12)}`;
+  }
+
   /**
    * Get statistics
    */
@@ -147,7 +147,7 @@ function hideInstallButton() {
  */
 
 function calculatePriority(dueDateStr) {
-    """Calculate priority based on days until due date"""
+    // Calculate priority based on days until due date
     try {
         const dueDate = new Date(dueDateStr);
         const today = new Date();
@@ -171,7 +171,7 @@ function calculatePriority(dueDateStr) {
 }
 
 function getPriorityColor(priority) {
-    """Return Bootstrap color class for priority"""
+    // Return Bootstrap color class for priority
     const colors = {
         'OVERDUE': 'danger',
         'HIGH': 'warning',
@@ -281,22 +281,361 @@ async function importTasks(file) {
 /**
  * Update service worker to latest version
  */
-async function updateServiceWorker() {
-    if ('serviceWorker' in navigator) {
+const SW_UPDATE_MIN_INTERVAL = 30 * 60 * 1000;
+let lastServiceWorkerCheck = Date.now();
+
+async function updateServiceWorker(force = false) {
+    if (!('serviceWorker' in navigator)) {
+        return;
+    }
+    // Throttle: events like tab focus can fire often
+    if (!force && Date.now() - lastServiceWorkerCheck < SW_UPDATE_MIN_INTERVAL) {
+        return;
+    }
+    lastServiceWorkerCheck = Date.now();
+    try {
+        const registrations = await navigator.serviceWorker.getRegistrations();
+        for (const reg of registrations) {
+            await reg.update();
+        }
+    } catch (error) {
+        console.error('Service worker update failed:', error);
+    }
+}
+
+// Check for service worker updates when something happens (tab becomes
+// visible again, connection comes back) instead of polling every minute
+document.addEventListener('visibilitychange', () => {
+    if (document.visibilityState === 'visible') {
+        updateServiceWorker();
+    }
+});
+window.addEventListener('online', () => updateServiceWorker(true));
+
+if ('serviceWorker' in navigator) {
+    // A new worker took over: assets and cached views now come from the new version
+    let hadController = !!navigator.serviceWorker.controller;
+    navigator.serviceWorker.addEventListener('controllerchange', () => {
+        if (hadController) {
+            showNotification('TodoHub app updated!', 'info');
+        }
+        hadController = true;
+    });
+
+    // The service worker served a cached view and found a newer version
+    navigator.serviceWorker.addEventListener('message', (event) => {
+        if (event.data && event.data.type === 'CONTENT_UPDATED' &&
+            new URL(event.data.url).pathname === location.pathname) {
+            showNotification('Tasks changed since this page was cached. <a href="#" onclick="location.reload(); return false;">Refresh</a>', 'info');
+        }
+    });
+}
+
+
+/**
+ * Offline mutation outbox
+ *
+ * Task buttons carry data-op (complete, uncomplete, delete, restore, save,
+ * unsave) and data-uid (the task id). When the network is unreachable the
+ * op is queued in IndexedDB instead of being lost, and the queue is replayed
+ * as a single /api/batch request once the connection is back.
+ */
+async function hasQueuedMutations() {
+    try {
+        return (await todoDb.outboxSize()) > 0;
+    } catch (error) {
+        return false;
+    }
+}
+
+// POST a task mutation, queueing it when offline. Resolves to the fetch
+// response, or to { ok: false, queued: true } when the op was queued.
+// A 429 (rate limited or server busy) queues the op too, and the outbox is
+// replayed once the Retry-After delay has passed instead of retrying at once.
+async function postMutation(url, button) {
+    const { op, uid } = button.dataset;
+    const queueable = !!(op && uid);
+    // Queued ops must reach the server before newer ones
+    if (queueable && (!navigator.onLine || await hasQueuedMutations())) {
+        return queueMutation(op, uid, null, button);
+    }
+    let response;
+    try {
+        response = await fetch(url, { method: 'POST' });
+    } catch (error) {
+        if (!queueable) {
+            throw error;
+        }
+        return queueMutation(op, uid, null, button);
+    }
+    if (response.status === 429 && queueable) {
+        const retryAfter = Number(response.headers.get('Retry-After')) || 5;
+        return queueMutation(op, uid, null, button, retryAfter * 1000);
+    }
+    return response;
+}
+
+async function queueMutation(op, taskId, fields, element, delay) {
+    await todoDb.enqueueMutation(op, taskId, fields);
+    const row = element && (element.closest('tr, li, .list-group-item') || element);
+    if (row) {
+        row.classList.add('opacity-50');
+        row.querySelectorAll('button').forEach((btn) => { btn.disabled = true; });
+    }
+    if (delay) {
+        showNotification('The server is busy. This change will be retried shortly.', 'warning');
+        setTimeout(requestOutboxFlush, delay);
+    } else {
+        showNotification('You are offline. This change will sync when the connection is back.', 'warning');
+        requestOutboxFlush();
+    }
+    return { ok: false, queued: true };
+}
+
+async function requestOutboxFlush() {
+    if (!navigator.serviceWorker || !navigator.serviceWorker.controller) {
+        // No service worker to replay in the background: do it from the page
+        if (navigator.onLine && await hasQueuedMutations()) {
+            try {
+                handleOutboxFlushed(await todoDb.flushOutbox());
+            } catch (error) {
+                console.warn('Outbox flush failed:', error);
+            }
+        }
+        return;
+    }
+    try {
+        const registration = await navigator.serviceWorker.ready;
+        if ('sync' in registration) {
+            await registration.sync.register(OUTBOX_SYNC_TAG);
+        } else if (navigator.onLine) {
+            navigator.serviceWorker.controller.postMessage({ type: 'FLUSH_OUTBOX' });
+        }
+    } catch (error) {
+        console.warn('Could not schedule outbox sync:', error);
+    }
+}
+
+function handleOutboxFlushed(summary) {
+    if (!summary.sent) {
+        return;
+    }
+    if (summary.failed.length) {
+        showNotification(`${summary.failed.length} offline change(s) could not be applied.`, 'danger');
+    } else {
+        showNotification(`Synced ${summary.sent} offline change(s).`, 'success');
+    }
+    setTimeout(() => location.reload(), 1500);
+}
+
+window.addEventListener('online', () => requestOutboxFlush());
+
+if ('serviceWorker' in navigator) {
+    navigator.serviceWorker.addEventListener('message', (event) => {
+        if (event.data && event.data.type === 'OUTBOX_FLUSHED') {
+            handleOutboxFlushed(event.data);
+        }
+    });
+}
+
+document.addEventListener('DOMContentLoaded', async () => {
+    // Forms that post a task mutation (edit, delete) queue it when offline
+    document.querySelectorAll('form[data-outbox-op]').forEach((form) => {
+        form.addEventListener('submit', async (e) => {
+            if (e.defaultPrevented || navigator.onLine) {
+                return;
+            }
+            e.preventDefault();
+            const op = form.dataset.outboxOp;
+            const fields = op === 'edit' ? Object.fromEntries(new FormData(form)) : null;
+            await queueMutation(op, form.dataset.uid, fields, form);
+            if (op === 'edit') {
+                setTimeout(() => { location.href = '/'; }, 1500);
+            }
+        });
+    });
+
+    // Leftovers from an earlier session
+    if (navigator.onLine && await hasQueuedMutations()) {
+        requestOutboxFlush();
+    }
+});
+
+
+/**
+ * Undo / redo: Ctrl+Z, and Ctrl+Shift+Z or Ctrl+Y (Cmd on macOS), outside
+ * of form fields. The server keeps the history of this browser session.
+ */
+async function replayHistory(direction) {
+    let data;
+    try {
+        const response = await fetch(`/api/${direction}`, { method: 'POST' });
+        data = await response.json();
+    } catch (error) {
+        showNotification(`Cannot ${direction} while offline.`, 'warning');
+        return;
+    }
+    if (!data.success) {
+        showNotification(data.error, 'warning');
+        return;
+    }
+    showNotification(direction === 'undo' ? 'Undone.' : 'Redone.', 'success');
+    setTimeout(() => location.reload(), 600);
+}
+
+document.addEventListener('keydown', (e) => {
+    if (!(e.ctrlKey || e.metaKey) || e.target.closest('input, textarea, select, [contenteditable]')) {
+        return;
+    }
+    const key = e.key.toLowerCase();
+    if (key === 'z' && !e.shiftKey) {
+        e.preventDefault();
+        replayHistory('undo');
+    } else if ((key === 'z' && e.shiftKey) || key === 'y') {
+        e.preventDefault();
+        replayHistory('redo');
+    }
+});
+
+
+/**
+ * Typeahead for search fields with a data-suggest attribute (the selector
+ * of their suggestion list): titles from /api/suggest, fetched once typing
+ * pauses. Picking one searches for it.
+ */
+const SUGGEST_DELAY_MS = 150;
+
+function debounce(fn, delay) {
+    let timer;
+    return (...args) => {
+        clearTimeout(timer);
+        timer = setTimeout(() => fn(...args), delay);
+    };
+}
+
+function setupSuggestions(input) {
+    const list = document.querySelector(input.dataset.suggest);
+    if (!list) {
+        return;
+    }
+    let controller = null;
+
+    const render = (suggestions) => {
+        list.replaceChildren(...suggestions.map((suggestion) => {
+            const item = document.createElement('button');
+            item.type = 'button';
+            item.className = 'list-group-item list-group-item-action d-flex justify-content-between align-items-center';
+            item.setAttribute('role', 'option');
+            item.textContent = suggestion.task;
+            if (suggestion.count > 1) {
+                const badge = document.createElement('span');
+                badge.className = 'badge bg-secondary rounded-pill';
+                badge.textContent = suggestion.count;
+                item.appendChild(badge);
+            }
+            item.addEventListener('click', () => {
+                input.value = suggestion.task;
+                list.replaceChildren();
+                input.form.requestSubmit();
+            });
+            return item;
+        }));
+    };
+
+    const fetchSuggestions = debounce(async () => {
+        const query = input.value.trim();
+        if (controller) {
+            controller.abort();
+        }
+        if (!query) {
+            render([]);
+            return;
+        }
+        controller = new AbortController();
         try {
-            const registration = await navigator.serviceWorker.getRegistrations();
-            for (const reg of registration) {
-                await reg.update();
+            const response = await fetch(`/api/suggest?q=${encodeURIComponent(query)}`, { signal: controller.signal });
+            const data = await response.json();
+            if (data.success && input.value.trim() === query) {
+                render(data.suggestions);
             }
-            showNotification('TodoHub app updated!', 'info');
         } catch (error) {
-            console.error('Service worker update failed:', error);
+            // Aborted by newer input, or offline: the plain search still works
         }
-    }
+    }, SUGGEST_DELAY_MS);
+
+    input.addEventListener('input', fetchSuggestions);
+    input.addEventListener('keydown', (e) => {
+        if (e.key === 'Escape' && list.childElementCount) {
+            e.stopPropagation();
+            list.replaceChildren();
+        } else if (e.key === 'ArrowDown' && list.firstElementChild) {
+            e.preventDefault();
+            list.firstElementChild.focus();
+        }
+    });
+    list.addEventListener('keydown', (e) => {
+        const item = e.target.closest('.list-group-item');
+        if (!item) {
+            return;
+        }
+        if (e.key === 'ArrowDown' && item.nextElementSibling) {
+            e.preventDefault();
+            item.nextElementSibling.focus();
+        } else if (e.key === 'ArrowUp') {
+            e.preventDefault();
+            (item.previousElementSibling || input).focus();
+        }
+    });
 }
 
-// Check for service worker updates periodically
-setInterval(() => {
-    updateServiceWorker();
-}, 60000); // Check every minute
+document.addEventListener('DOMContentLoaded', () => {
+    document.querySelectorAll('input[data-suggest]').forEach(setupSuggestions);
+});
 
+/**
+ * Daily reminder by Web Push: buttons with data-push-key (the server's VAPID
+ * public key) subscribe this browser and register it with
+ * /api/push-subscriptions. The digest arrives just after midnight.
+ */
+function urlBase64ToUint8Array(base64) {
+    const padded = (base64 + '='.repeat((4 - base64.length % 4) % 4)).replace(/-/g, '+').replace(/_/g, '/');
+    return Uint8Array.from(atob(padded), (c) => c.charCodeAt(0));
+}
+
+async function subscribeToReminders(button) {
+    if (await Notification.requestPermission() !== 'granted') {
+        showNotification('Notifications are blocked for this site', 'warning');
+        return;
+    }
+    try {
+        const registration = await navigator.serviceWorker.ready;
+        const subscription = await registration.pushManager.getSubscription()
+            || await registration.pushManager.subscribe({
+                userVisibleOnly: true,
+                applicationServerKey: urlBase64ToUint8Array(button.dataset.pushKey)
+            });
+        const response = await fetch('/api/push-subscriptions', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(subscription)
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        button.disabled = true;
+        button.textContent = 'Daily Reminders On';
+        showNotification('You will get a daily reminder of high priority tasks');
+    } catch (error) {
+        showNotification('Could not enable daily reminders', 'danger');
+    }
+}
+
+document.addEventListener('DOMContentLoaded', () => {
+    if (!('serviceWorker' in navigator) || !('PushManager' in window)) {
+        return;
+    }
+    document.querySelectorAll('button[data-push-key]').forEach((button) => {
+        button.hidden = false;
+        button.addEventListener('click', () => subscribeToReminders(button));
+    });
+});
@@ -1,26 +1,60 @@
 /**
  * Service Worker for TodoHub PWA
  * Enables offline support and fast loading from cache
+ *
+ * Routing strategies:
+ *   - List views and /api/stats: stale-while-revalidate, revalidated with ETags
+ *   - Other pages and API reads:  network-first with cache fallback
+ *   - Mutations (POST etc.):      network-only, invalidate cached views on success
+ *   - Static assets:              cache-first (URLs are content-hashed)
+ *
+ * Mutations made while offline are queued in the IndexedDB outbox (db.js)
+ * and replayed as one /api/batch request from the Background Sync event.
  */
 
-const CACHE_NAME = 'todohub-v1';
-const STATIC_ASSETS = [
-  '/',
-  '/index.html',
-  '/static/css/style.css',
-  '/static/js/main.js',
-  '/static/js/db.js',
-  'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
-  'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css',
-  'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'
-];
+importScripts('/static/js/db.js');
+
+// The server prepends PRECACHE_MANIFEST (see /service-worker.js in app.py):
+// fingerprinted asset URLs plus a version derived from their content hashes.
+// A new deploy changes the version, which replaces the cache on activate.
+const PRECACHE = self.PRECACHE_MANIFEST || {
+  version: 'dev',
+  urls: [
+    '/',
+    '/static/css/style.css',
+    '/static/js/main.js',
+    '/static/js/db.js',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.11.0/font/bootstrap-icons.css',
+    'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'
+  ]
+};
+const CACHE_NAME = `todohub-${PRECACHE.version}`;
+const STATIC_ASSETS = PRECACHE.urls;
+
+// Runtime caches are versioned too, so pages referencing old asset hashes go away
+const PAGES_CACHE = `todohub-pages-${PRECACHE.version}`;
+const API_CACHE = `todohub-api-${PRECACHE.version}`;
+const ASSETS_CACHE = `todohub-assets-${PRECACHE.version}`;
+const CURRENT_CACHES = [CACHE_NAME, PAGES_CACHE, API_CACHE, ASSETS_CACHE];
+
+// Size bounds for runtime caches (least recently used entries are evicted)
+const MAX_ENTRIES = {
+  [PAGES_CACHE]: 30,
+  [API_CACHE]: 50,
+  [ASSETS_CACHE]: 60
+};
+const MAX_ENTRY_BYTES = 1024 * 1024;
+
+// Views served stale-while-revalidate
+const SWR_PATHS = ['/', '/pending', '/completed', '/overdue', '/saved', '/deleted', '/api/stats'];
 
 /**
  * Install event - cache static assets
  */
 self.addEventListener('install', (event) => {
   console.log('[Service Worker] Installing...');
-  
+
   event.waitUntil(
     caches.open(CACHE_NAME).then((cache) => {
       console.log('[Service Worker] Caching static assets');
@@ -30,7 +64,7 @@ self.addEventListener('install', (event) => {
       });
     })
   );
-  
+
   // Force the waiting service worker to activate immediately
   self.skipWaiting();
 });
@@ -40,12 +74,12 @@ self.addEventListener('install', (event) => {
  */
 self.addEventListener('activate', (event) => {
   console.log('[Service Worker] Activating...');
-  
+
   event.waitUntil(
     caches.keys().then((cacheNames) => {
       return Promise.all(
         cacheNames.map((cacheName) => {
-          if (cacheName !== CACHE_NAME) {
+          if (!CURRENT_CACHES.includes(cacheName)) {
             console.log('[Service Worker] Deleting old cache:', cacheName);
             return caches.delete(cacheName);
           }
@@ -53,13 +87,124 @@ self.addEventListener('activate', (event) => {
       );
     })
   );
-  
+
   // Claim clients immediately
   return self.clients.claim();
 });
 
 /**
- * Fetch event - serve from cache, fall back to network
+ * LRU helpers - Cache.keys() returns entries in insertion order, so
+ * re-inserting an entry on use moves it to the most recently used end.
+ */
+async function putBounded(cacheName, request, response) {
+  const length = Number(response.headers.get('Content-Length') || 0);
+  if (length > MAX_ENTRY_BYTES) {
+    return;
+  }
+  const cache = await caches.open(cacheName);
+  await cache.delete(request);
+  await cache.put(request, response);
+
+  const limit = MAX_ENTRIES[cacheName];
+  if (!limit) {
+    return;
+  }
+  const keys = await cache.keys();
+  for (let i = 0; i < keys.length - limit; i++) {
+    await cache.delete(keys[i]);
+  }
+}
+
+async function touch(cacheName, request, cached) {
+  const cache = await caches.open(cacheName);
+  await cache.delete(request);
+  await cache.put(request, cached);
+}
+
+async function notifyClients(message) {
+  const clients = await self.clients.matchAll({ type: 'window' });
+  clients.forEach((client) => client.postMessage(message));
+}
+
+/**
+ * Stale-while-revalidate: answer from cache immediately, then revalidate
+ * with If-None-Match. A 304 only refreshes the entry's LRU position; a new
+ * 200 replaces it and tells open pages that fresher content is available.
+ */
+function staleWhileRevalidate(event, cacheName) {
+  const { request } = event;
+  const cachedPromise = caches.open(cacheName).then((cache) => cache.match(request));
+
+  const revalidate = cachedPromise.then(async (cached) => {
+    const headers = new Headers(request.headers);
+    const etag = cached && cached.headers.get('ETag');
+    if (etag) {
+      headers.set('If-None-Match', etag);
+    }
+    const response = await fetch(request.url, { headers, credentials: 'same-origin', cache: 'no-store' });
+    if (response.status === 304 && cached) {
+      await touch(cacheName, request, cached.clone());
+      return cached;
+    }
+    if (response.status === 200) {
+      await putBounded(cacheName, request, response.clone());
+      if (cached) {
+        notifyClients({ type: 'CONTENT_UPDATED', url: request.url });
+      }
+    }
+    return response;
+  });
+
+  event.waitUntil(revalidate.catch(() => {}));
+
+  return cachedPromise.then((cached) => {
+    if (cached) {
+      return cached;
+    }
+    return revalidate.catch(() => offlineFallback(request));
+  });
+}
+
+/**
+ * Network-first with cache fallback
+ */
+function networkFirst(request, cacheName) {
+  return fetch(request)
+    .then((response) => {
+      if (response.status === 200) {
+        putBounded(cacheName, request, response.clone());
+      }
+      return response;
+    })
+    .catch(() => offlineFallback(request, cacheName));
+}
+
+async function offlineFallback(request, cacheName) {
+  const cached = cacheName ? await caches.match(request, { cacheName }) : await caches.match(request);
+  if (cached) {
+    return cached;
+  }
+  if (request.mode === 'navigate') {
+    // Any cached view beats an error page
+    return (await caches.match('/')) || new Response('Offline', { status: 503 });
+  }
+  return new Response('Offline - API unavailable', { status: 503 });
+}
+
+/**
+ * Mutations always go to the network. A successful write makes every cached
+ * view stale, so the runtime page/API caches are dropped.
+ */
+async function networkOnlyMutation(request) {
+  const response = await fetch(request);
+  if (response.ok) {
+    await Promise.all([caches.delete(PAGES_CACHE), caches.delete(API_CACHE)]);
+  }
+  return response;
+}
+
+/**
+ * Fetch event - pick a strategy per request
  */
 self.addEventListener('fetch', (event) => {
   const { request } = event;
@@ -70,55 +215,26 @@ self.addEventListener('fetch', (event) => {
     return;
   }
 
-  // Handle HTML requests with network-first strategy
+  if (request.method !== 'GET') {
+    event.respondWith(networkOnlyMutation(request));
+    return;
+  }
+
+  if (SWR_PATHS.includes(url.pathname)) {
+    const cacheName = url.pathname.startsWith('/api/') ? API_CACHE : PAGES_CACHE;
+    event.respondWith(staleWhileRevalidate(event, cacheName));
+    return;
+  }
+
+  // Other pages (add, edit, search) - network first
   if (request.mode === 'navigate') {
-    event.respondWith(
-      fetch(request)
-        .then((response) => {
-          // Cache successful responses
-          if (response.status === 200) {
-            const responseToCache = response.clone();
-            caches.open(CACHE_NAME).then((cache) => {
-              cache.put(request, responseToCache);
-            });
-          }
-          return response;
-        })
-        .catch(() => {
-          // Fall back to cached version
-          return caches.match(request).then((response) => {
-            if (response) {
-              return response;
-            }
-            // Return offline page if available
-            return caches.match('/');
-          });
-        })
-    );
+    event.respondWith(networkFirst(request, PAGES_CACHE));
     return;
   }
 
-  // Handle API requests - network first with fallback
+  // Other API reads - network first with fallback
   if (url.pathname.startsWith('/api/')) {
-    event.respondWith(
-      fetch(request)
-        .then((response) => {
-          // Cache successful responses
-          if (response.status === 200) {
-            const responseToCache = response.clone();
-            caches.open(CACHE_NAME).then((cache) => {
-              cache.put(request, responseToCache);
-            });
-          }
-          return response;
-        })
-        .catch(() => {
-          // Fall back to cached version
-          return caches.match(request).then((response) => {
-            return response || new Response('Offline - API unavailable', { status: 503 });
-          });
-        })
-    );
+    event.respondWith(networkFirst(request, API_CACHE));
     return;
   }
 
@@ -133,10 +249,7 @@ self.addEventListener('fetch', (event) => {
         .then((response) => {
           // Cache successful responses
           if (response.status === 200) {
-            const responseToCache = response.clone();
-            caches.open(CACHE_NAME).then((cache) => {
-              cache.put(request, responseToCache);
-            });
+            putBounded(ASSETS_CACHE, request, response.clone());
           }
           return response;
         })
@@ -148,6 +261,28 @@ self.addEventListener('fetch', (event) => {
   );
 });
 
+/**
+ * Replay the offline outbox, then drop cached views it made stale
+ */
+async function flushOutbox() {
+  const summary = await todoDb.flushOutbox();
+  if (summary.sent > 0) {
+    await Promise.all([caches.delete(PAGES_CACHE), caches.delete(API_CACHE)]);
+    notifyClients({ type: 'OUTBOX_FLUSHED', ...summary });
+  }
+  return summary;
+}
+
+/**
+ * Background Sync - fires once connectivity is back (and is retried by the
+ * browser if the flush throws)
+ */
+self.addEventListener('sync', (event) => {
+  if (event.tag === OUTBOX_SYNC_TAG) {
+    event.waitUntil(flushOutbox());
+  }
+});
+
 /**
  * Handle messages from the app
  */
@@ -155,12 +290,36 @@ self.addEventListener('message', (event) => {
   if (event.data && event.data.type === 'SKIP_WAITING') {
     self.skipWaiting();
   }
-  
+
   if (event.data && event.data.type === 'CLEAR_CACHE') {
-    caches.delete(CACHE_NAME).then(() => {
+    Promise.all(CURRENT_CACHES.map((name) => caches.delete(name))).then(() => {
       event.ports[0].postMessage({ success: true });
     });
   }
+
+  // Browsers without Background Sync ask for a flush when they come online
+  if (event.data && event.data.type === 'FLUSH_OUTBOX') {
+    event.waitUntil(flushOutbox().catch((error) => {
+      console.warn('[Service Worker] Outbox flush failed:', error);
+    }));
+  }
+});
+
+/**
+ * Push event - the daily reminder digest (see reminders.py)
+ */
+self.addEventListener('push', (event) => {
+  const data = event.data ? event.data.json() : {};
+  event.waitUntil(self.registration.showNotification(data.title || 'TodoHub', {
+    body: data.body || '',
+    tag: 'daily-reminder',
+    data: { url: data.url || '/' }
+  }));
+});
+
+self.addEventListener('notificationclick', (event) => {
+  event.notification.close();
+  event.waitUntil(self.clients.openWindow(event.notification.data.url));
 });
 
 console.log('[Service Worker] Loaded');
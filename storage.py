@@ -0,0 +1,176 @@
+"""
+Tiered task storage.
+
+Active tasks live in the hot store (todos.json), which every common view
+loads. Soft-deleted tasks (trash) and archived tasks (saved) are moved to
+cold segments of their own, read only by the views and routes that work on
+them, so the size of the hot store tracks the number of active tasks.
+
+Every segment is a JSON array in the same format as todos.json.
+"""
+import json
+import os
+import uuid
+
+from transfer import append_todos, format_record
+
+TRASH_FILE = os.environ.get('TRASH_FILE', 'trash.json')
+ARCHIVE_FILE = os.environ.get('ARCHIVE_FILE', 'archive.json')
+
+HOT, TRASH, ARCHIVE = 'hot', 'trash', 'archive'
+COLD_SEGMENTS = {TRASH: TRASH_FILE, ARCHIVE: ARCHIVE_FILE}
+
+
+def tier_of(todo):
+    """Segment a task belongs in; trash wins over archive"""
+    if todo.get('deleted', False):
+        return TRASH
+    if todo.get('saved', False):
+        return ARCHIVE
+    return HOT
+
+
+def segment_paths(hot_path):
+    return {HOT: hot_path, **COLD_SEGMENTS}
+
+
+def router(hot_path):
+    """Function mapping a record to the file of its segment"""
+    paths = segment_paths(hot_path)
+    return lambda record: paths[tier_of(record)]
+
+
+def load_segment(path):
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, IOError):
+        return []
+
+
+def save_segment(path, records):
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(records, f, indent=2)
+        os.replace(tmp_path, path)
+    except IOError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+def append_segment(path, records):
+    """Add records to a segment without rewriting it"""
+    append_todos(path, records)
+
+
+def _read_bytes(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except IOError:
+        return b''
+
+
+def _is_indented(data):
+    """Is `data` a non-empty array in the json.dump(indent=2) layout?"""
+    return data.startswith(b'[\n  {') and data.rstrip().endswith(b'\n  }\n]')
+
+
+def _record_span(data, task_id):
+    """Byte range of the record with id `task_id` in an indented segment,
+    or None. Nested values are indented deeper and JSON strings escape
+    their quotes, so the patterns below only match at the record's level."""
+    key = b'\n    "id": ' + json.dumps(task_id).encode()
+    at = data.find(key)
+    while at >= 0 and data[at + len(key):at + len(key) + 1] not in (b',', b'\n'):
+        at = data.find(key, at + 1)
+    if at < 0:
+        return None
+    return data.rfind(b'\n  {', 0, at) + 1, data.find(b'\n  }', at) + 4
+
+
+def read_record(path, task_id):
+    """The record with id `task_id` in a segment, or None. In the indented
+    layout only that record is decoded."""
+    data = _read_bytes(path)
+    if _is_indented(data):
+        span = _record_span(data, task_id)
+        return json.loads(data[span[0]:span[1]]) if span else None
+    return next((r for r in load_segment(path) if isinstance(r, dict) and r.get('id') == task_id), None)
+
+
+def replace_record(path, task_id, record=None):
+    """Replace the record with id `task_id` in a segment by `record`, or
+    drop it when `record` is None. Returns False if there is no such record.
+
+    In the indented layout only that record is encoded; the bytes of the
+    others are copied as they are. The new version is still written to a
+    temporary file and renamed over the old one.
+    """
+    data = _read_bytes(path)
+    if not _is_indented(data):
+        records = load_segment(path)
+        at = next((i for i, r in enumerate(records) if isinstance(r, dict) and r.get('id') == task_id), None)
+        if at is None:
+            return False
+        records[at:at + 1] = [record] if record is not None else []
+        return save_segment(path, records)
+
+    span = _record_span(data, task_id)
+    if span is None:
+        return False
+    start, end = span
+    if record is not None:
+        data = data[:start] + format_record(record).encode('utf-8') + data[end:]
+    elif data[start - 2:start] == b',\n':
+        data = data[:start - 2] + data[end:]
+    elif data[end:end + 2] == b',\n':
+        data = data[:start] + data[end + 2:]
+    else:
+        data = b'[]'
+    tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except IOError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False
+    return True
+
+
+class SegmentWriter:
+    """Streams records into a new version of a segment (json.dump(indent=2)
+    format); replace() swaps it in, discard() drops it"""
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        self.count = 0
+        self._file = open(self.tmp_path, 'w')
+        self._file.write('[')
+
+    def write(self, record):
+        self._file.write(',\n' if self.count else '\n')
+        self._file.write(format_record(record))
+        self.count += 1
+
+    def close(self):
+        if not self._file.closed:
+            self._file.write('\n]' if self.count else ']')
+            self._file.close()
+
+    def replace(self):
+        self.close()
+        os.replace(self.tmp_path, self.path)
+
+    def discard(self):
+        self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
@@ -0,0 +1,144 @@
+"""
+Typeahead suggestions over task titles.
+
+SuggestIndex keeps the distinct titles of the tasks in todos.json (many
+tasks share one, e.g. recurring ones) in two sorted lists: the lowercase
+titles themselves, and (word, title) entries, one per distinct word of
+every title. The titles starting with a prefix, or having a word that
+does, are then a contiguous run of one list, found by bisection, so a
+lookup costs O(log N + k) whatever the dataset size.
+
+The index is maintained task by task: apply() takes the change events of
+watcher.ChangeFeed (added / changed / removed), so after the initial build
+it follows every write, including edits made outside the app, without
+being rebuilt.
+"""
+import re
+import threading
+from bisect import bisect_left, insort
+
+_WORD = re.compile(r'\w+')
+
+# Suggestions returned by default, and the most a client may ask for
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 50
+# Entries scanned per lookup at most; very short prefixes match many
+# titles and only the best few are wanted
+MAX_SCAN = 200
+
+
+def words(text):
+    """Distinct lowercase words of a title, in order"""
+    return tuple(dict.fromkeys(_WORD.findall(text.lower())))
+
+
+class SuggestIndex:
+    """Sorted prefix index over the titles of the tasks in todos.json"""
+
+    def __init__(self):
+        self._keys = []        # sorted lowercase titles
+        self._entries = []     # sorted (word, lowercase title)
+        self._titles = {}      # lowercase title -> [title, task count, words]
+        self._ids = {}         # task id -> lowercase title
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.source = None     # what build() was given the tasks of
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _add(self, todo):
+        """Count a task under its title; returns the words of the title when
+        it is new, which then need entries"""
+        title = todo['task']
+        key = title.lower()
+        self._ids[todo['id']] = key
+        entry = self._titles.get(key)
+        if entry is not None:
+            entry[1] += 1
+            return ()
+        title_words = words(key)
+        self._titles[key] = [title, 1, title_words]
+        return title_words
+
+    def _remove(self, task_id):
+        key = self._ids.pop(task_id, None)
+        if key is None:
+            return
+        entry = self._titles[key]
+        entry[1] -= 1
+        if entry[1]:
+            return
+        del self._titles[key]
+        del self._keys[bisect_left(self._keys, key)]
+        for word in entry[2]:
+            at = bisect_left(self._entries, (word, key))
+            if at < len(self._entries) and self._entries[at] == (word, key):
+                del self._entries[at]
+
+    def build(self, todos, source=None):
+        """Index a whole task list, replacing what was there"""
+        with self._lock:
+            self._titles = {}
+            self._ids = {}
+            entries = []
+            for todo in todos:
+                key = todo['task'].lower()
+                entries.extend((word, key) for word in self._add(todo))
+            entries.sort()
+            self._entries = entries
+            self._keys = sorted(self._titles)
+            self.loaded = True
+            self.source = source
+
+    def apply(self, events):
+        """Follow change events from watcher.ChangeFeed"""
+        with self._lock:
+            for event in events:
+                self._remove(event['id'])
+                todo = event['record']
+                if todo is not None:
+                    key = todo['task'].lower()
+                    title_words = self._add(todo)
+                    if title_words:
+                        insort(self._keys, key)
+                    for word in title_words:
+                        insort(self._entries, (word, key))
+
+    def suggest(self, query, limit=DEFAULT_LIMIT):
+        """Best `limit` titles for a partly typed query, as
+        {'task': title, 'count': tasks with that title}.
+
+        Every word of the query must start a word of the title, so partly
+        typed words match. Titles starting with the query come first, then
+        the most common, then the shortest.
+        """
+        terms = words(query)
+        if not terms:
+            return []
+        query = ' '.join(terms)
+        matches = {}
+        with self._lock:
+            # Titles starting with the query
+            keys = self._keys
+            at = bisect_left(keys, query)
+            end = min(len(keys), at + MAX_SCAN)
+            while at < end and keys[at].startswith(query):
+                matches[keys[at]] = False
+                at += 1
+            # Titles with a word starting with each term: scan the entries of
+            # the term with the fewest, check the other terms on each title
+            entries = self._entries
+            runs = [(bisect_left(entries, (term,)), bisect_left(entries, (term + '\U0010ffff',)), term)
+                    for term in terms]
+            at, end, probe = min(runs, key=lambda run: run[1] - run[0])
+            end = min(end, at + MAX_SCAN)
+            others = [term for term in terms if term != probe]
+            for _, key in entries[at:end]:
+                if key in matches:
+                    continue
+                title_words = self._titles[key][2]
+                if all(any(word.startswith(term) for word in title_words) for term in others):
+                    matches[key] = not key.startswith(query)
+            ranked = sorted((later, -self._titles[key][1], len(key), key) for key, later in matches.items())
+            return [{'task': self._titles[key][0], 'count': -count} for _, count, _, key in ranked[:limit]]
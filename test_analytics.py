@@ -0,0 +1,72 @@
+from datetime import date
+
+import analytics
+
+TODAY = date(2030, 3, 6)   # a Wednesday
+
+
+def created(task_id):
+    return (task_id, None, {'id': task_id, 'completed': False})
+
+
+def completed(task_id, stamp, undo=False):
+    before, after = {'completed': False, 'completed_at': None}, {'completed': True, 'completed_at': stamp}
+    return (task_id, after, before) if undo else (task_id, before, after)
+
+
+def test_events_of_history_changes():
+    changes = [
+        created('a'),
+        completed('b', '2030-03-04T09:00:00'),
+        completed('c', '2030-03-01T09:00:00', undo=True),
+        ('d', {'deleted': False, 'deleted_at': None}, {'deleted': True, 'deleted_at': None}),
+        ('e', {'task': 'old'}, {'task': 'new'}),
+        ('f', {'id': 'f'}, None),
+        None,
+    ]
+    assert list(analytics.events(changes, TODAY)) == [
+        ('created', TODAY, 1),
+        ('completed', date(2030, 3, 4), 1),
+        ('completed', date(2030, 3, 1), -1),
+        ('deleted', TODAY, 1),          # no timestamp: counted today
+    ]
+
+
+def test_undo_without_a_timestamp_is_not_counted():
+    change = ('a', {'completed': True, 'completed_at': None}, {'completed': False, 'completed_at': None})
+    assert list(analytics.events([change], TODAY)) == []
+
+
+def test_week_start():
+    assert analytics.week_start(TODAY) == date(2030, 3, 4)
+    assert analytics.week_start(date(2030, 3, 4)) == date(2030, 3, 4)
+    assert analytics.bucket_start('day', TODAY) == TODAY
+
+
+def test_rollups_count_and_undo(tmp_path):
+    store = analytics.RollupStore(str(tmp_path / 'analytics.json'))
+    store.record([created('a'), created('b'), completed('a', '2030-03-05T18:00:00')], TODAY)
+    store.record([completed('a', '2030-03-05T18:00:00', undo=True)], TODAY)
+    store.record([completed('b', '2030-03-06T08:00:00')], TODAY)
+
+    days = store.series('day', 3, TODAY)
+    assert [d['start'] for d in days] == ['2030-03-04', '2030-03-05', '2030-03-06']
+    assert [(d['created'], d['completed'], d['deleted']) for d in days] == [(0, 0, 0), (0, 0, 0), (2, 1, 0)]
+    weeks = store.series('week', 2, TODAY)
+    assert weeks[-1] == {'start': '2030-03-04', 'created': 2, 'completed': 1, 'deleted': 0}
+    assert weeks[0]['start'] == '2030-02-25'
+
+
+def test_rollups_are_shared_through_the_file(tmp_path):
+    path = str(tmp_path / 'analytics.json')
+    first, second = analytics.RollupStore(path), analytics.RollupStore(path)
+    first.record([created('a')], TODAY)
+    second.record([created('b')], TODAY)
+    assert first.series('day', 1, TODAY)[0]['created'] == 2
+
+
+def test_old_daily_buckets_are_dropped(tmp_path):
+    store = analytics.RollupStore(str(tmp_path / 'analytics.json'))
+    store.record([completed('a', '2020-01-01T10:00:00')], TODAY)
+    assert store.series('day', 1, date(2020, 1, 1))[0]['completed'] == 0
+    assert store.series('week', 1, date(2020, 1, 1))[0]['completed'] == 1
@@ -0,0 +1,74 @@
+import uuid
+
+import storage
+
+
+def op(name, task_id, key=None, **fields):
+    entry = {'key': key or uuid.uuid4().hex, 'op': name, 'id': task_id}
+    if fields:
+        entry['fields'] = fields
+    return entry
+
+
+def batch(client, *ops):
+    response = client.post('/api/batch', json={'ops': list(ops)})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def stored(task_id):
+    import app
+    return next(t for t in app.load_todos() + storage.load_segment(storage.TRASH_FILE) if t['id'] == task_id)
+
+
+def test_replayed_key_is_not_applied_again(client, add_task):
+    todo = add_task('Pay rent')
+    complete = op('complete', todo['id'])
+    first = batch(client, complete)
+    assert first['applied'] == 1
+    assert first['results'] == [{'key': complete['key'], 'status': 'applied'}]
+
+    batch(client, op('uncomplete', todo['id']))
+    replay = batch(client, complete)
+    assert replay['applied'] == 0
+    assert replay['results'] == [{'key': complete['key'], 'status': 'applied', 'replayed': True}]
+    assert stored(todo['id'])['completed'] is False
+
+
+def test_replay_within_one_batch(client, add_task):
+    todo = add_task('Pay rent')
+    edit = op('edit', todo['id'], task='Pay the rent')
+    result = batch(client, edit, op('complete', todo['id']), edit)
+    assert result['applied'] == 2
+    assert [r['status'] for r in result['results']] == ['applied', 'applied', 'applied']
+    assert result['results'][2]['replayed'] is True
+    assert stored(todo['id'])['task'] == 'Pay the rent'
+
+
+def test_results_per_op(client, add_task):
+    todo = add_task('Pay rent')
+    result = batch(client,
+                   op('complete', todo['id']),
+                   op('complete', todo['id']),
+                   op('delete', 'no-such-task'),
+                   op('explode', todo['id']),
+                   op('edit', todo['id'], due='31/31/2030'),
+                   {'op': 'complete', 'id': todo['id']},
+                   'not an op')
+    assert [r['status'] for r in result['results']] == [
+        'applied', 'noop', 'not_found', 'invalid', 'invalid', 'invalid', 'invalid']
+    assert result['applied'] == 1
+
+
+def test_failed_ops_are_remembered_too(client, add_task):
+    todo = add_task('Pay rent')
+    edit = op('edit', todo['id'], task='')
+    assert batch(client, edit)['results'][0]['status'] == 'invalid'
+    replay = batch(client, edit)['results'][0]
+    assert replay['status'] == 'invalid' and replay['replayed'] is True
+
+
+def test_rejects_malformed_requests(client):
+    assert client.post('/api/batch', json={}).status_code == 400
+    assert client.post('/api/batch', json={'ops': []}).status_code == 400
+    assert client.post('/api/batch', data='nonsense').status_code == 400
@@ -0,0 +1,78 @@
+import history
+
+BEFORE = {'id': 't1', 'task': 'Pay rent', 'completed': False, 'completed_at': None}
+AFTER = dict(BEFORE, completed=True, completed_at='2030-03-01T10:00:00')
+
+
+def test_diff_keeps_only_changed_fields():
+    assert history.diff(BEFORE, AFTER) == ('t1', {'completed': False, 'completed_at': None},
+                                          {'completed': True, 'completed_at': '2030-03-01T10:00:00'})
+    assert history.diff(BEFORE, dict(BEFORE)) is None
+    assert history.diff(None, None) is None
+
+
+def test_diff_of_created_and_removed_tasks():
+    assert history.diff(None, BEFORE) == ('t1', None, BEFORE)
+    assert history.diff(BEFORE, None) == ('t1', BEFORE, None)
+
+
+def test_conflicts():
+    change = history.diff(BEFORE, AFTER)
+    assert not history.conflicts(change, dict(BEFORE))
+    assert history.conflicts(change, dict(AFTER))
+    assert history.conflicts(change, None)
+    created = history.diff(None, BEFORE)
+    assert not history.conflicts(created, None)
+    assert history.conflicts(created, dict(BEFORE))
+
+
+def test_undo_then_redo():
+    h = history.History()
+    change = history.diff(BEFORE, AFTER)
+    h.record('s', [change, None])
+    assert h.sizes('s') == {'undo': 1, 'redo': 0}
+
+    undo = h.take('s', 'undo')
+    assert undo == [history.invert(change)]
+    h.done('s', 'undo', undo)
+    assert h.sizes('s') == {'undo': 0, 'redo': 1}
+
+    redo = h.take('s', 'redo')
+    assert redo == [change]
+    h.done('s', 'redo', redo)
+    assert h.sizes('s') == {'undo': 1, 'redo': 0}
+
+
+def test_undo_reverses_the_order_of_a_step():
+    h = history.History()
+    first, second = ('a', {'x': 1}, {'x': 2}), ('b', {'y': 1}, {'y': 2})
+    h.record('s', [first, second])
+    assert h.take('s', 'undo') == [('b', {'y': 2}, {'y': 1}), ('a', {'x': 2}, {'x': 1})]
+
+
+def test_new_action_clears_redo():
+    h = history.History()
+    h.record('s', [history.diff(BEFORE, AFTER)])
+    h.done('s', 'undo', h.take('s', 'undo'))
+    h.record('s', [history.diff(None, BEFORE)])
+    assert h.sizes('s') == {'undo': 1, 'redo': 0}
+    assert h.take('s', 'redo') is None
+
+
+def test_depth_and_sessions_are_bounded():
+    h = history.History(depth=2, max_sessions=2)
+    for i in range(5):
+        h.record('a', [('t', {'n': i}, {'n': i + 1})])
+    assert h.sizes('a') == {'undo': 2, 'redo': 0}
+    assert h.take('a', 'undo') == [('t', {'n': 5}, {'n': 4})]
+    h.record('b', [history.diff(None, BEFORE)])
+    h.record('c', [history.diff(None, BEFORE)])
+    assert h.sizes('a') == {'undo': 0, 'redo': 0}   # least recently active, dropped
+    assert h.sizes('c') == {'undo': 1, 'redo': 0}
+
+
+def test_sessions_are_separate():
+    h = history.History()
+    h.record('a', [history.diff(BEFORE, AFTER)])
+    assert h.take('b', 'undo') is None
+    assert h.sizes('a') == {'undo': 1, 'redo': 0}
@@ -1,11 +1,11 @@
 import requests
 import json
 import time
-import shutil
 
-BASE = 'http://127.0.0.1:5000'
+import snapshots
+import storage
 
-BACKUP = 'todos.bak.json'
+BASE = 'http://127.0.0.1:5000'
 
 def load_todos():
     with open('todos.json','r') as f:
@@ -27,9 +27,9 @@ def find_active_indices(todos, max_count=3):
 
 
 def main():
-    # backup
-    shutil.copyfile('todos.json', BACKUP)
-    print('Backup created')
+    # backup (incremental snapshot, only changed chunks are written)
+    backup = snapshots.create_snapshot('todos.json', force=True, segments=storage.COLD_SEGMENTS)
+    print('Backup created:', backup['id'])
 
     todos = load_todos()
     indices = find_active_indices(todos, max_count=3)
@@ -79,7 +79,7 @@ def main():
         print('bulk completed flags:', [todos[i-1].get('completed') for i in indices])
 
     # restore backup to avoid side-effects
-    shutil.copyfile(BACKUP, 'todos.json')
+    snapshots.restore_snapshot(backup['id'], 'todos.json', segments=storage.COLD_SEGMENTS)
     print('Restored backup')
 
 if __name__ == '__main__':
@@ -0,0 +1,67 @@
+from datetime import datetime, timedelta
+
+import notifications
+
+DUE = datetime(2030, 3, 10)
+
+
+def task(task_id, due='03/10/2030', **flags):
+    return dict({'id': task_id, 'task': f'Task {task_id}', 'due': due}, **flags)
+
+
+def crossings(events):
+    return [(e['task_id'], e['old_priority'], e['new_priority'], e['timestamp']) for e in events]
+
+
+def test_thresholds_fire_at_their_offsets(tmp_path):
+    scheduler = notifications.NotificationScheduler(str(tmp_path / 'notifications.json'))
+    scheduler.track(task('a'))
+    assert scheduler.next_fire_time() == DUE - timedelta(days=8)
+    assert scheduler.run_pending(DUE - timedelta(days=8, seconds=1)) == []
+
+    fired = []
+    for days in (8, 4, 0):
+        fired += crossings(scheduler.run_pending(DUE - timedelta(days=days)))
+    assert fired == [('a', 'LOW', 'MEDIUM', '2030-03-02T00:00:00'),
+                     ('a', 'MEDIUM', 'HIGH', '2030-03-06T00:00:00'),
+                     ('a', 'HIGH', 'OVERDUE', '2030-03-10T00:00:00')]
+    assert scheduler.next_fire_time() is None
+    events, total = scheduler.events()
+    assert total == 3 and events[0]['new_priority'] == 'OVERDUE'
+
+
+def test_forget_cancels_pending_crossings(tmp_path):
+    scheduler = notifications.NotificationScheduler(str(tmp_path / 'notifications.json'))
+    scheduler.track(task('a'))
+    scheduler.track(task('b'))
+    scheduler.forget('a')
+    assert [e['task_id'] for e in scheduler.run_pending(DUE)] == ['b', 'b', 'b']
+
+
+def test_only_open_tasks_with_a_due_date_are_scheduled(tmp_path):
+    scheduler = notifications.NotificationScheduler(str(tmp_path / 'notifications.json'))
+    scheduler.rebuild([task('a', completed=True), task('b', deleted=True), task('c', saved=True),
+                       task('d', due='not a date'), task('e', due='')])
+    assert scheduler.next_fire_time() is None
+
+
+def test_retracking_replaces_the_old_due_date(tmp_path):
+    scheduler = notifications.NotificationScheduler(str(tmp_path / 'notifications.json'))
+    scheduler.track(task('a'))
+    scheduler.track(task('a', due='03/20/2030'))
+    assert scheduler.run_pending(DUE) == []
+    assert len(scheduler.run_pending(DUE + timedelta(days=10))) == 3
+
+
+def test_last_run_survives_a_restart(tmp_path):
+    path = str(tmp_path / 'notifications.json')
+    scheduler = notifications.NotificationScheduler(path)
+    scheduler.rebuild([task('a')])
+    scheduler.run_pending(DUE - timedelta(days=5))
+
+    # Crossings before the last run are not replayed; missed ones fire once
+    restarted = notifications.NotificationScheduler(path)
+    restarted.rebuild([task('a')])
+    assert crossings(restarted.run_pending(DUE)) == [('a', 'MEDIUM', 'HIGH', '2030-03-06T00:00:00'),
+                                                     ('a', 'HIGH', 'OVERDUE', '2030-03-10T00:00:00')]
+    assert restarted.events()[1] == 3
@@ -0,0 +1,67 @@
+import storage
+
+
+def etag(client, task_id):
+    response = client.get(f'/api/tasks/{task_id}')
+    assert response.status_code == 200
+    return response.headers['ETag']
+
+
+def patch(client, task_id, fields, tag):
+    return client.patch(f'/api/tasks/{task_id}', json=fields, headers={'If-Match': tag})
+
+
+def test_patch_changes_only_the_given_fields(client, add_task):
+    todo = add_task('Pay rent')
+    response = patch(client, todo['id'], {'description': 'By the 1st', 'tags': 'Home, bills'},
+                     etag(client, todo['id']))
+    assert response.status_code == 200
+    task = response.get_json()['task']
+    assert task == dict(todo, description='By the 1st', tags=['home', 'bills'])
+    assert response.headers['ETag'] == etag(client, todo['id'])
+
+
+def test_stale_if_match_gets_412_with_the_current_task(client, add_task):
+    todo = add_task('Pay rent')
+    stale = etag(client, todo['id'])
+    assert patch(client, todo['id'], {'task': 'Pay the rent'}, stale).status_code == 200
+
+    response = patch(client, todo['id'], {'task': 'Lost update'}, stale)
+    assert response.status_code == 412
+    body = response.get_json()
+    assert body['success'] is False
+    assert body['task']['task'] == 'Pay the rent'
+    assert response.headers['ETag'] == etag(client, todo['id'])
+
+
+def test_if_match_is_required(client, add_task):
+    todo = add_task('Pay rent')
+    response = client.patch(f'/api/tasks/{todo["id"]}', json={'task': 'x'})
+    assert response.status_code == 428
+
+
+def test_invalid_bodies_get_400(client, add_task):
+    todo = add_task('Pay rent')
+    tag = etag(client, todo['id'])
+    for fields in ({}, {'id': 'other'}, {'completed': 'yes'}, {'task': 5}, {'tags': 5},
+                   {'tags': {'a': 1}}, {'tags': ['ok', 1]}, {'task': ''}, {'due': '13/45/2030'}):
+        assert patch(client, todo['id'], fields, tag).status_code == 400, fields
+    assert etag(client, todo['id']) == tag
+
+
+def test_unknown_task_gets_404(client):
+    assert patch(client, 'no-such-task', {'task': 'x'}, '"abc"').status_code == 404
+
+
+def test_flags_move_the_task_between_segments(client, add_task):
+    import app
+    todo = add_task('Pay rent')
+    response = patch(client, todo['id'], {'deleted': True}, etag(client, todo['id']))
+    assert response.status_code == 200
+    assert app.load_todos() == []
+    assert [t['id'] for t in storage.load_segment(storage.TRASH_FILE)] == [todo['id']]
+
+    response = patch(client, todo['id'], {'deleted': False}, response.headers['ETag'])
+    assert response.status_code == 200
+    assert [t['id'] for t in app.load_todos()] == [todo['id']]
+    assert storage.load_segment(storage.TRASH_FILE) == []
@@ -0,0 +1,101 @@
+import json
+
+import schema
+import storage
+
+LEGACY = {'task': 'Call mom', 'due': '03/01/2030', 'description': '', 'completed': False, 'completed_at': None}
+
+
+def write(path, records):
+    path.write_text(json.dumps(records, indent=2))
+
+
+def read(path):
+    return json.loads(path.read_text())
+
+
+def canonical(task, **flags):
+    record = schema.new_record(task, '03/01/2030', project='Home', tags=['a'])
+    record.update(flags)
+    return record
+
+
+def test_conform_passes_canonical_records_through():
+    record = canonical('Pay rent')
+    assert schema.conform([record])[0] is record
+
+
+def test_conform_normalizes_with_stable_ids():
+    records = [dict(LEGACY), dict(LEGACY), 'not a record', dict(canonical('Pay rent'), idx=3, priority='high')]
+    first, second = schema.conform(records), schema.conform(records)
+    assert first == second
+    assert len(first) == 3
+    assert all(list(r) == list(schema.FIELDS) and not schema.validate(r) for r in first)
+    assert first[0]['id'] != first[1]['id']          # identical records stay apart
+    assert first[2]['id'] == records[3]['id']
+
+
+def test_migrate_legacy_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # cold segments are relative to the working directory
+    hot = tmp_path / 'todos.json'
+    write(hot, [LEGACY,
+                {'title': 'From populate', 'dueDate': '03/02/2030'},
+                dict(LEGACY, task='Old trash', deleted=True, deleted_at='2030-01-01T10:00:00'),
+                42])
+    report = schema.fsck(str(hot))
+    assert report['version'] == 1 and not report['ok']
+    assert report['counts']['missing:id'] == 3
+    assert report['counts']['not-an-object'] == 1
+
+    summary = schema.ensure_current(str(hot))
+    assert summary['records'] == 3
+    assert summary['dropped'] == 1
+    assert summary['moved'] == 1
+    assert [t['task'] for t in read(hot)] == ['Call mom', 'From populate']
+    assert [t['task'] for t in read(tmp_path / storage.TRASH_FILE)] == ['Old trash']
+    assert schema.stored_version(str(hot)) == schema.SCHEMA_VERSION
+    assert schema.fsck(str(hot))['ok']
+
+
+def test_migrate_view_polluted_records(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    hot = tmp_path / 'todos.json'
+    first, second = canonical('Pay rent'), canonical('Gym')
+    write(hot, [dict(first, idx=0, priority='high', priority_color='red'),
+                dict(second, id=first['id'], path=first['id'])])
+    assert schema.fsck(str(hot))['counts'] == {'view-only:idx': 1, 'view-only:priority': 1,
+                                               'view-only:priority_color': 1, 'duplicate-id': 1}
+    summary = schema.migrate(str(hot))
+    assert summary['normalized'] == 2
+    assert summary['new_ids'] == 1
+    todos = read(hot)
+    assert todos[0] == first
+    assert todos[1]['id'] != first['id'] and todos[1]['path'] == todos[1]['id']
+    assert schema.fsck(str(hot))['ok']
+
+
+def test_current_files_are_left_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    hot = tmp_path / 'todos.json'
+    records = [canonical('Pay rent'), canonical('Gym')]
+    write(hot, records)
+    schema.migrate(str(hot))
+    before = hot.read_bytes()
+    assert schema.ensure_current(str(hot)) is None
+    assert hot.read_bytes() == before
+    assert read(hot) == records
+    assert not (tmp_path / storage.ARCHIVE_FILE).exists()
+
+
+def test_legacy_records_appended_after_startup(client, add_task):
+    add_task('Pay rent')
+    # As a script or a restored backup would, after the startup migration
+    with open('todos.json', 'r+') as f:
+        todos = json.load(f) + [LEGACY]
+        f.seek(0)
+        json.dump(todos, f, indent=2)
+
+    assert client.get('/api/stats').status_code == 200
+    response = client.get('/search?q=call')
+    assert response.status_code == 200
+    assert b'Call mom' in response.data
@@ -0,0 +1,89 @@
+import json
+from datetime import date
+
+import columnar
+import indexes
+import schema
+import shared
+
+
+def write_todos(path, todos):
+    path.write_text(json.dumps(todos, indent=2))
+
+
+def sample_todos():
+    todos = []
+    for i, due in enumerate(['03/05/2030', '', '01/02/2030', '03/05/2030', 'not a date', '12/31/2029']):
+        todo = schema.new_record(f'Task {i} – ünïcode', due, f'Description {i}', 'none', 'Home', ['a'])
+        if i % 3 == 0:
+            todo['completed'] = True
+            todo['completed_at'] = '2030-01-01T08:00:00'
+        todos.append(todo)
+    return todos
+
+
+def test_round_trip_records_columns_and_due_order(tmp_path):
+    source, path = tmp_path / 'todos.json', tmp_path / 'todos.snapshot'
+    todos = sample_todos()
+    write_todos(source, todos)
+    assert shared.publish(str(source), str(path)) == 1
+
+    mapped = shared.MappedSnapshot(str(path))
+    assert mapped.version == 1
+    assert list(mapped.todos) == todos
+    assert mapped.todos[2] == todos[2]
+    assert mapped.todos[-1] == todos[-1]
+
+    snapshot = mapped.task_snapshot()
+    expected = indexes.TaskSnapshot(todos)
+    for column in ('due', 'flags', 'completed_at', 'deleted_at'):
+        # repr: missing timestamps are NaN, which never compares equal
+        assert ([repr(v) for v in getattr(snapshot.table, column)]
+                == [repr(v) for v in getattr(expected.table, column)]), column
+    done = columnar.COMPLETED
+    assert snapshot.table.positions(snapshot.table.mask(done)) == expected.table.positions(expected.table.mask(done))
+    assert list(snapshot.due.range()) == list(expected.due.range())
+    assert list(snapshot.due.range(date(2030, 1, 1), date(2030, 3, 5))) == [3, 1, 4]
+
+
+def test_empty_and_unreadable_sources(tmp_path):
+    source, path = tmp_path / 'todos.json', tmp_path / 'todos.snapshot'
+    source.write_text('[]')
+    shared.publish(str(source), str(path))
+    assert len(shared.MappedSnapshot(str(path)).todos) == 0
+    source.write_text('[{"broken": ')
+    assert shared.publish(str(source), str(path)) == 2
+    assert len(shared.MappedSnapshot(str(path)).todos) == 0
+
+
+def test_header_tracks_the_source(tmp_path):
+    source, path = tmp_path / 'todos.json', tmp_path / 'todos.snapshot'
+    write_todos(source, sample_todos())
+    shared.publish(str(source), str(path))
+    header = shared.read_header(str(path))
+    assert header['count'] == 6
+    assert header['dated'] == 4
+    assert header['source'] == indexes.file_signature(str(source))
+    assert shared.read_header(str(source)) is None
+
+
+def test_cache_publishes_new_versions(tmp_path):
+    source, path = tmp_path / 'todos.json', tmp_path / 'todos.snapshot'
+    todos = sample_todos()
+    write_todos(source, todos[:2])
+    cache = shared.SharedIndexCache(str(source), str(path))
+    first = cache.get()
+    assert list(first.todos) == todos[:2]
+    assert cache.get() is first
+
+    write_todos(source, todos)
+    second = cache.get()
+    assert list(second.todos) == todos
+    assert cache.metrics()['version'] == 2
+    # Snapshots handed out before stay readable after the rename
+    assert list(first.todos) == todos[:2]
+
+    # Another cache (worker) maps the published version without writing one
+    other = shared.SharedIndexCache(str(source), str(path))
+    assert list(other.get().todos) == todos
+    assert other.metrics()['version'] == 2
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+
+import schema
+import snapshots
+
+
+def write(path, records):
+    path.write_text(json.dumps(records, indent=2))
+
+
+def tasks(prefix, count):
+    return [schema.new_record(f'{prefix} {i}', '03/01/2030') for i in range(count)]
+
+
+def stored_objects(base):
+    objects = os.path.join(base, 'objects')
+    return {name.split('.', 1)[0] for prefix in os.listdir(objects) for name in os.listdir(os.path.join(objects, prefix))}
+
+
+def test_round_trip_with_segments(tmp_path):
+    base, hot, trash = str(tmp_path / 'snapshots'), tmp_path / 'todos.json', tmp_path / 'trash.json'
+    records, deleted = tasks('Task', 300), tasks('Deleted', 5)
+    write(hot, records)
+    write(trash, deleted)
+    manifest = snapshots.create_snapshot(str(hot), base, segments={'trash': str(trash)})
+    assert manifest['records'] == 305
+
+    write(hot, records[:10])
+    trash.write_text('[]')
+    count = snapshots.restore_snapshot(manifest['id'], str(hot), base, segments={'trash': str(trash)})
+    assert count == 305
+    assert hot.read_text() == json.dumps(records, indent=2)
+    assert json.loads(trash.read_text()) == deleted
+
+
+def test_unchanged_data_reuses_the_latest_snapshot(tmp_path):
+    base, hot = str(tmp_path / 'snapshots'), tmp_path / 'todos.json'
+    write(hot, tasks('Task', 2000))
+    first = snapshots.create_snapshot(str(hot), base)
+    assert snapshots.create_snapshot(str(hot), base)['id'] == first['id']
+
+    records = json.loads(hot.read_text())
+    records[1000]['task'] = 'Edited'
+    write(hot, records)
+    second = snapshots.create_snapshot(str(hot), base)
+    assert second['parent'] == first['id']
+    # Only the chunk holding the edit (or the two it now spans) is new
+    assert 1 <= second['new_chunks'] <= 2
+    assert len(set(second['chunks']) - set(first['chunks'])) == second['new_chunks']
+
+
+def test_prune_keeps_chunks_of_kept_snapshots(tmp_path):
+    base, hot = str(tmp_path / 'snapshots'), tmp_path / 'todos.json'
+    records = tasks('Task', 200)
+    ids = []
+    for i in range(3):
+        records[i]['task'] = f'Edit {i}'
+        write(hot, records)
+        ids.append(snapshots.create_snapshot(str(hot), base, retention=0)['id'])
+    assert snapshots.prune_snapshots(base, retention=2) == 1
+    assert [s['id'] for s in snapshots.list_snapshots(base)] == ids[:0:-1]
+
+    kept = set()
+    for snapshot_id in ids[1:]:
+        kept.update(snapshots.load_manifest(snapshot_id, base)['chunks'])
+    assert stored_objects(base) == kept
+    for snapshot_id in ids[1:]:
+        assert len(list(snapshots.iter_snapshot_records(snapshot_id, base))) == 200
+    try:
+        snapshots.restore_snapshot(ids[0], str(hot), base)
+    except snapshots.SnapshotError:
+        pass
+    else:
+        raise AssertionError('expected SnapshotError')
+
+
+def test_scheduler_waits_for_the_write_lock(client):
+    import app
+    assert app.snapshot_scheduler.lock is app.write_queue.lock
+    # The admin route already holds the write turn and must not wait for it again
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(response=client.post('/admin/snapshots')))
+    thread.start()
+    thread.join(5)
+    assert result['response'].get_json()['success']
@@ -0,0 +1,111 @@
+import uuid
+
+import indexes
+import storage
+
+
+def add_subtask(client, parent, task):
+    import app
+    response = client.post(f'/add?parent={parent["id"]}',
+                           data={'task': task, 'due': '03/01/2030', 'description': '', 'recurrence': 'none'})
+    assert response.status_code == 302
+    return next(t for t in app.load_todos() if t['task'] == task)
+
+
+def tiers():
+    import app
+    return {'hot': sorted(t['task'] for t in app.load_todos()),
+            'trash': sorted(t['task'] for t in storage.load_segment(storage.TRASH_FILE))}
+
+
+def family(client, add_task):
+    parent = add_task('Move house')
+    child = add_subtask(client, parent, 'Pack books')
+    add_subtask(client, child, 'Buy boxes')
+    add_task('Pay rent')
+    return parent, child
+
+
+def test_paths():
+    assert indexes.parent_path('a/b/c') == 'a/b'
+    assert indexes.parent_path('a') == ''
+    assert indexes.path_depth('a/b/c') == 2
+    todos = [{'path': p} for p in ('b', 'a/c', 'a', 'a/c/d', 'ab')]
+    assert indexes.PathIndex(todos).subtree('a') == [3, 2, 4]
+
+
+def test_subtasks_get_their_parents_path(client, add_task):
+    parent, child = family(client, add_task)
+    assert child['path'] == f'{parent["id"]}/{child["id"]}'
+    subtree = client.get(f'/api/tasks/{parent["id"]}/subtree').get_json()
+    assert [(t['task'], t['depth']) for t in subtree['tasks']] == [('Move house', 0), ('Pack books', 1), ('Buy boxes', 2)]
+    assert subtree['rollup'] == {'total': 2, 'completed': 0, 'percent': 0}
+
+
+def test_batch_delete_and_restore_cascade(client, add_task):
+    parent, _ = family(client, add_task)
+    for name in ('delete', 'restore'):
+        response = client.post('/api/batch', json={'ops': [{'key': uuid.uuid4().hex, 'op': name, 'id': parent['id']}]})
+        assert response.get_json()['results'][0]['status'] == 'applied'
+        if name == 'delete':
+            assert tiers() == {'hot': ['Pay rent'], 'trash': ['Buy boxes', 'Move house', 'Pack books']}
+    assert tiers() == {'hot': ['Buy boxes', 'Move house', 'Pack books', 'Pay rent'], 'trash': []}
+
+
+def test_patch_delete_and_restore_cascade(client, add_task):
+    parent, child = family(client, add_task)
+    tag = client.get(f'/api/tasks/{child["id"]}').headers['ETag']
+    response = client.patch(f'/api/tasks/{child["id"]}', json={'deleted': True}, headers={'If-Match': tag})
+    assert response.status_code == 200
+    assert tiers() == {'hot': ['Move house', 'Pay rent'], 'trash': ['Buy boxes', 'Pack books']}
+
+    response = client.patch(f'/api/tasks/{child["id"]}', json={'deleted': False},
+                            headers={'If-Match': response.headers['ETag']})
+    assert response.status_code == 200
+    assert tiers()['trash'] == []
+    assert client.post('/api/undo').status_code == 200
+    assert tiers() == {'hot': ['Move house', 'Pay rent'], 'trash': ['Buy boxes', 'Pack books']}
+
+
+def position(task):
+    """Index of an active task, as the views number them"""
+    import app
+    return next(i for i, t in enumerate(app.load_todos(), 1) if t['task'] == task)
+
+
+def test_archiving_takes_the_subtasks_along(client, add_task):
+    family(client, add_task)
+    assert client.post(f'/save/{position("Move house")}').status_code == 200
+    assert [t['task'] for t in storage.load_segment(storage.ARCHIVE_FILE)] == ['Move house', 'Pack books', 'Buy boxes']
+    assert tiers()['hot'] == ['Pay rent']
+
+    assert client.post('/unsave/1').status_code == 200
+    assert storage.load_segment(storage.ARCHIVE_FILE) == []
+    assert tiers()['hot'] == ['Buy boxes', 'Move house', 'Pack books', 'Pay rent']
+
+
+def test_bulk_delete_takes_the_subtasks_along(client, add_task):
+    family(client, add_task)
+    response = client.post('/api/bulk-action', json={'action': 'delete', 'indices': [position('Pack books')]})
+    assert response.status_code == 200
+    assert tiers()['hot'] == ['Move house', 'Pay rent']
+    parent = next(t for t in storage.load_segment('todos.json') if t['task'] == 'Move house')
+    assert client.get(f'/api/tasks/{parent["id"]}/subtree').get_json()['rollup']['total'] == 0
+
+
+def test_permanent_delete_takes_the_subtasks_along(client, add_task):
+    family(client, add_task)
+    client.post(f'/delete/{position("Move house")}')
+    assert client.post('/permanent-delete/1').status_code == 200
+    assert tiers() == {'hot': ['Pay rent'], 'trash': []}
+
+
+def test_permanent_delete_refuses_with_subtasks_outside_the_trash(client, add_task):
+    family(client, add_task)
+    client.post(f'/delete/{position("Move house")}')
+    trash = [t['task'] for t in storage.load_segment(storage.TRASH_FILE)]
+    client.post(f'/restore/{trash.index("Buy boxes") + 1}')
+
+    response = client.post(f'/permanent-delete/{trash.index("Move house") + 1}')
+    assert response.status_code == 409
+    assert tiers() == {'hot': ['Buy boxes', 'Pay rent'], 'trash': ['Move house', 'Pack books']}
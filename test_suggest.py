@@ -0,0 +1,73 @@
+import suggest
+
+
+def task(task_id, title):
+    return {'id': task_id, 'task': title}
+
+
+def titles(index, query, limit=suggest.DEFAULT_LIMIT):
+    return [(s['task'], s['count']) for s in index.suggest(query, limit)]
+
+
+def built(*todos):
+    index = suggest.SuggestIndex()
+    index.build(list(todos))
+    return index
+
+
+def test_prefix_of_title_ranks_before_prefix_of_word():
+    index = built(task('1', 'Weekly report'), task('2', 'Pay rent'), task('3', 'Write report'))
+    assert titles(index, 'write r') == [('Write report', 1)]
+    assert titles(index, 'pay re') == [('Pay rent', 1)]
+    # Otherwise equal, the shortest comes first
+    assert titles(index, 'rep') == [('Write report', 1), ('Weekly report', 1)]
+    index = built(task('1', 'Pay rent'), task('2', 'Rental car deposit'))
+    assert titles(index, 'ren') == [('Rental car deposit', 1), ('Pay rent', 1)]
+
+
+def test_every_word_must_match():
+    index = built(task('1', 'Call mom'), task('2', 'Call the bank'))
+    assert titles(index, 'ca ba') == [('Call the bank', 1)]
+    assert titles(index, 'ca x') == []
+    assert titles(index, '  ') == []
+
+
+def test_shared_titles_are_counted_once():
+    index = built(task('1', 'Gym'), task('2', 'gym'), task('3', 'Groceries'))
+    assert titles(index, 'g') == [('Gym', 2), ('Groceries', 1)]
+    assert titles(index, 'g', limit=1) == [('Gym', 2)]
+
+
+def test_apply_added_changed_removed():
+    index = built(task('1', 'Pay rent'), task('2', 'Pay rent'))
+    index.apply([{'type': 'added', 'id': '3', 'record': task('3', 'Plan trip')}])
+    assert titles(index, 'p') == [('Pay rent', 2), ('Plan trip', 1)]
+    assert len(index) == 3
+
+    index.apply([{'type': 'changed', 'id': '1', 'record': task('1', 'Renew passport')}])
+    assert titles(index, 'pay') == [('Pay rent', 1)]
+    assert titles(index, 'pass') == [('Renew passport', 1)]
+
+    index.apply([{'type': 'removed', 'id': '2', 'record': None}])
+    assert titles(index, 'pay') == []
+    assert titles(index, 'rent') == []
+    index.apply([{'type': 'removed', 'id': 'unknown', 'record': None}])
+    assert len(index) == 2
+
+
+def test_apply_matches_a_fresh_build():
+    events = [{'type': 'added', 'id': str(i), 'record': task(str(i), f'Task {i % 4} item')} for i in range(12)]
+    events += [{'type': 'removed', 'id': str(i), 'record': None} for i in range(0, 12, 3)]
+    events += [{'type': 'changed', 'id': '1', 'record': task('1', 'Other thing')}]
+    index = suggest.SuggestIndex()
+    index.build([])
+    index.apply(events)
+
+    current = {}
+    for event in events:
+        current.pop(event['id'], None)
+        if event['record'] is not None:
+            current[event['id']] = event['record']
+    fresh = built(*current.values())
+    for query in ('t', 'task 1', 'item', 'o', 'th'):
+        assert titles(index, query, 50) == titles(fresh, query, 50), query
@@ -0,0 +1,125 @@
+import io
+import json
+from datetime import datetime
+
+import schema
+import transfer
+
+
+def valid_due(value):
+    try:
+        datetime.strptime(value, '%m/%d/%Y')
+    except ValueError:
+        return False
+    return True
+
+
+def sample_records(count):
+    return [schema.new_record(f'Task {i}', '03/01/2030', 'Line one\nline "two"', 'none',
+                              'Home', ['a', 'b'] if i % 2 else [])
+            for i in range(count)]
+
+
+def test_format_record_matches_json_dump():
+    records = sample_records(3) + [{'id': 'x', 'nested': {'k': [1, {'v': None}]}}]
+    text = '[\n' + ',\n'.join(transfer.format_record(r) for r in records) + '\n]'
+    assert text == json.dumps(records, indent=2)
+
+
+def test_append_todos_matches_json_dump(tmp_path):
+    path = tmp_path / 'todos.json'
+    records = sample_records(5)
+    transfer.append_todos(str(path), records[:2])
+    transfer.append_todos(str(path), records[2:])
+    assert path.read_text() == json.dumps(records, indent=2)
+
+
+def test_append_todos_to_empty_array(tmp_path):
+    path = tmp_path / 'todos.json'
+    path.write_text('[]\n')
+    records = sample_records(2)
+    transfer.append_todos(str(path), records)
+    assert path.read_text() == json.dumps(records, indent=2)
+
+
+def test_append_todos_reads_only_the_tail(tmp_path, monkeypatch):
+    path = tmp_path / 'todos.json'
+    path.write_text(json.dumps(sample_records(2000), indent=2) + '\n\n')
+    reads = []
+
+    class CountingFile(io.FileIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            reads.append(len(data))
+            return data
+
+    monkeypatch.setattr(transfer, 'open', lambda p, mode='r': io.BufferedRandom(CountingFile(p, 'r+')),
+                        raising=False)
+    records = sample_records(3)
+    transfer.append_todos(str(path), records)
+    assert sum(reads) < 64 * 1024
+    monkeypatch.undo()
+    assert json.loads(path.read_text())[-3:] == records
+
+
+def test_append_todos_rejects_non_array(tmp_path):
+    path = tmp_path / 'todos.json'
+    path.write_text('{"not": "an array"}')
+    try:
+        transfer.append_todos(str(path), sample_records(1))
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('expected ValueError')
+    assert path.read_text() == '{"not": "an array"}'
+
+
+def test_import_reports_rejected_lines(tmp_path):
+    path = tmp_path / 'todos.json'
+    lines = ['{"task": "Pay rent", "due": "2030-03-01", "tags": "Home, bills"}',
+             '{"task": "", "due": "03/01/2030"}',
+             'not json',
+             '{"title": "From populate", "dueDate": "03/02/2030"}']
+    summary = transfer.import_stream(lines, 'jsonl', str(path), valid_due)
+    assert summary['imported'] == 2
+    assert summary['rejected'] == 2
+    assert [e['record'] for e in summary['errors']] == [2, 3]
+    todos = json.loads(path.read_text())
+    assert [t['task'] for t in todos] == ['Pay rent', 'From populate']
+    assert todos[0]['due'] == '03/01/2030'
+    assert todos[0]['tags'] == ['home', 'bills']
+    assert all(t['path'] == t['id'] for t in todos)
+
+
+def test_import_commits_in_chunks(tmp_path):
+    path = tmp_path / 'todos.json'
+    lines = [json.dumps({'task': f'Task {i}', 'due': '03/01/2030'}) for i in range(25)]
+    summary = transfer.import_stream(lines, 'jsonl', str(path), valid_due, chunk_size=10)
+    assert summary['chunks'] == 3
+    assert len(json.loads(path.read_text())) == 25
+
+
+def test_export_import_round_trip(tmp_path):
+    source = tmp_path / 'todos.json'
+    records = sample_records(4)
+    records[1]['completed'] = True
+    records[1]['completed_at'] = '2030-02-01T10:00:00'
+    source.write_text(json.dumps(records, indent=2))
+    for fmt in ('jsonl', 'csv', 'ics'):
+        # iCalendar has no property for the project
+        fields = ('task', 'due', 'description', 'tags', 'completed') + (('project',) if fmt != 'ics' else ())
+        exported = ''.join(transfer.export_stream(str(source), fmt))
+        target = tmp_path / f'imported-{fmt}.json'
+        summary = transfer.import_stream(exported.splitlines(keepends=True), fmt, str(target), valid_due)
+        assert summary['rejected'] == 0, (fmt, summary['errors'])
+        imported = json.loads(target.read_text())
+        assert [{f: t[f] for f in fields} for t in imported] == [{f: r[f] for f in fields} for r in records], fmt
+
+
+def test_iter_todos_across_read_boundaries(tmp_path):
+    path = tmp_path / 'todos.json'
+    records = sample_records(20)
+    for text in (json.dumps(records, indent=2), json.dumps(records), '[]', ' \n[\n]\n'):
+        path.write_text(text)
+        for read_size in (1, 7, 4096):
+            assert list(transfer.iter_todos(str(path), read_size)) == json.loads(text)
@@ -0,0 +1,125 @@
+import json
+import threading
+
+import pytest
+
+import indexes
+import schema
+import transfer
+import watcher
+
+
+def write(path, records):
+    path.write_text(json.dumps(records, indent=2))
+
+
+def tasks(*names):
+    return [schema.new_record(name, '03/01/2030') for name in names]
+
+
+def cache(path, feed=None):
+    return indexes.TaskIndexCache(str(path), None, watcher.IncrementalReloader(str(path), feed))
+
+
+def titles(snapshot):
+    return [t['task'] for t in snapshot.todos]
+
+
+def test_split_records():
+    records = tasks('a', 'b')
+    data = json.dumps(records, indent=2).encode()
+    assert [json.loads(b'{' + chunk + b'}') for chunk in watcher.split_records(data)] == records
+    assert watcher.split_records(b'[]\n') == []
+    assert watcher.split_records(json.dumps(records).encode()) is None
+
+
+def test_only_changed_records_are_decoded(tmp_path):
+    path = tmp_path / 'todos.json'
+    records = tasks(*(f'Task {i}' for i in range(50)))
+    write(path, records)
+    feed = watcher.ChangeFeed()
+    tasks_cache = cache(path, feed)
+    assert len(tasks_cache.get().todos) == 50
+    assert feed.sequence == 0     # the first load is not a change
+
+    records[7]['task'] = 'Edited'
+    added = tasks('New')[0]
+    transfer.append_todos(str(path), [added])
+    text = json.loads(path.read_text())
+    text[7]['task'] = 'Edited'
+    write(path, text)
+    snapshot = tasks_cache.get()
+    assert snapshot.todos == records + [added]
+    assert (tasks_cache.reloader.parsed, tasks_cache.reloader.reused) == (2, 49)
+    events, truncated = feed.since(0)
+    assert [(e['type'], e['id']) for e in events] == [('changed', records[7]['id']), ('added', added['id'])]
+    assert not truncated
+
+
+def test_removed_records_and_other_layouts(tmp_path):
+    path = tmp_path / 'todos.json'
+    records = tasks('a', 'b', 'c')
+    write(path, records)
+    feed = watcher.ChangeFeed()
+    tasks_cache = cache(path, feed)
+    tasks_cache.get()
+    path.write_text(json.dumps(records[1:]))      # compact: parsed in full
+    assert titles(tasks_cache.get()) == ['b', 'c']
+    assert [(e['type'], e['id']) for e in feed.since(0)[0]] == [('removed', records[0]['id'])]
+
+
+def test_appended_legacy_records_are_conformed(tmp_path):
+    path = tmp_path / 'todos.json'
+    write(path, tasks('a'))
+    tasks_cache = cache(path)
+    tasks_cache.get()
+    transfer.append_todos(str(path), [{'task': 'Legacy', 'due': '03/01/2030'}])
+    legacy = tasks_cache.get().todos[1]
+    assert list(legacy) == list(schema.FIELDS)
+    assert legacy['task'] == 'Legacy'
+
+
+def test_partial_and_unparsable_writes_keep_the_previous_snapshot(tmp_path):
+    path = tmp_path / 'todos.json'
+    write(path, tasks('a', 'b'))
+    feed = watcher.ChangeFeed()
+    tasks_cache = cache(path, feed)
+    previous = tasks_cache.get()
+    for text in (json.dumps(tasks('a', 'b', 'c'), indent=2)[:-40], '{"not": "a list"}', ''):
+        path.write_text(text)
+        assert tasks_cache.get() is previous
+    assert feed.sequence == 0
+
+
+def watch_and_append(path, use_inotify):
+    tasks_cache = cache(path)
+    tasks_cache.get()
+    reloaded = threading.Event()
+    snapshots = []
+
+    def callback():
+        snapshots.append(tasks_cache.get())
+        reloaded.set()
+
+    file_watcher = watcher.FileWatcher([str(path)], callback, interval=0.01, use_inotify=use_inotify)
+    file_watcher.start()
+    try:
+        transfer.append_todos(str(path), tasks('b'))
+        assert reloaded.wait(5)
+    finally:
+        file_watcher.stop()
+    return snapshots[-1]
+
+
+def test_polling_watcher_reloads_on_write(tmp_path):
+    path = tmp_path / 'todos.json'
+    write(path, tasks('a'))
+    assert titles(watch_and_append(path, use_inotify=False)) == ['a', 'b']
+
+
+def test_inotify_watcher_reloads_on_write(tmp_path):
+    if watcher._libc is None:
+        pytest.skip('inotify is not available')
+    path = tmp_path / 'todos.json'
+    write(path, tasks('a'))
+    assert titles(watch_and_append(path, use_inotify=True)) == ['a', 'b']
@@ -0,0 +1,466 @@
+"""
+Streaming bulk import/export for TodoHub.
+
+Everything here is built from generators so that memory use stays constant
+regardless of how many tasks are imported or exported:
+
+    read_<format>(lines) -> normalize_record -> batched -> validate_batch -> append_todos
+    iter_todos(path) -> write_<format>(records) -> response / file
+
+Supported formats are CSV, JSON Lines and iCalendar (VTODO). This module has
+no Flask dependency so it is shared by app.py and main.py.
+"""
+import csv
+import io
+import json
+import os
+import re
+import uuid
+from datetime import datetime
+from itertools import chain, islice
+
+from indexes import parse_tags
+
+FORMATS = ('csv', 'jsonl', 'ics')
+MIME_TYPES = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'ics': 'text/calendar'
+}
+
+CSV_FIELDS = ['id', 'task', 'due', 'description', 'recurrence', 'project', 'tags',
+              'completed', 'completed_at', 'deleted', 'deleted_at', 'saved', 'saved_at']
+
+CHUNK_SIZE = 500       # records validated and committed together
+READ_SIZE = 65536      # bytes read at a time when streaming todos.json
+MAX_REPORTED_ERRORS = 50
+
+RECURRENCES = ('none', 'daily', 'weekly', 'monthly', 'yearly')
+
+
+def detect_format(filename, default='jsonl'):
+    """Guess the format from a file name extension"""
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext == 'ndjson':
+        return 'jsonl'
+    if ext in ('ical', 'ifb', 'icalendar'):
+        return 'ics'
+    return ext if ext in FORMATS else default
+
+
+def batched(iterable, size):
+    """Yield lists of up to `size` items"""
+    it = iter(iterable)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+# ============================================================================
+# READING todos.json AS A STREAM
+# ============================================================================
+
+def iter_todos(path, read_size=READ_SIZE):
+    """Yield the records of a JSON array file one at a time without loading
+    the whole document into memory."""
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, 'r') as f:
+        buf = ''
+        # Find the opening bracket of the array
+        while '[' not in buf:
+            chunk = f.read(read_size)
+            if not chunk:
+                return
+            buf += chunk
+        # Records are decoded from `pos` on; the consumed part of the buffer
+        # is only dropped when more text is read
+        pos = buf.index('[') + 1
+        eof = False
+        while True:
+            while pos < len(buf) and buf[pos] in ' \t\r\n,':
+                pos += 1
+            if buf.startswith(']', pos):
+                return
+            try:
+                record, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(read_size)
+                eof = not chunk
+                buf = buf[pos:] + chunk
+                pos = 0
+                continue
+            yield record
+
+
+_encode_value = json.JSONEncoder().encode
+_encode_str = json.encoder.encode_basestring_ascii
+
+
+def _encode(value):
+    if value.__class__ is str:
+        return _encode_str(value)
+    if value is None:
+        return 'null'
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    return _encode_value(value)
+
+
+def format_record(record):
+    """One record as an element of a json.dump(todos, f, indent=2) array.
+
+    Same bytes as '  ' + json.dumps(record, indent=2).replace('\n', '\n  '),
+    but the values of a flat task record are encoded by the C encoder
+    instead of the much slower pure Python indenting encoder.
+    """
+    lines = []
+    for key, value in record.items():
+        if not isinstance(key, str) or isinstance(value, dict):
+            return '  ' + json.dumps(record, indent=2).replace('\n', '\n  ')
+        if isinstance(value, list):
+            if any(isinstance(v, (dict, list)) for v in value):
+                return '  ' + json.dumps(record, indent=2).replace('\n', '\n  ')
+            text = '[\n' + ',\n'.join('      ' + _encode(v) for v in value) + '\n    ]' if value else '[]'
+        else:
+            text = _encode(value)
+        lines.append(f'    {_encode_str(key)}: {text}')
+    if not lines:
+        return '  {}'
+    return '  {\n' + ',\n'.join(lines) + '\n  }'
+
+
+def append_todos(path, records):
+    """Append records to the JSON array in `path` in place.
+
+    Only the closing bracket is rewritten, so the cost of a commit depends on
+    the size of the chunk, not on the size of the existing file. The output
+    matches json.dump(todos, f, indent=2). A reader polling the file while it
+    is written may see a cut-off array; the watcher keeps its previous
+    snapshot until the file parses again.
+    """
+    if not records:
+        return
+    body = ',\n'.join(format_record(r) for r in records)
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        with open(path, 'w') as f:
+            f.write('[\n' + body + '\n]')
+            f.flush()
+            os.fsync(f.fileno())
+        return
+    with open(path, 'r+b') as f:
+        # Walk back over trailing whitespace to the closing bracket
+        pos = f.seek(0, os.SEEK_END)
+        ch = b''
+        while pos > 0:
+            f.seek(pos - 1)
+            ch = f.read(1)
+            if not ch.isspace():
+                break
+            pos -= 1
+        if ch != b']':
+            raise ValueError(f'{path} is not a JSON array')
+        close = pos - 1
+        # Is the array empty? Look at the previous non-space character
+        pos = close
+        prev = b''
+        while pos > 0:
+            f.seek(pos - 1)
+            prev = f.read(1)
+            if not prev.isspace():
+                break
+            pos -= 1
+        empty = prev == b'['
+        # The new text is longer than what it replaces, so it is written
+        # over the old bracket in one call before the tail is cut
+        text = ('\n' if empty else ',\n') + body + '\n]'
+        f.seek(pos)
+        f.write(text.encode('utf-8'))
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+
+# ============================================================================
+# PARSERS - each yields raw dicts
+# ============================================================================
+
+def read_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                yield {'_error': f'Invalid JSON: {e}'}
+
+
+def read_csv(lines):
+    yield from csv.DictReader(lines)
+
+
+def _ics_unescape(value):
+    return (value.replace('\\n', '\n').replace('\\N', '\n')
+            .replace('\\,', ',').replace('\\;', ';').replace('\\\\', '\\'))
+
+
+def _unfold(lines):
+    """Join RFC 5545 folded lines (continuations start with a space or tab)"""
+    current = None
+    for line in lines:
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current is not None:
+            yield current
+        current = line
+    if current is not None:
+        yield current
+
+
+def read_ics(lines):
+    record = None
+    for line in _unfold(lines):
+        if ':' not in line:
+            continue
+        name, value = line.split(':', 1)
+        prop = name.split(';', 1)[0].upper()
+        if prop == 'BEGIN' and value.upper() in ('VTODO', 'VEVENT'):
+            record = {}
+        elif prop == 'END' and value.upper() in ('VTODO', 'VEVENT') and record is not None:
+            yield record
+            record = None
+        elif record is not None:
+            if prop == 'SUMMARY':
+                record['task'] = _ics_unescape(value)
+            elif prop == 'DESCRIPTION':
+                record['description'] = _ics_unescape(value)
+            elif prop == 'DUE' or (prop == 'DTSTART' and 'due' not in record):
+                record['due'] = _ics_date(value)
+            elif prop == 'CATEGORIES':
+                record['tags'] = [_ics_unescape(v) for v in re.split(r'(?<!\\),', value)]
+            elif prop == 'STATUS':
+                record['completed'] = value.upper() == 'COMPLETED'
+            elif prop == 'COMPLETED':
+                record['completed_at'] = _ics_datetime(value)
+            elif prop == 'RRULE':
+                for part in value.split(';'):
+                    if part.upper().startswith('FREQ='):
+                        record['recurrence'] = part[5:].lower()
+
+
+def _ics_date(value):
+    try:
+        return datetime.strptime(value[:8], '%Y%m%d').strftime('%m/%d/%Y')
+    except ValueError:
+        return value
+
+
+def _ics_datetime(value):
+    try:
+        return datetime.strptime(value.rstrip('Z')[:15], '%Y%m%dT%H%M%S').isoformat()
+    except ValueError:
+        return None
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl, 'ics': read_ics}
+
+
+# ============================================================================
+# NORMALIZATION AND VALIDATION
+# ============================================================================
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def _as_text(value):
+    return '' if value is None else str(value).strip()
+
+
+def _as_due(value):
+    """Accept mm/dd/yyyy as-is and convert ISO dates (yyyy-mm-dd)"""
+    value = _as_text(value)
+    try:
+        return datetime.strptime(value[:10], '%Y-%m-%d').strftime('%m/%d/%Y')
+    except ValueError:
+        return value
+
+
+def normalize_record(raw):
+    """Map an imported record onto the app's task schema.
+
+    Understands the app's own keys as well as the `title`/`dueDate` keys used
+    by populate_tasks.py. Imported tasks always get a fresh id, and so come
+    in as top-level tasks.
+    """
+    if raw.get('_error'):
+        return raw
+    recurrence = _as_text(raw.get('recurrence')).lower()
+    completed = _as_bool(raw.get('completed'))
+    deleted = _as_bool(raw.get('deleted'))
+    saved = _as_bool(raw.get('saved'))
+    task_id = uuid.uuid4().hex
+    return {
+        'id': task_id,
+        'task': _as_text(raw.get('task') or raw.get('title')),
+        'due': _as_due(raw.get('due') or raw.get('dueDate')),
+        'description': _as_text(raw.get('description')),
+        'recurrence': recurrence if recurrence in RECURRENCES else 'none',
+        'project': _as_text(raw.get('project')),
+        'tags': parse_tags(raw.get('tags')),
+        'path': task_id,
+        'completed': completed,
+        'completed_at': (raw.get('completed_at') or None) if completed else None,
+        'deleted': deleted,
+        'deleted_at': (raw.get('deleted_at') or None) if deleted else None,
+        'saved': saved,
+        'saved_at': (raw.get('saved_at') or None) if saved else None
+    }
+
+
+def validate_batch(batch, validate_due_date):
+    """Split a batch into (valid records, [(position, error), ...])"""
+    valid, errors = [], []
+    for position, record in batch:
+        if record.get('_error'):
+            errors.append((position, record['_error']))
+        elif not record['task']:
+            errors.append((position, 'Task name cannot be empty.'))
+        elif not validate_due_date(record['due']):
+            errors.append((position, f"Invalid date '{record['due']}'. Use mm/dd/yyyy."))
+        else:
+            valid.append(record)
+    return valid, errors
+
+
+def import_stream(lines, fmt, path, validate_due_date, chunk_size=CHUNK_SIZE, on_commit=None):
+    """Parse, validate and append tasks chunk by chunk.
+
+    Each valid chunk is written with a single append to `path`, or one append
+    per target file when `path` is a function choosing the file for a record.
+    `on_commit` is called with the committed records (e.g. to schedule
+    notifications). Returns a summary dict.
+    """
+    if fmt not in READERS:
+        raise ValueError(f'Unsupported format: {fmt}')
+    records = (normalize_record(r) for r in READERS[fmt](lines))
+    summary = {'imported': 0, 'rejected': 0, 'chunks': 0, 'errors': []}
+    for batch in batched(enumerate(records, 1), chunk_size):
+        valid, errors = validate_batch(batch, validate_due_date)
+        if valid:
+            if callable(path):
+                targets = {}
+                for record in valid:
+                    targets.setdefault(path(record), []).append(record)
+                for target, records in targets.items():
+                    append_todos(target, records)
+            else:
+                append_todos(path, valid)
+            summary['chunks'] += 1
+            if on_commit:
+                on_commit(valid)
+        summary['imported'] += len(valid)
+        summary['rejected'] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(summary['errors'])
+        summary['errors'].extend({'record': p, 'error': e} for p, e in errors[:max(room, 0)])
+    return summary
+
+
+# ============================================================================
+# WRITERS - each yields text chunks
+# ============================================================================
+
+def write_jsonl(records):
+    for batch in batched(records, CHUNK_SIZE):
+        yield ''.join(json.dumps(r) + '\n' for r in batch)
+
+
+def write_csv(records):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=CSV_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    for batch in batched(records, CHUNK_SIZE):
+        writer.writerows(dict(r, tags=','.join(r.get('tags') or [])) for r in batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def _ics_escape(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;')
+            .replace(',', '\\,').replace('\n', '\\n'))
+
+
+def _ics_fold(line):
+    """Fold a content line to 75 octets as required by RFC 5545"""
+    out = []
+    data = line.encode('utf-8')
+    while len(data) > 75:
+        cut = 75 if not out else 74
+        # Do not split a multi-byte character
+        while cut > 0 and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        out.append(data[:cut].decode('utf-8'))
+        data = data[cut:]
+    out.append(data.decode('utf-8'))
+    return '\r\n '.join(out) + '\r\n'
+
+
+def _ics_todo(record, stamp):
+    lines = ['BEGIN:VTODO',
+             f"UID:{record.get('id') or uuid.uuid4().hex}@todohub",
+             f'DTSTAMP:{stamp}',
+             f"SUMMARY:{_ics_escape(record.get('task', ''))}"]
+    if record.get('description'):
+        lines.append(f"DESCRIPTION:{_ics_escape(record['description'])}")
+    try:
+        due = datetime.strptime(record.get('due', ''), '%m/%d/%Y')
+        lines.append(f"DUE;VALUE=DATE:{due.strftime('%Y%m%d')}")
+    except ValueError:
+        pass
+    if record.get('tags'):
+        lines.append('CATEGORIES:' + ','.join(_ics_escape(t) for t in record['tags']))
+    if record.get('recurrence') and record['recurrence'] != 'none':
+        lines.append(f"RRULE:FREQ={record['recurrence'].upper()}")
+    lines.append('STATUS:COMPLETED' if record.get('completed') else 'STATUS:NEEDS-ACTION')
+    if record.get('completed_at'):
+        try:
+            done = datetime.fromisoformat(record['completed_at'])
+            lines.append(f"COMPLETED:{done.strftime('%Y%m%dT%H%M%S')}")
+        except ValueError:
+            pass
+    lines.append('END:VTODO')
+    return ''.join(_ics_fold(line) for line in lines)
+
+
+def write_ics(records):
+    stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    yield 'BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:-//TodoHub//Tasks//EN\r\n'
+    for batch in batched(records, CHUNK_SIZE):
+        yield ''.join(_ics_todo(r, stamp) for r in batch)
+    yield 'END:VCALENDAR\r\n'
+
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'ics': write_ics}
+
+
+def export_stream(paths, fmt):
+    """Yield the tasks of one or more task files serialized as `fmt`, chunk by chunk"""
+    if fmt not in WRITERS:
+        raise ValueError(f'Unsupported format: {fmt}')
+    if isinstance(paths, str):
+        paths = [paths]
+    return WRITERS[fmt](chain.from_iterable(iter_todos(p) for p in paths))
@@ -0,0 +1,291 @@
+"""
+Picks up changes to todos.json made outside the web app (main.py,
+populate_tasks.py, scripts) and applies them as a diff.
+
+- FileWatcher: daemon thread calling back when a watched file is written,
+  replaced or removed. Uses inotify (Linux, through ctypes) on the file's
+  directory, so atomic renames are seen too, and falls back to polling
+  the files' stat signatures every `interval` seconds elsewhere.
+- IncrementalReloader: reloader for indexes.TaskIndexCache. Files in the
+  layout json.dump(indent=2) and transfer.append_todos write are split
+  into records without parsing; each record is keyed by a hash of its
+  text, and only records whose hash was not in the previous version are
+  decoded. When only some records changed in place, the snapshot's
+  indexes are patched instead of rebuilt. Any other layout is parsed in
+  full and diffed by task id; a file that does not parse (or is empty) is
+  skipped.
+  Records are conformed to the schema (schema.conformed) as they are read.
+- ChangeFeed: the resulting events ('added', 'changed', 'removed', by
+  task id) go to in-process subscribers and a bounded log clients can
+  poll by sequence number.
+"""
+import hashlib
+import json
+import os
+import select
+import struct
+import threading
+from collections import deque
+
+import indexes
+import schema
+
+try:
+    import ctypes
+    import ctypes.util
+    _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    _libc.inotify_init1
+except (ImportError, OSError, AttributeError):   # not Linux: poll
+    _libc = None
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+_EVENT = struct.Struct('iIII')
+
+# Writes usually come as a burst of events (create, write, close, rename);
+# they are coalesced into one callback after this much quiet
+SETTLE_SECONDS = 0.05
+
+# Above this share of changed records, indexes are rebuilt instead of patched
+MAX_PATCH_SHARE = 0.1
+
+_HEAD = b'[\n  {'
+_SEPARATOR = b'\n  },\n  {'
+_TAIL = b'\n  }\n]'
+
+
+def split_records(data):
+    """Texts of the records of a JSON array in the indent=2 layout, as
+    bytes, or None when `data` is in another layout.
+
+    JSON strings cannot hold raw newlines and nested values are indented
+    deeper, so the separator only occurs between top-level records.
+    """
+    data = data.strip()
+    if data in (b'[]', b''):
+        return []
+    if not data.startswith(_HEAD) or not data.endswith(_TAIL):
+        return None
+    return data[len(_HEAD):-len(_TAIL)].split(_SEPARATOR)
+
+
+def _digest(text):
+    return hashlib.blake2b(text, digest_size=16).digest()
+
+
+class ChangeFeed:
+    """Change events fanned out to subscribers and kept in a bounded log"""
+
+    def __init__(self, size=1000):
+        self._log = deque(maxlen=size)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.sequence = 0
+
+    def subscribe(self, callback):
+        """Call `callback(events)` with each batch of events"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def publish(self, events):
+        if not events:
+            return
+        with self._lock:
+            for event in events:
+                self.sequence += 1
+                event['seq'] = self.sequence
+                self._log.append(event)
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(events)
+            except Exception as e:
+                print(f'Change subscriber failed: {e}')
+
+    def since(self, sequence):
+        """Events after `sequence`, plus whether older ones were dropped
+        from the log (the client should then reload everything)"""
+        with self._lock:
+            events = [event for event in self._log if event['seq'] > sequence]
+            truncated = bool(self._log) and self._log[0]['seq'] > sequence + 1
+            return events, truncated
+
+
+class IncrementalReloader:
+    """Builds the next TaskSnapshot of `path` from the previous one, decoding
+    only the records that changed, and publishes the diff to `feed`"""
+
+    def __init__(self, path, feed=None):
+        self.path = path
+        self.feed = feed
+        self._keys = []          # key of each record of the previous version
+        self._records = {}       # key -> record, for the previous version
+        self._loaded = False     # the first load is not a change
+        self.parsed = 0          # records decoded by the last reload
+        self.reused = 0
+
+    def _read(self):
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return [], []
+        if not data.strip():
+            # Truncated by a writer about to write it again
+            return None
+        chunks = split_records(data)
+        if chunks is not None:
+            keys = [_digest(chunk) for chunk in chunks]
+            todos = []
+            for key, chunk in zip(keys, chunks):
+                record = self._records.get(key)
+                if record is None:
+                    try:
+                        record = json.loads(b'{' + chunk + b'}')
+                    except ValueError:
+                        break
+                    self.parsed += 1
+                else:
+                    self.reused += 1
+                todos.append(record)
+            else:
+                # Every chunk is an object, so conforming keeps the positions
+                return schema.conform(todos), keys
+        # Some other layout: parse it all, records are keyed by identity.
+        # A file that does not parse (a writer not using a rename, caught
+        # mid-write) is not read as empty: that would remove every task
+        try:
+            todos = json.loads(data)
+        except ValueError:
+            return None
+        if not isinstance(todos, list):
+            return None
+        self.parsed += len(todos)
+        todos = schema.conform(todos)
+        return todos, [None] * len(todos)
+
+    def __call__(self, previous):
+        self.parsed = self.reused = 0
+        read = self._read()
+        if read is None:
+            return previous
+        todos, keys = read
+        old_todos, old_keys = previous.todos, self._keys
+        self._keys = keys
+        self._records = {key: record for key, record in zip(keys, todos) if key is not None}
+
+        events = []
+        old_by_id = {}
+        for position, (todo, key) in enumerate(zip(old_todos, old_keys)):
+            if isinstance(todo, dict) and isinstance(todo.get('id'), str):
+                old_by_id[todo['id']] = (position, todo, key)
+        new_ids = set()
+        changed = []
+        same_order = len(todos) == len(old_todos)
+        for position, (todo, key) in enumerate(zip(todos, keys)):
+            task_id = todo.get('id') if isinstance(todo, dict) else None
+            if not isinstance(task_id, str):
+                same_order = False
+                continue
+            new_ids.add(task_id)
+            old = old_by_id.get(task_id)
+            if old is None:
+                events.append({'type': 'added', 'id': task_id, 'record': todo})
+                same_order = False
+            elif (key is None or key != old[2]) and todo != old[1]:
+                events.append({'type': 'changed', 'id': task_id, 'record': todo})
+                changed.append(position + 1)
+            if old is not None and old[0] != position:
+                same_order = False
+        for task_id in old_by_id.keys() - new_ids:
+            events.append({'type': 'removed', 'id': task_id, 'record': None})
+
+        if same_order and len(changed) <= MAX_PATCH_SHARE * len(todos):
+            snapshot = previous.patched(todos, changed)
+        else:
+            snapshot = indexes.TaskSnapshot(todos)
+        if self.feed is not None and self._loaded:
+            self.feed.publish(events)
+        self._loaded = True
+        return snapshot
+
+
+class FileWatcher:
+    """Daemon thread calling `callback()` after any of `paths` changed"""
+
+    def __init__(self, paths, callback, interval=1.0, use_inotify=True):
+        self.paths = [os.path.abspath(path) for path in paths]
+        self.callback = callback
+        self.interval = interval
+        self.use_inotify = use_inotify and _libc is not None
+        self._stop = threading.Event()
+        self._thread = None
+        self._signatures = {}
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        # Taken before returning, so a write right after start() is seen
+        self._signatures = self._stat()
+        target = self._run_inotify if self.use_inotify else self._run_polling
+        self._thread = threading.Thread(target=target, name='file-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _notify(self):
+        try:
+            self.callback()
+        except Exception as e:
+            print(f'File watcher callback failed: {e}')
+
+    def _stat(self):
+        return {path: indexes.file_signature(path) for path in self.paths}
+
+    def _run_polling(self):
+        while not self._stop.wait(self.interval):
+            current = self._stat()
+            if current != self._signatures:
+                self._signatures = current
+                self._notify()
+
+    def _run_inotify(self):
+        fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return self._run_polling()
+        try:
+            watched = {}
+            for path in self.paths:
+                directory, name = os.path.split(path)
+                wd = _libc.inotify_add_watch(fd, directory.encode(), WATCH_MASK)
+                if wd < 0:
+                    return self._run_polling()
+                watched.setdefault(wd, set()).add(name.encode())
+            # A write between start() and the watches is not seen as an event
+            pending = self._stat() != self._signatures
+            while not self._stop.is_set():
+                # Wake up now and then to notice stop(); after an event, wait
+                # for the burst to settle before calling back
+                ready, _, _ = select.select([fd], [], [], SETTLE_SECONDS if pending else self.interval)
+                if not ready:
+                    if pending:
+                        pending = False
+                        self._notify()
+                    continue
+                data = os.read(fd, 65536)
+                offset = 0
+                while offset < len(data):
+                    wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+                    name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b'\0')
+                    offset += _EVENT.size + length
+                    if name in watched.get(wd, ()):
+                        pending = True
+        finally:
+            os.close(fd)